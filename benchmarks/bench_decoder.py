@@ -0,0 +1,123 @@
+"""Compare the advertisement decoder of the integration with PySwitchbot.
+
+For bots and curtains this measures the time per advertisement of:
+
+* library: decoding with the detection callback of PySwitchbot and applying
+  the resulting dict to the device state, as the listener used to.
+* decoder: applying the raw service data to the device state, decoding it
+  with the precompiled struct layouts of decoder.py.
+* repeat: the decoder path for service data repeating the previous
+  advertisement, which is the common case and skips decoding.
+"""
+from __future__ import annotations
+
+import argparse
+import importlib
+import itertools
+import json
+import timeit
+from typing import Any
+
+import fleet
+from harness import DOMAIN
+
+
+def _advertisements(device: fleet.SimulatedDevice) -> list[tuple[Any, Any]]:
+    """Return two advertisements of device with different service data."""
+    advertisements = []
+    for _ in range(2):
+        data = device.service_data()
+        advertisements.append(
+            (
+                fleet.BLEDevice(device.address, "WoDevice", device.rssi),
+                fleet.AdvertisementData({fleet.SERVICE_DATA_UUID: data}, device.rssi),
+            )
+        )
+        device.battery -= 1
+    return advertisements
+
+
+def _bench_model(device: fleet.SimulatedDevice, number: int) -> dict[str, float]:
+    """Return nanoseconds per advertisement of each path for a device."""
+    # pylint: disable=import-outside-toplevel
+    import switchbot
+
+    decoder = importlib.import_module(f"custom_components.{DOMAIN}.decoder")
+    models = importlib.import_module(f"custom_components.{DOMAIN}.models")
+
+    scanner = switchbot.GetSwitchbotDevices()
+    advertisements = _advertisements(device)
+    packets = [
+        advertisement_data.service_data[fleet.SERVICE_DATA_UUID]
+        for _ble_device, advertisement_data in advertisements
+    ]
+    for (ble_device, advertisement_data), data in zip(advertisements, packets):
+        scanner.detection_callback(ble_device, advertisement_data)
+        # pylint: disable-next=protected-access
+        if scanner._adv_data[device.key] != decoder.decode_advertisement(
+            device.address, data, device.rssi
+        ):
+            raise AssertionError(f"Decoder and library disagree on {data.hex()}")
+
+    def _new_state() -> Any:
+        return models.create_state(
+            decoder.decode_advertisement(device.address, packets[0], device.rssi)
+        )
+
+    library_state = _new_state()
+    library_advertisements = itertools.cycle(advertisements)
+    state = _new_state()
+    changing = itertools.cycle(packets)
+
+    def _library() -> None:
+        ble_device, advertisement_data = next(library_advertisements)
+        scanner.detection_callback(ble_device, advertisement_data)
+        # pylint: disable-next=protected-access
+        library_state.update(scanner._adv_data[device.key])
+
+    def _decoder() -> None:
+        state.update_raw(next(changing), device.rssi)
+
+    def _repeat() -> None:
+        state.update_raw(state.raw_adv_data, device.rssi)
+
+    results = {}
+    for name, path in (
+        ("library", _library),
+        ("decoder", _decoder),
+        ("repeat", _repeat),
+    ):
+        best = min(timeit.repeat(path, number=number, repeat=5))
+        results[f"{name}_ns"] = round(best / number * 1e9)
+    return results
+
+
+def main() -> None:
+    """Run the benchmark for a bot and a curtain."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--number", type=int, default=100000)
+    parser.add_argument("--json", action="store_true", help="print JSON")
+    args = parser.parse_args()
+
+    sim = fleet.SimulatedFleet(bots=1, curtains=1)
+    fleet.install(sim)
+    results = {
+        "bot" if device.model == "H" else "curtain": _bench_model(device, args.number)
+        for device in sim.devices.values()
+    }
+
+    if args.json:
+        print(json.dumps(results))
+        return
+    for model, result in results.items():
+        print(
+            f"{model:8} library {result['library_ns']}ns  "
+            f"decoder {result['decoder_ns']}ns "
+            f"({result['library_ns'] / result['decoder_ns']:.1f}x)  "
+            f"repeat {result['repeat_ns']}ns "
+            f"({result['library_ns'] / result['repeat_ns']:.1f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
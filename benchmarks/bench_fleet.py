@@ -0,0 +1,157 @@
+"""Benchmark refresh, state writes, commands and memory on a simulated fleet.
+
+Runs the real coordinator and platform setup on top of a simulated radio,
+fully offline:
+
+    python benchmarks/bench_fleet.py --sizes 10,50,100,500
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import statistics
+import tempfile
+import time
+import tracemalloc
+from typing import Any
+
+import fleet
+from harness import (
+    DOMAIN,
+    async_import_integration,
+    async_setup_integration,
+    async_start_hass,
+    entity_ids,
+    write_config_entries,
+)
+
+
+def _summary(samples: list[float]) -> dict[str, float]:
+    """Return mean, median and max of samples in milliseconds."""
+    if not samples:
+        return {}
+    return {
+        "mean_ms": round(statistics.mean(samples) * 1000, 2),
+        "median_ms": round(statistics.median(samples) * 1000, 2),
+        "max_ms": round(max(samples) * 1000, 2),
+    }
+
+
+async def async_bench_size(size: int, args: argparse.Namespace) -> dict[str, Any]:
+    """Run all measurements against a fleet of size devices."""
+    sim = fleet.SimulatedFleet(
+        bots=size // 2,
+        curtains=size - size // 2,
+        adv_interval=args.adv_interval,
+        connect_latency=args.latency,
+        command_latency=args.latency / 4,
+        packet_loss=args.loss,
+        seed=args.seed,
+    )
+    fleet.install(sim)
+
+    with tempfile.TemporaryDirectory() as config_dir:
+        write_config_entries(config_dir, sim, hub=args.hub)
+        hass = await async_start_hass(config_dir)
+        await async_import_integration(hass)
+
+        tracemalloc.start()
+        baseline, _ = tracemalloc.get_traced_memory()
+        start = time.perf_counter()
+        await async_setup_integration(hass)
+        setup_time = time.perf_counter() - start
+        memory, memory_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        coordinator = hass.data[DOMAIN]["coordinator"]
+
+        writes = 0
+        async_set = hass.states.async_set
+
+        def _counting_async_set(*set_args: Any, **set_kwargs: Any) -> None:
+            nonlocal writes
+            writes += 1
+            async_set(*set_args, **set_kwargs)
+
+        hass.states.async_set = _counting_async_set
+
+        refresh_times = []
+        for _ in range(args.refreshes):
+            start = time.perf_counter()
+            await coordinator.async_refresh()
+            refresh_times.append(time.perf_counter() - start)
+        writes_per_refresh = writes / max(args.refreshes, 1)
+
+        command_times = []
+        covers = entity_ids(hass, "cover")[: args.commands]
+        for index, entity_id in enumerate(covers):
+            start = time.perf_counter()
+            await hass.services.async_call(
+                "cover",
+                "set_cover_position",
+                {"entity_id": entity_id, "position": 25 + index % 50},
+                blocking=True,
+            )
+            command_times.append(time.perf_counter() - start)
+
+        switches = entity_ids(hass, "switch")[: args.commands]
+        for entity_id in switches:
+            start = time.perf_counter()
+            await hass.services.async_call(
+                "switch", "turn_on", {"entity_id": entity_id}, blocking=True
+            )
+            command_times.append(time.perf_counter() - start)
+
+        await hass.async_stop(force=True)
+
+    return {
+        "devices": size,
+        "entities": len(hass.states.async_entity_ids()),
+        "setup_s": round(setup_time, 3),
+        "refresh": _summary(refresh_times),
+        "state_writes_per_refresh": round(writes_per_refresh, 1),
+        "command_rtt": _summary(command_times),
+        "memory_mb": round((memory - baseline) / 2**20, 2),
+        "memory_peak_mb": round((memory_peak - baseline) / 2**20, 2),
+    }
+
+
+def main() -> None:
+    """Run the benchmark for each fleet size and print the results."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", default="10,50,100,500")
+    parser.add_argument("--refreshes", type=int, default=5)
+    parser.add_argument("--commands", type=int, default=5)
+    parser.add_argument(
+        "--adv-interval", type=float, default=0.1, help="seconds between adverts"
+    )
+    parser.add_argument(
+        "--latency", type=float, default=0.2, help="connection latency in seconds"
+    )
+    parser.add_argument("--loss", type=float, default=0.0, help="packet loss 0-1")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--hub", action="store_true", help="set up all devices with one hub entry"
+    )
+    parser.add_argument("--json", action="store_true", help="print JSON lines")
+    args = parser.parse_args()
+
+    for size in (int(size) for size in args.sizes.split(",")):
+        result = asyncio.run(async_bench_size(size, args))
+        if args.json:
+            print(json.dumps(result))
+            continue
+        print(
+            f"{result['devices']:>4} devices  {result['entities']:>5} entities  "
+            f"setup {result['setup_s']:>7.3f}s  "
+            f"refresh {result['refresh'].get('mean_ms', 0):>8.1f}ms  "
+            f"writes/refresh {result['state_writes_per_refresh']:>6.1f}  "
+            f"command {result['command_rtt'].get('mean_ms', 0):>7.1f}ms  "
+            f"memory {result['memory_mb']:>6.2f}MB "
+            f"(peak {result['memory_peak_mb']:.2f}MB)"
+        )
+
+
+if __name__ == "__main__":
+    main()
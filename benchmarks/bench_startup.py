@@ -0,0 +1,143 @@
+"""Measure how much the Switchbot integration adds to Home Assistant startup.
+
+Every run happens in a fresh interpreter so module imports are measured cold:
+
+* import: importing the integration and its config flow on top of the
+  Home Assistant modules bootstrap has already loaded, and whether that
+  pulled in PySwitchbot or bleak.
+* setup: setting up the integration with a simulated fleet, including the
+  platform and backend imports it triggers.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import importlib
+import json
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any
+
+# Home Assistant modules loaded by bootstrap before any integration.
+BOOTSTRAP_MODULES = (
+    "homeassistant.core",
+    "homeassistant.config_entries",
+    "homeassistant.data_entry_flow",
+    "homeassistant.helpers.config_validation",
+    "homeassistant.helpers.device_registry",
+    "homeassistant.helpers.entity",
+    "homeassistant.helpers.entity_platform",
+    "homeassistant.helpers.event",
+    "homeassistant.helpers.restore_state",
+    "homeassistant.helpers.storage",
+    "homeassistant.helpers.update_coordinator",
+)
+BACKEND_MODULES = ("switchbot", "bleak")
+
+
+def _bench_import() -> dict[str, Any]:
+    """Import the integration like the config flow and setup would."""
+    # pylint: disable=import-outside-toplevel
+    from harness import DOMAIN
+
+    for module in BOOTSTRAP_MODULES:
+        importlib.import_module(module)
+
+    start = time.perf_counter()
+    importlib.import_module(f"custom_components.{DOMAIN}")
+    integration = time.perf_counter() - start
+    importlib.import_module(f"custom_components.{DOMAIN}.config_flow")
+    config_flow = time.perf_counter() - start - integration
+    loaded = [module for module in BACKEND_MODULES if module in sys.modules]
+
+    start = time.perf_counter()
+    importlib.import_module("switchbot")
+    backend = time.perf_counter() - start
+
+    return {
+        "integration_ms": integration * 1000,
+        "config_flow_ms": config_flow * 1000,
+        "backend_ms": backend * 1000,
+        "backend_loaded": loaded,
+    }
+
+
+async def _async_bench_setup(devices: int) -> dict[str, Any]:
+    """Set up the integration for a simulated fleet."""
+    # pylint: disable=import-outside-toplevel
+    import fleet
+    from harness import async_setup_integration, async_start_hass, write_config_entries
+
+    sim = fleet.SimulatedFleet(bots=devices // 2, curtains=devices - devices // 2)
+    fleet.install(sim)
+
+    with tempfile.TemporaryDirectory() as config_dir:
+        write_config_entries(config_dir, sim)
+        hass = await async_start_hass(config_dir)
+        start = time.perf_counter()
+        await async_setup_integration(hass)
+        setup = time.perf_counter() - start
+        await hass.async_stop(force=True)
+
+    return {"setup_ms": setup * 1000}
+
+
+def _run_child(phase: str, devices: int) -> dict[str, Any]:
+    """Run one measurement in a fresh interpreter."""
+    result = subprocess.run(
+        [sys.executable, __file__, "--child", phase, "--devices", str(devices)],
+        capture_output=True,
+        check=True,
+        text=True,
+    )
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+def main() -> None:
+    """Repeat the measurements and print their medians."""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--devices", type=int, default=10)
+    parser.add_argument("--json", action="store_true", help="print JSON")
+    parser.add_argument("--child", choices=("import", "setup"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child == "import":
+        print(json.dumps(_bench_import()))
+        return
+    if args.child == "setup":
+        print(json.dumps(asyncio.run(_async_bench_setup(args.devices))))
+        return
+
+    runs = [
+        {
+            **_run_child("import", args.devices),
+            **_run_child("setup", args.devices),
+        }
+        for _ in range(args.runs)
+    ]
+    result = {
+        key: round(statistics.median(run[key] for run in runs), 1)
+        for key in ("integration_ms", "config_flow_ms", "backend_ms", "setup_ms")
+    }
+    result["backend_loaded_on_import"] = runs[0]["backend_loaded"]
+    result["devices"] = args.devices
+    result["runs"] = args.runs
+
+    if args.json:
+        print(json.dumps(result))
+        return
+    print(
+        f"import {result['integration_ms']:.1f}ms  "
+        f"config flow {result['config_flow_ms']:.1f}ms  "
+        f"backend {result['backend_ms']:.1f}ms "
+        f"(loaded on import: {', '.join(result['backend_loaded_on_import']) or 'no'})  "
+        f"setup of {args.devices} devices {result['setup_ms']:.1f}ms"
+    )
+
+
+if __name__ == "__main__":
+    main()
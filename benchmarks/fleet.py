@@ -0,0 +1,286 @@
+"""Simulated SwitchBot fleet behind a fake bleak radio.
+
+The real PySwitchbot library and the integration run unchanged on top of
+this module: ``install()`` registers a fake ``bleak`` package whose scanner
+and client talk to simulated bots and curtains instead of a Bluetooth
+adapter, so everything runs offline.
+"""
+from __future__ import annotations
+
+import asyncio
+from dataclasses import dataclass, field
+import random
+import sys
+import time
+import types
+from typing import Any
+
+SERVICE_UUID = "cba20d00-224d-11e6-9fb8-0002a5d5c51b"
+SERVICE_DATA_UUID = "00000d00-0000-1000-8000-00805f9b34fb"
+
+
+@dataclass
+class SimulatedDevice:
+    """A simulated bot or curtain."""
+
+    address: str
+    model: str
+    rssi: int
+    battery: int = 100
+    switch_mode: bool = False
+    is_on: bool = False
+    calibration: bool = True
+    light_level: int = 5
+    position: float = 0.0
+    target: float = 0.0
+    travel_time: float = 10.0
+    _moved_at: float = field(default_factory=time.monotonic)
+
+    @property
+    def key(self) -> str:
+        """Return the advertisement table key of the device."""
+        return self.address.replace(":", "").lower()
+
+    def _update_motion(self) -> bool:
+        """Advance the curtain towards its target, return true while moving."""
+        now = time.monotonic()
+        step = (now - self._moved_at) * 100 / self.travel_time
+        self._moved_at = now
+        if abs(self.target - self.position) <= step:
+            self.position = self.target
+            return False
+        self.position += step if self.target > self.position else -step
+        return True
+
+    def service_data(self) -> bytes:
+        """Encode the current state as Switchbot service data."""
+        if self.model == "H":
+            flags = (0x80 if self.switch_mode else 0) | (
+                0 if self.is_on or not self.switch_mode else 0x40
+            )
+            return bytes((ord("H"), flags, self.battery & 0x7F))
+
+        in_motion = self._update_motion()
+        # Curtains advertise 0 for open, the library reverses it.
+        raw_position = 100 - round(self.position)
+        return bytes(
+            (
+                ord("c"),
+                0x40 if self.calibration else 0,
+                self.battery & 0x7F,
+                (0x80 if in_motion else 0) | raw_position,
+                (self.light_level << 4) | 0,
+            )
+        )
+
+    def handle_command(self, key: str) -> bytes:
+        """Apply a command key, return the notification payload."""
+        key = key.lower()
+        if self.model == "H":
+            if key == "570101":
+                self.is_on = True
+            elif key == "570102":
+                self.is_on = False
+            return b"\x01"
+
+        self._update_motion()
+        if key == "570f450100ff":
+            self.target = self.position
+        elif key.startswith("570f450105ff"):
+            self.target = 100 - int(key[-2:], 16)
+        return b"\x01"
+
+
+@dataclass
+class SimulatedFleet:
+    """A set of simulated devices and the radio conditions around them."""
+
+    bots: int = 10
+    curtains: int = 10
+    adv_interval: float = 1.0
+    connect_latency: float = 0.2
+    command_latency: float = 0.05
+    packet_loss: float = 0.0
+    seed: int = 0
+    devices: dict[str, SimulatedDevice] = field(init=False)
+
+    def __post_init__(self) -> None:
+        """Create the simulated devices."""
+        self.random = random.Random(self.seed)
+        self.devices = {}
+        for index in range(self.bots + self.curtains):
+            address = ":".join(
+                f"{byte:02X}" for byte in b"\xaa\xbb\xcc" + index.to_bytes(3, "big")
+            )
+            self.devices[address.lower()] = SimulatedDevice(
+                address=address,
+                model="H" if index < self.bots else "c",
+                rssi=self.random.randint(-90, -40),
+                battery=self.random.randint(20, 100),
+            )
+
+    def lost(self) -> bool:
+        """Return true if a packet should be dropped."""
+        return self.random.random() < self.packet_loss
+
+
+class BleakError(Exception):
+    """Fake bleak error."""
+
+
+@dataclass
+class BLEDevice:
+    """Fake BLE device."""
+
+    address: str
+    name: str
+    rssi: int
+
+
+@dataclass
+class AdvertisementData:
+    """Fake advertisement data."""
+
+    service_data: dict[str, bytes]
+    rssi: int
+
+
+class BleakScanner:
+    """Fake scanner emitting adverts of the simulated fleet."""
+
+    fleet: SimulatedFleet
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        """Initialize the scanner."""
+        self._callbacks: list[Any] = []
+        self._handles: list[asyncio.TimerHandle] = []
+
+    def register_detection_callback(self, callback: Any) -> None:
+        """Register an advertisement callback."""
+        self._callbacks.append(callback)
+
+    async def start(self) -> None:
+        """Start emitting adverts, each device at its own phase."""
+        loop = asyncio.get_running_loop()
+        for device in self.fleet.devices.values():
+            delay = self.fleet.random.uniform(0, self.fleet.adv_interval)
+            self._handles.append(loop.call_later(delay, self._advertise, device))
+
+    def _advertise(self, device: SimulatedDevice) -> None:
+        """Emit one advert and schedule the next one."""
+        loop = asyncio.get_running_loop()
+        self._handles.append(
+            loop.call_later(self.fleet.adv_interval, self._advertise, device)
+        )
+        if self.fleet.lost():
+            return
+        rssi = device.rssi + self.fleet.random.randint(-3, 3)
+        ble_device = BLEDevice(device.address, "WoDevice", rssi)
+        adv = AdvertisementData({SERVICE_DATA_UUID: device.service_data()}, rssi)
+        for callback in self._callbacks:
+            callback(ble_device, adv)
+
+    async def stop(self) -> None:
+        """Stop emitting adverts."""
+        for handle in self._handles:
+            handle.cancel()
+        self._handles.clear()
+
+
+class BleakClient:
+    """Fake GATT client connected to a simulated device."""
+
+    fleet: SimulatedFleet
+
+    def __init__(
+        self,
+        address_or_ble_device: Any,
+        disconnected_callback: Any = None,
+        **kwargs: Any,
+    ) -> None:
+        """Initialize the client."""
+        address = getattr(address_or_ble_device, "address", address_or_ble_device)
+        self._device = self.fleet.devices.get(address.lower())
+        self._disconnected_callback = disconnected_callback
+        self._notify: Any = None
+        self.is_connected = False
+
+    async def connect(self, **kwargs: Any) -> bool:
+        """Connect after the simulated latency."""
+        await asyncio.sleep(self.fleet.connect_latency)
+        if self._device is None or self.fleet.lost():
+            raise BleakError("Device not found")
+        self.is_connected = True
+        return True
+
+    async def disconnect(self) -> bool:
+        """Disconnect."""
+        self.is_connected = False
+        return True
+
+    async def start_notify(self, char_specifier: Any, callback: Any) -> None:
+        """Subscribe to notifications."""
+        self._notify = callback
+
+    async def stop_notify(self, char_specifier: Any) -> None:
+        """Unsubscribe from notifications."""
+        self._notify = None
+
+    async def write_gatt_char(
+        self, char_specifier: Any, data: bytes, response: bool = False
+    ) -> None:
+        """Deliver a command to the simulated device."""
+        if not self.is_connected:
+            raise BleakError("Not connected")
+        await asyncio.sleep(self.fleet.command_latency)
+        if self.fleet.lost():
+            return
+        result = self._device.handle_command(bytes(data).hex())
+        if self._notify is not None:
+            asyncio.get_running_loop().call_later(
+                self.fleet.command_latency, self._notify, 0, bytearray(result)
+            )
+
+    async def __aenter__(self) -> BleakClient:
+        """Connect as context manager."""
+        await self.connect()
+        return self
+
+    async def __aexit__(self, *args: Any) -> None:
+        """Disconnect as context manager."""
+        await self.disconnect()
+
+
+def install(fleet: SimulatedFleet) -> None:
+    """Register the fake bleak package for fleet before switchbot is imported.
+
+    Switchbot keeps a reference to the first module registered, later calls
+    only point the fake scanner and client at the new fleet.
+    """
+    BleakScanner.fleet = fleet
+    BleakClient.fleet = fleet
+
+    if getattr(sys.modules.get("bleak"), "BleakClient", None) is BleakClient:
+        return
+
+    bleak = types.ModuleType("bleak")
+    backends = types.ModuleType("bleak.backends")
+    device = types.ModuleType("bleak.backends.device")
+    scanner = types.ModuleType("bleak.backends.scanner")
+    device.BLEDevice = BLEDevice
+    scanner.AdvertisementData = AdvertisementData
+    backends.device = device
+    backends.scanner = scanner
+    bleak.backends = backends
+    bleak.BleakScanner = BleakScanner
+    bleak.BleakClient = BleakClient
+    bleak.BleakError = BleakError
+
+    sys.modules.update(
+        {
+            "bleak": bleak,
+            "bleak.backends": backends,
+            "bleak.backends.device": device,
+            "bleak.backends.scanner": scanner,
+        }
+    )
@@ -0,0 +1,128 @@
+"""Minimal Home Assistant instance running the integration offline."""
+from __future__ import annotations
+
+import json
+from pathlib import Path
+import sys
+from typing import Any
+
+from fleet import SimulatedFleet
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+DOMAIN = "switchbot-curtain"
+
+# The integration is loaded as a custom component from the repository.
+sys.path.insert(0, str(REPO_ROOT))
+
+
+def _config_entry(
+    entry_id: str, title: str, unique_id: str, data: dict[str, Any], options: Any
+) -> dict[str, Any]:
+    """Return a stored config entry."""
+    return {
+        "entry_id": entry_id,
+        "version": 1,
+        "domain": DOMAIN,
+        "title": title,
+        "data": data,
+        "options": options or {},
+        "pref_disable_new_entities": False,
+        "pref_disable_polling": False,
+        "source": "user",
+        "unique_id": unique_id,
+        "disabled_by": None,
+    }
+
+
+def write_config_entries(
+    config_dir: str,
+    fleet: SimulatedFleet,
+    options: dict[str, Any] | None = None,
+    hub: bool = False,
+) -> None:
+    """Store the config entries of the simulated devices, as HA would on boot.
+
+    Every device gets its own entry, or all of them share one hub entry.
+    """
+    devices = {
+        device.key: {
+            "mac": device.address.lower(),
+            "name": f"Bench {device.key}",
+            "sensor_type": "bot" if device.model == "H" else "curtain",
+        }
+        for device in fleet.devices.values()
+    }
+    if hub:
+        entries = [
+            _config_entry(
+                "bench_hub", "Bench hub", "hub", {"devices": devices}, options
+            )
+        ]
+    else:
+        entries = [
+            _config_entry(f"bench{index:06d}", data["name"], key, data, options)
+            for index, (key, data) in enumerate(devices.items())
+        ]
+    storage = Path(config_dir, ".storage")
+    storage.mkdir(exist_ok=True)
+    Path(storage, "core.config_entries").write_text(
+        json.dumps(
+            {
+                "version": 1,
+                "key": "core.config_entries",
+                "data": {"entries": entries},
+            }
+        )
+    )
+
+
+async def async_start_hass(config_dir: str) -> Any:
+    """Start a bare Home Assistant core with registries and config entries."""
+    # pylint: disable=import-outside-toplevel
+    from homeassistant import config_entries
+    from homeassistant.core import CoreState, HomeAssistant
+    from homeassistant.helpers import area_registry, device_registry, entity_registry
+
+    hass = HomeAssistant()
+    hass.config.config_dir = config_dir
+    hass.config.skip_pip = True
+    hass.config_entries = config_entries.ConfigEntries(hass, {})
+    await hass.config_entries.async_initialize()
+    await area_registry.async_load(hass)
+    await device_registry.async_load(hass)
+    await entity_registry.async_load(hass)
+    hass.state = CoreState.running
+    return hass
+
+
+async def async_import_integration(hass: Any) -> None:
+    """Import the integration and its platforms ahead of measurements."""
+    # pylint: disable=import-outside-toplevel
+    from homeassistant.loader import async_get_integration
+
+    integration = await async_get_integration(hass, DOMAIN)
+    component = integration.get_component()
+    for platforms in component.PLATFORMS_BY_TYPE.values():
+        for platform in platforms:
+            integration.get_platform(platform)
+
+
+async def async_setup_integration(hass: Any) -> None:
+    """Set up the integration and all stored entries."""
+    # pylint: disable=import-outside-toplevel
+    from homeassistant.setup import async_setup_component
+
+    assert await async_setup_component(hass, DOMAIN, {})
+    await hass.async_block_till_done()
+
+
+def entity_ids(hass: Any, domain: str) -> list[str]:
+    """Return the entity IDs the integration created in a domain."""
+    # pylint: disable=import-outside-toplevel
+    from homeassistant.helpers import entity_registry
+
+    return [
+        entry.entity_id
+        for entry in entity_registry.async_get(hass).entities.values()
+        if entry.platform == DOMAIN and entry.domain == domain
+    ]
@@ -0,0 +1,276 @@
+"""Stand-in Bluetooth proxy node for the integration's proxy transport.
+
+Serves the line based JSON protocol of transport.py with bleak, so it runs
+on any machine with a Bluetooth adapter near the devices. With --simulate
+the radio is replaced by the simulated fleet of fleet.py, which lets the
+transport be tried offline:
+
+    SWITCHBOT_PROXY_SECRET=... python benchmarks/proxy.py --simulate 4
+
+Only integrations knowing the shared secret are served. The proxy greets
+each connection with a nonce and accepts no request until the integration
+answered with an HMAC of it under the secret, see transport.py.
+
+The integration sends connect, disconnect, start_notify and write requests,
+each carrying an id answered by a result message. A scan message without id
+turns advertisement forwarding on or off.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import hashlib
+import hmac
+import json
+import logging
+import os
+import secrets
+from typing import Any
+
+_LOGGER = logging.getLogger("proxy")
+
+# As in const.py of the integration, only Switchbot advertisements are relayed.
+SERVICE_UUID = "cba20d00-224d-11e6-9fb8-0002a5d5c51b"
+SERVICE_DATA_UUID = "00000d00-0000-1000-8000-00805f9b34fb"
+AUTH_TIMEOUT = 5
+
+
+def digest(secret: str, role: str, nonce: str) -> str:
+    """Return the proof of knowing secret a role gives for a nonce."""
+    return hmac.new(
+        secret.encode(), f"{role}:{nonce}".encode(), hashlib.sha256
+    ).hexdigest()
+
+
+async def authenticate(
+    reader: asyncio.StreamReader, writer: asyncio.StreamWriter, secret: str
+) -> bool:
+    """Return true once the peer proved it knows secret, prove it back."""
+
+    def _send(message: dict[str, Any]) -> None:
+        writer.write(json.dumps(message).encode() + b"\n")
+
+    nonce = secrets.token_hex(16)
+    _send({"op": "hello", "nonce": nonce})
+    try:
+        message = json.loads(await asyncio.wait_for(reader.readline(), AUTH_TIMEOUT))
+        if message["op"] == "auth" and hmac.compare_digest(
+            message["digest"], digest(secret, "integration", nonce)
+        ):
+            _send(
+                {"op": "welcome", "digest": digest(secret, "proxy", message["nonce"])}
+            )
+            return True
+    except (
+        AttributeError,
+        KeyError,
+        OSError,
+        TypeError,
+        ValueError,
+        asyncio.TimeoutError,
+    ):
+        pass
+    _send({"op": "denied"})
+    return False
+
+
+class ProxySession:
+    """A connected integration and the devices it connected through us."""
+
+    def __init__(
+        self, bleak: Any, writer: asyncio.StreamWriter, rssi_offset: int
+    ) -> None:
+        """Initialize the session."""
+        self.bleak = bleak
+        self.writer = writer
+        self.rssi_offset = rssi_offset
+        self.scanner: Any = None
+        self.clients: dict[str, Any] = {}
+
+    def send(self, message: dict[str, Any]) -> None:
+        """Write a message to the integration."""
+        if not self.writer.is_closing():
+            self.writer.write(json.dumps(message).encode() + b"\n")
+
+    def advertised(self, device: Any, advertisement_data: Any) -> None:
+        """Forward a Switchbot advertisement."""
+        if (data := advertisement_data.service_data.get(SERVICE_DATA_UUID)) is None:
+            return
+        rssi = getattr(advertisement_data, "rssi", None)
+        if rssi is None:
+            rssi = device.rssi
+        self.send(
+            {
+                "op": "adv",
+                "address": device.address,
+                "name": device.name,
+                "rssi": rssi + self.rssi_offset,
+                "service_data": {SERVICE_DATA_UUID: bytes(data).hex()},
+            }
+        )
+
+    async def handle(self, message: dict[str, Any]) -> None:
+        """Carry out a request and answer with its result."""
+        error = None
+        try:
+            await getattr(self, f"op_{message['op']}")(message)
+        except Exception as err:  # pylint: disable=broad-except
+            error = str(err) or type(err).__name__
+        self.send({"op": "result", "id": message["id"], "error": error})
+
+    async def scan(self, on: bool) -> None:
+        """Start or stop forwarding advertisements."""
+        if on and self.scanner is None:
+            self.scanner = self.bleak.BleakScanner(filters={"UUIDs": [SERVICE_UUID]})
+            self.scanner.register_detection_callback(self.advertised)
+            await self.scanner.start()
+        elif not on and self.scanner is not None:
+            scanner, self.scanner = self.scanner, None
+            await scanner.stop()
+
+    async def op_connect(self, message: dict[str, Any]) -> None:
+        """Connect to a device."""
+        address = message["address"]
+
+        def _disconnected(_client: Any) -> None:
+            if self.clients.pop(address, None) is not None:
+                self.send({"op": "disconnected", "address": address})
+
+        client = self.bleak.BleakClient(
+            address, timeout=message["timeout"], disconnected_callback=_disconnected
+        )
+        await client.connect()
+        self.clients[address] = client
+
+    async def op_disconnect(self, message: dict[str, Any]) -> None:
+        """Disconnect from a device."""
+        if client := self.clients.pop(message["address"], None):
+            await client.disconnect()
+
+    async def op_start_notify(self, message: dict[str, Any]) -> None:
+        """Forward the notifications of a characteristic."""
+        address = message["address"]
+
+        def _notified(_sender: Any, data: bytearray) -> None:
+            self.send({"op": "notify", "address": address, "data": bytes(data).hex()})
+
+        await self.clients[address].start_notify(message["char"], _notified)
+
+    async def op_write(self, message: dict[str, Any]) -> None:
+        """Write to a characteristic."""
+        await self.clients[message["address"]].write_gatt_char(
+            message["char"], bytes.fromhex(message["data"]), message["response"]
+        )
+
+    async def close(self) -> None:
+        """Stop scanning and drop the connections of the session."""
+        await self.scan(False)
+        for client in self.clients.values():
+            await client.disconnect()
+        self.clients.clear()
+
+
+async def start_server(
+    bleak: Any, host: str, port: int, rssi_offset: int, secret: str
+) -> asyncio.Server:
+    """Start serving integrations with the scanners and clients of bleak."""
+
+    async def _session(
+        reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        peer = writer.get_extra_info("peername")
+        if not await authenticate(reader, writer, secret):
+            _LOGGER.warning("Refused %s, it doesn't know the secret", peer)
+            writer.close()
+            return
+        _LOGGER.info("Integration connected from %s", peer)
+        session = ProxySession(bleak, writer, rssi_offset)
+        tasks: set[asyncio.Task] = set()
+        try:
+            while line := await reader.readline():
+                if (message := json.loads(line))["op"] == "scan":
+                    await session.scan(message["on"])
+                    continue
+                # Requests run concurrently, a slow connect doesn't hold up writes.
+                task = asyncio.create_task(session.handle(message))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        except (OSError, ValueError) as err:
+            _LOGGER.info("Session with %s failed: %s", peer, err)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await session.close()
+            writer.close()
+            _LOGGER.info("Integration at %s disconnected", peer)
+
+    return await asyncio.start_server(_session, host, port)
+
+
+async def serve(
+    bleak: Any, host: str, port: int, rssi_offset: int, secret: str
+) -> None:
+    """Serve integrations until interrupted."""
+    server = await start_server(bleak, host, port, rssi_offset, secret)
+    _LOGGER.info("Proxy listening on %s:%d", host, port)
+    async with server:
+        await server.serve_forever()
+
+
+def main() -> None:
+    """Run the proxy."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--host",
+        default="127.0.0.1",
+        help="address to listen on, 0.0.0.0 to serve other machines",
+    )
+    parser.add_argument("--port", type=int, default=7777)
+    parser.add_argument(
+        "--simulate",
+        type=int,
+        metavar="N",
+        help="serve N simulated devices, half bots and half curtains",
+    )
+    parser.add_argument(
+        "--rssi-offset",
+        type=int,
+        default=0,
+        help="add to the signal strength reported for every device",
+    )
+    parser.add_argument(
+        "--secret",
+        default=os.environ.get("SWITCHBOT_PROXY_SECRET"),
+        help="shared secret, defaults to $SWITCHBOT_PROXY_SECRET",
+    )
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    if not args.secret:
+        parser.error("a shared secret is required, set SWITCHBOT_PROXY_SECRET")
+
+    logging.basicConfig(level=logging.INFO)
+    if args.simulate is not None:
+        # pylint: disable-next=import-outside-toplevel
+        import fleet
+
+        bots = args.simulate // 2
+        fleet.install(
+            fleet.SimulatedFleet(
+                bots=bots,
+                curtains=args.simulate - bots,
+                adv_interval=0.5,
+                seed=args.seed,
+            )
+        )
+
+    # pylint: disable-next=import-outside-toplevel
+    import bleak
+
+    try:
+        asyncio.run(serve(bleak, args.host, args.port, args.rssi_offset, args.secret))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
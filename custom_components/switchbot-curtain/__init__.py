@@ -1,27 +1,56 @@
 """Support for Switchbot devices."""
+from __future__ import annotations
 
-import switchbot
+from collections.abc import Mapping
+from typing import Any
 
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.const import CONF_SENSOR_TYPE, Platform
-from homeassistant.core import HomeAssistant
+from homeassistant.const import EVENT_HOMEASSISTANT_STOP, Platform
+from homeassistant.core import Event, HomeAssistant, callback
+from homeassistant.helpers import device_registry as dr
 
 from .const import (
     ATTR_BOT,
     ATTR_CURTAIN,
     COMMON_OPTIONS,
+    CONF_ADAPTERS,
+    CONF_DEVICES,
+    CONF_IDLE_TIMEOUT,
+    CONF_MAX_CONNECTIONS,
+    CONF_OPTIMISTIC,
+    CONF_PASSIVE_LISTENER,
+    CONF_PROXIES,
+    CONF_PROXY_SECRET,
     CONF_RETRY_COUNT,
     CONF_RETRY_TIMEOUT,
     CONF_SCAN_TIMEOUT,
     CONF_TIME_BETWEEN_UPDATE_COMMAND,
     DATA_COORDINATOR,
+    DATA_DEVICES,
+    DATA_PLATFORMS,
+    DEFAULT_ADAPTERS,
+    DEFAULT_IDLE_TIMEOUT,
+    DEFAULT_MAX_CONNECTIONS,
+    DEFAULT_OPTIMISTIC,
+    DEFAULT_PASSIVE_LISTENER,
+    DEFAULT_PROXIES,
+    DEFAULT_PROXY_SECRET,
     DEFAULT_RETRY_COUNT,
     DEFAULT_RETRY_TIMEOUT,
     DEFAULT_SCAN_TIMEOUT,
     DEFAULT_TIME_BETWEEN_UPDATE_COMMAND,
     DOMAIN,
+    HUB_MODEL,
+    MANUFACTURER,
+    SERVICE_SET_POSITIONS,
+)
+from .models import SwitchbotDeviceConfig, entry_devices
+from .util import (
+    async_import_api,
+    async_import_coordinator,
+    parse_adapters,
+    parse_proxies,
 )
-from .coordinator import SwitchbotDataUpdateCoordinator
 
 PLATFORMS_BY_TYPE = {
     ATTR_BOT: [Platform.SWITCH, Platform.SENSOR],
@@ -39,10 +68,22 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
             CONF_RETRY_COUNT: DEFAULT_RETRY_COUNT,
             CONF_RETRY_TIMEOUT: DEFAULT_RETRY_TIMEOUT,
             CONF_SCAN_TIMEOUT: DEFAULT_SCAN_TIMEOUT,
+            CONF_PASSIVE_LISTENER: DEFAULT_PASSIVE_LISTENER,
+            CONF_IDLE_TIMEOUT: DEFAULT_IDLE_TIMEOUT,
+            CONF_MAX_CONNECTIONS: DEFAULT_MAX_CONNECTIONS,
+            CONF_ADAPTERS: DEFAULT_ADAPTERS,
+            CONF_OPTIMISTIC: DEFAULT_OPTIMISTIC,
+            CONF_PROXIES: DEFAULT_PROXIES,
+            CONF_PROXY_SECRET: DEFAULT_PROXY_SECRET,
         }
 
         hass.config_entries.async_update_entry(entry, options=options)
 
+    # The BLE backend is only loaded once a coordinator is needed, before the
+    # check below so entries set up concurrently don't each create one.
+    api = await async_import_api(hass)
+    coordinator_module = await async_import_coordinator(hass)
+
     # Use same coordinator instance for all entities.
     # Uses BTLE advertisement data, all Switchbot devices in range is stored here.
     if DATA_COORDINATOR not in hass.data[DOMAIN]:
@@ -50,60 +91,160 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
         if COMMON_OPTIONS not in hass.data[DOMAIN]:
             hass.data[DOMAIN][COMMON_OPTIONS] = {**entry.options}
 
-        switchbot.DEFAULT_RETRY_TIMEOUT = hass.data[DOMAIN][COMMON_OPTIONS][
-            CONF_RETRY_TIMEOUT
-        ]
-
         # Store api in coordinator.
-        coordinator = SwitchbotDataUpdateCoordinator(
+        coordinator = coordinator_module.SwitchbotDataUpdateCoordinator(
             hass,
-            update_interval=hass.data[DOMAIN][COMMON_OPTIONS][
-                CONF_TIME_BETWEEN_UPDATE_COMMAND
-            ],
-            api=switchbot,
-            retry_count=hass.data[DOMAIN][COMMON_OPTIONS][CONF_RETRY_COUNT],
-            scan_timeout=hass.data[DOMAIN][COMMON_OPTIONS][CONF_SCAN_TIMEOUT],
+            api=api,
+            adapters=parse_adapters(
+                hass.data[DOMAIN][COMMON_OPTIONS].get(CONF_ADAPTERS, DEFAULT_ADAPTERS)
+            ),
+            proxies=parse_proxies(
+                hass.data[DOMAIN][COMMON_OPTIONS].get(CONF_PROXIES, DEFAULT_PROXIES)
+            ),
+            proxy_secret=hass.data[DOMAIN][COMMON_OPTIONS].get(
+                CONF_PROXY_SECRET, DEFAULT_PROXY_SECRET
+            ),
+            **_coordinator_options(hass.data[DOMAIN][COMMON_OPTIONS]),
         )
 
         hass.data[DOMAIN][DATA_COORDINATOR] = coordinator
 
+        if coordinator.passive_listener:
+            await coordinator.async_start_listener()
+
+        async def _async_stop_coordinator(event: Event) -> None:
+            await coordinator.async_stop()
+
+        hass.bus.async_listen_once(EVENT_HOMEASSISTANT_STOP, _async_stop_coordinator)
+
     else:
         coordinator = hass.data[DOMAIN][DATA_COORDINATOR]
 
-    await coordinator.async_config_entry_first_refresh()
+    await coordinator.async_first_refresh()
 
     entry.async_on_unload(entry.add_update_listener(_async_update_listener))
 
-    hass.data[DOMAIN][entry.entry_id] = {DATA_COORDINATOR: coordinator}
+    devices = entry_devices(entry)
+    platforms = sorted(
+        {
+            platform
+            for device in devices
+            for platform in PLATFORMS_BY_TYPE[device.sensor_type]
+        }
+    )
+
+    if CONF_DEVICES in entry.data:
+        _async_register_hub(hass, entry, devices)
 
-    sensor_type = entry.data[CONF_SENSOR_TYPE]
+    hass.data[DOMAIN][entry.entry_id] = {
+        DATA_COORDINATOR: coordinator,
+        DATA_DEVICES: devices,
+        DATA_PLATFORMS: platforms,
+    }
 
-    hass.config_entries.async_setup_platforms(entry, PLATFORMS_BY_TYPE[sensor_type])
+    # A hub sets up each platform once for all of its devices.
+    hass.config_entries.async_setup_platforms(entry, platforms)
 
     return True
 
 
+@callback
+def _async_register_hub(
+    hass: HomeAssistant, entry: ConfigEntry, devices: list[SwitchbotDeviceConfig]
+) -> None:
+    """Register the hub device and drop devices removed from the hub."""
+    device_registry = dr.async_get(hass)
+    hub_identifier = (DOMAIN, entry.entry_id)
+    device_registry.async_get_or_create(
+        config_entry_id=entry.entry_id,
+        identifiers={hub_identifier},
+        manufacturer=MANUFACTURER,
+        model=HUB_MODEL,
+        name=entry.title,
+    )
+
+    connections = {
+        (dr.CONNECTION_NETWORK_MAC, dr.format_mac(device.mac)) for device in devices
+    }
+    for device_entry in dr.async_entries_for_config_entry(
+        device_registry, entry.entry_id
+    ):
+        if hub_identifier in device_entry.identifiers:
+            continue
+        if connections.isdisjoint(device_entry.connections):
+            device_registry.async_update_device(
+                device_entry.id, remove_config_entry_id=entry.entry_id
+            )
+
+
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Unload a config entry."""
-    sensor_type = entry.data[CONF_SENSOR_TYPE]
     unload_ok = await hass.config_entries.async_unload_platforms(
-        entry, PLATFORMS_BY_TYPE[sensor_type]
+        entry, hass.data[DOMAIN][entry.entry_id][DATA_PLATFORMS]
     )
 
     if unload_ok:
         hass.data[DOMAIN].pop(entry.entry_id)
 
-        if len(hass.config_entries.async_entries(DOMAIN)) == 0:
-            hass.data.pop(DOMAIN)
+        # The entry being unloaded is still listed, look for other loaded ones.
+        if not any(
+            other.entry_id in hass.data[DOMAIN]
+            for other in hass.config_entries.async_entries(DOMAIN)
+        ):
+            # The cover platform registers the service for all entries.
+            hass.services.async_remove(DOMAIN, SERVICE_SET_POSITIONS)
+
+            # Shared options are kept for the entries set up again on reload.
+            if coordinator := hass.data[DOMAIN].pop(DATA_COORDINATOR, None):
+                await coordinator.async_stop()
 
     return unload_ok
 
 
 async def _async_update_listener(hass: HomeAssistant, entry: ConfigEntry) -> None:
     """Handle options update."""
-    # Update entity options stored in hass.
-    if {**entry.options} != hass.data[DOMAIN][COMMON_OPTIONS]:
-        hass.data[DOMAIN][COMMON_OPTIONS] = {**entry.options}
-        hass.data[DOMAIN].pop(DATA_COORDINATOR)
-
-    await hass.config_entries.async_reload(entry.entry_id)
+    if entry_devices(entry) != hass.data[DOMAIN][entry.entry_id][DATA_DEVICES]:
+        # Devices were added to or removed from a hub.
+        hass.async_create_task(hass.config_entries.async_reload(entry.entry_id))
+
+    # Options are shared, the first entry updated applies them for all.
+    previous = hass.data[DOMAIN][COMMON_OPTIONS]
+    if {**entry.options} == previous:
+        return
+
+    hass.data[DOMAIN][COMMON_OPTIONS] = {**entry.options}
+
+    if all(
+        entry.options.get(key, default) == previous.get(key, default)
+        for key, default in (
+            (CONF_ADAPTERS, DEFAULT_ADAPTERS),
+            (CONF_PROXIES, DEFAULT_PROXIES),
+            (CONF_PROXY_SECRET, DEFAULT_PROXY_SECRET),
+        )
+    ):
+        await hass.data[DOMAIN][DATA_COORDINATOR].async_apply_options(
+            **_coordinator_options(entry.options)
+        )
+        return
+
+    # Adapters and proxies can't be swapped on a running coordinator, restart it.
+    coordinator = hass.data[DOMAIN].pop(DATA_COORDINATOR)
+    await coordinator.async_stop()
+    for other_entry in hass.config_entries.async_entries(DOMAIN):
+        hass.async_create_task(hass.config_entries.async_reload(other_entry.entry_id))
+
+
+def _coordinator_options(options: Mapping[str, Any]) -> dict[str, Any]:
+    """Return the coordinator settings held in the options."""
+    return {
+        "update_interval": options[CONF_TIME_BETWEEN_UPDATE_COMMAND],
+        "retry_count": options[CONF_RETRY_COUNT],
+        "retry_timeout": options[CONF_RETRY_TIMEOUT],
+        "scan_timeout": options[CONF_SCAN_TIMEOUT],
+        "passive_listener": options.get(
+            CONF_PASSIVE_LISTENER, DEFAULT_PASSIVE_LISTENER
+        ),
+        "idle_timeout": options.get(CONF_IDLE_TIMEOUT, DEFAULT_IDLE_TIMEOUT),
+        "max_connections": options.get(CONF_MAX_CONNECTIONS, DEFAULT_MAX_CONNECTIONS),
+        "optimistic": options.get(CONF_OPTIMISTIC, DEFAULT_OPTIMISTIC),
+    }
@@ -0,0 +1,450 @@
+"""Bluetooth adapter management for Switchbot scans and commands."""
+from __future__ import annotations
+
+import asyncio
+from collections.abc import AsyncIterator, Callable
+from contextlib import asynccontextmanager
+from functools import partial
+import logging
+import time
+from typing import TYPE_CHECKING, Any
+from weakref import WeakSet
+
+import bleak
+
+from homeassistant.core import HomeAssistant, callback
+
+from .arbiter import CommandPriority, async_get_adapter_arbiter
+from .breaker import CircuitBreaker
+from .connection import SwitchbotConnectionPool, pooled_device_class
+from .const import ADVERTISEMENT_SOURCE_MAX_AGE, SERVICE_DATA_UUID, SERVICE_UUID
+from .decoder import decode_advertisement
+from .transport import ProxyClient, ProxyScanner, ProxyTransport
+
+if TYPE_CHECKING:
+    import switchbot
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def _device_key(mac: str) -> str:
+    """Return the advertisement table key for a MAC address."""
+    return mac.replace(":", "").lower()
+
+
+class AdvertisementMerger:
+    """Follow each device through the adapter hearing it loudest.
+
+    Advertisements of a device heard by several adapters are only accepted
+    from one of them. Another adapter takes over once it hears the device
+    louder, or when the current one has not heard it for max_age seconds.
+    """
+
+    def __init__(self, max_age: float = ADVERTISEMENT_SOURCE_MAX_AGE) -> None:
+        """Initialize the merger."""
+        self.max_age = max_age
+        # Adapter, signal strength and time of the last accepted advertisement.
+        self._sources: dict[str, tuple[str, int, float]] = {}
+
+    @callback
+    def async_accept(self, adapter: str, mac: str, rssi: int | None) -> bool:
+        """Return true if the advertisement of mac heard by adapter is kept."""
+        now = time.monotonic()
+        rssi = -1000 if rssi is None else rssi
+        if (source := self._sources.get(mac)) is not None:
+            source_adapter, source_rssi, heard = source
+            if (
+                source_adapter != adapter
+                and rssi <= source_rssi
+                and now - heard < self.max_age
+            ):
+                return False
+        self._sources[mac] = (adapter, rssi, now)
+        return True
+
+
+class SwitchbotAdapter:
+    """A Bluetooth adapter used for scanning and device connections."""
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        *,
+        name: str,
+        scanner_factory: Callable[[], bleak.BleakScanner],
+        client_factory: Callable[..., bleak.BleakClient],
+        idle_timeout: float,
+        max_connections: int,
+        transport: ProxyTransport | None = None,
+    ) -> None:
+        """Initialize the adapter."""
+        self.name = name
+        # Set for remote proxies, None for a local adapter.
+        self.transport = transport
+        self.scanner_factory = scanner_factory
+        # Serialises scans and opening connections on this adapter.
+        self.arbiter = async_get_adapter_arbiter(hass, name)
+        self.pool = SwitchbotConnectionPool(
+            hass,
+            idle_timeout=idle_timeout,
+            max_connections=max_connections,
+            client_factory=client_factory,
+            arbiter=self.arbiter,
+        )
+        self.rssi: dict[str, int] = {}
+        self.scans = 0
+        self.scan_time = 0.0
+        self.scan_pauses = 0
+        self.commands = 0
+        self.command_time = 0.0
+        self.active_commands = 0
+
+    @property
+    def remote(self) -> bool:
+        """Return true if the adapter is a remote proxy."""
+        return self.transport is not None
+
+    @property
+    def reachable(self) -> bool:
+        """Return true unless the adapter is a proxy that can't be reached."""
+        return self.transport is None or self.transport.connected
+
+    @callback
+    def async_raw(
+        self,
+        device: bleak.backends.device.BLEDevice,
+        advertisement_data: bleak.backends.scanner.AdvertisementData,
+    ) -> tuple[str, bytes, int | None] | None:
+        """Return the table key, service data and signal of an advertisement.
+
+        Return None unless the advertisement carries Switchbot service data.
+        """
+        if (data := advertisement_data.service_data.get(SERVICE_DATA_UUID)) is None:
+            return None
+
+        mac = _device_key(device.address)
+        if (rssi := device.rssi) is not None:
+            self.rssi[mac] = rssi
+        return mac, data, rssi
+
+    @callback
+    def async_parse(
+        self,
+        device: bleak.backends.device.BLEDevice,
+        advertisement_data: bleak.backends.scanner.AdvertisementData,
+    ) -> tuple[str, dict[str, Any]] | None:
+        """Decode a raw advertisement, return its table key and data."""
+        if (raw := self.async_raw(device, advertisement_data)) is None:
+            return None
+
+        mac, data, rssi = raw
+        return mac, decode_advertisement(device.address, data, rssi)
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return adapter utilisation."""
+        return {
+            "scans": self.scans,
+            "scan_time": round(self.scan_time, 3),
+            "scan_pauses": self.scan_pauses,
+            "waiting": self.arbiter.waiting,
+            "commands": self.commands,
+            "command_time": round(self.command_time, 3),
+            "active_commands": self.active_commands,
+            "open_connections": self.pool.open_connections,
+            "reachable": self.reachable,
+        }
+
+
+class AdapterManager:
+    """Spread scans over adapters and route commands by signal strength."""
+
+    def __init__(self, adapters: list[SwitchbotAdapter]) -> None:
+        """Initialize the adapter manager."""
+        self.adapters = adapters
+        self.local_adapters = [adapter for adapter in adapters if not adapter.remote]
+        self.remote_adapters = [adapter for adapter in adapters if adapter.remote]
+        # Command objects created for devices, for applying new options.
+        self.devices: WeakSet[switchbot.SwitchbotDevice] = WeakSet()
+        self.routes: dict[str, str] = {}
+        # Failure tracking per device, shared by all its command objects.
+        self.breakers: dict[str, CircuitBreaker] = {}
+        self._last_scan: dict[str, float] = {adapter.name: 0.0 for adapter in adapters}
+
+    @classmethod
+    def from_interfaces(
+        cls,
+        hass: HomeAssistant,
+        interfaces: list[int],
+        *,
+        idle_timeout: float,
+        max_connections: int,
+        proxies: list[tuple[str, int]] | None = None,
+        proxy_secret: str = "",
+    ) -> AdapterManager:
+        """Create a manager for local hci adapters and remote proxies."""
+        transports = [
+            ProxyTransport(hass, host, port, proxy_secret)
+            for host, port in proxies or ()
+        ]
+        return cls(
+            [
+                SwitchbotAdapter(
+                    hass,
+                    name=f"hci{interface}",
+                    scanner_factory=partial(
+                        bleak.BleakScanner,
+                        filters={"UUIDs": [SERVICE_UUID]},
+                        adapter=f"hci{interface}",
+                    ),
+                    client_factory=partial(
+                        bleak.BleakClient, adapter=f"hci{interface}"
+                    ),
+                    idle_timeout=idle_timeout,
+                    max_connections=max_connections,
+                )
+                for interface in interfaces
+            ]
+            + [
+                SwitchbotAdapter(
+                    hass,
+                    name=transport.name,
+                    scanner_factory=partial(ProxyScanner, transport),
+                    client_factory=partial(ProxyClient, transport),
+                    idle_timeout=idle_timeout,
+                    max_connections=max_connections,
+                    transport=transport,
+                )
+                for transport in transports
+            ]
+        )
+
+    @callback
+    def async_pick_scanner(self) -> SwitchbotAdapter:
+        """Return the local adapter to scan with, preferring idle ones."""
+        adapter = min(
+            self.local_adapters,
+            key=lambda adapter: (
+                adapter.active_commands,
+                adapter.pool.open_connections,
+                self._last_scan[adapter.name],
+            ),
+        )
+        self._last_scan[adapter.name] = time.monotonic()
+        return adapter
+
+    async def async_scan(
+        self,
+        adapter: SwitchbotAdapter,
+        *,
+        scan_timeout: float,
+        targets: set[str],
+        first_seen: dict[str, float] | None = None,
+    ) -> dict[str, Any]:
+        """Run a discovery scan on an adapter.
+
+        The scan ends as soon as every target has been seen and scan_timeout
+        is only an upper bound, an empty set of targets listens for
+        scan_timeout. Remote proxies listen alongside adapter and only
+        devices heard during the scan are returned. The seconds until each
+        device was first heard are stored in first_seen.
+        """
+        return await self._async_targeted_scan(
+            [adapter, *self.remote_adapters], targets, scan_timeout, first_seen
+        )
+
+    async def _async_targeted_scan(
+        self,
+        adapters: list[SwitchbotAdapter],
+        targets: set[str],
+        scan_timeout: float,
+        first_seen: dict[str, float] | None,
+    ) -> dict[str, Any]:
+        """Scan on adapters until every target reported or scan_timeout passed.
+
+        A device heard by several adapters is reported by the one hearing it
+        loudest. A proxy that can't be reached is left out of the scan.
+        """
+        seen: dict[str, Any] = {}
+        merger = AdvertisementMerger(scan_timeout)
+        # Set to end the scan on every adapter, or to let commands through.
+        wakes = [asyncio.Event() for _ in adapters]
+        done = False
+
+        @callback
+        def _async_heard(
+            adapter: SwitchbotAdapter, mac: str, adv: dict[str, Any], elapsed: float
+        ) -> None:
+            nonlocal done
+            if not merger.async_accept(adapter.name, mac, adv["data"].get("rssi")):
+                return
+            if first_seen is not None and mac not in seen:
+                first_seen[mac] = elapsed
+            seen[mac] = adv
+            if targets and targets.issubset(seen):
+                done = True
+                for wake in wakes:
+                    wake.set()
+
+        async def _async_scan(adapter: SwitchbotAdapter, wake: asyncio.Event) -> None:
+            nonlocal done
+            try:
+                await self._async_scan_adapter(
+                    adapter, scan_timeout, wake, _async_heard, lambda: done
+                )
+            except (bleak.BleakError, OSError) as err:
+                if adapter.remote:
+                    _LOGGER.debug("Scan on %s failed: %s", adapter.name, err)
+                    return
+                done = True
+                for other_wake in wakes:
+                    other_wake.set()
+                raise
+
+        await asyncio.gather(
+            *(_async_scan(adapter, wake) for adapter, wake in zip(adapters, wakes))
+        )
+
+        if missing := targets.difference(seen):
+            _LOGGER.debug(
+                "Scan on %s timed out, missing: %s",
+                ", ".join(adapter.name for adapter in adapters),
+                ", ".join(sorted(missing)),
+            )
+
+        return seen
+
+    async def _async_scan_adapter(
+        self,
+        adapter: SwitchbotAdapter,
+        scan_timeout: float,
+        wake: asyncio.Event,
+        heard: Callable[[SwitchbotAdapter, str, dict[str, Any], float], None],
+        done: Callable[[], bool],
+    ) -> None:
+        """Pass what adapter hears to heard until done or scan_timeout passed.
+
+        The scan steps aside while commands wait for the adapter and resumes
+        for the remaining time once they are done.
+        """
+        remaining = scan_timeout
+        scanned = 0.0
+        resumed = time.monotonic()
+
+        @callback
+        def _async_detected(
+            device: bleak.backends.device.BLEDevice,
+            advertisement_data: bleak.backends.scanner.AdvertisementData,
+        ) -> None:
+            if (parsed := adapter.async_parse(device, advertisement_data)) is None:
+                return
+            heard(adapter, *parsed, scanned + time.monotonic() - resumed)
+
+        try:
+            while True:
+                wake.clear()
+                async with adapter.arbiter.async_acquire(CommandPriority.SCAN, wake):
+                    scanner = adapter.scanner_factory()
+                    scanner.register_detection_callback(_async_detected)
+                    resumed = time.monotonic()
+                    await scanner.start()
+                    try:
+                        await asyncio.wait_for(wake.wait(), remaining)
+                    except asyncio.TimeoutError:
+                        pass
+                    finally:
+                        await scanner.stop()
+                        scanned += time.monotonic() - resumed
+                        remaining = scan_timeout - scanned
+
+                if not wake.is_set() or done() or remaining <= 0:
+                    break
+                adapter.scan_pauses += 1
+                _LOGGER.debug("Scan on %s paused for waiting commands", adapter.name)
+        finally:
+            adapter.scans += 1
+            adapter.scan_time += scanned
+
+    @callback
+    def async_route(self, mac: str) -> SwitchbotAdapter:
+        """Return the adapter to reach mac through."""
+        # Keep using an adapter that already holds a connection to the device.
+        for adapter in self.adapters:
+            if adapter.pool.async_is_open(mac):
+                return adapter
+
+        key = _device_key(mac)
+        adapter = max(
+            self.adapters,
+            key=lambda adapter: (
+                adapter.reachable,
+                adapter.rssi.get(key, -1000),
+            ),
+        )
+
+        if self.routes.get(key) != adapter.name:
+            _LOGGER.debug(
+                "Routing %s through %s (rssi %s)",
+                mac,
+                adapter.name,
+                adapter.rssi.get(key),
+            )
+            self.routes[key] = adapter.name
+
+        return adapter
+
+    @asynccontextmanager
+    async def async_connection(self, mac: str, timeout: float) -> AsyncIterator[Any]:
+        """Lease a pooled connection to mac on the best adapter."""
+        adapter = self.async_route(mac)
+        adapter.active_commands += 1
+        start = time.monotonic()
+
+        try:
+            async with adapter.pool.async_connection(mac, timeout) as conn:
+                yield conn
+        finally:
+            adapter.active_commands -= 1
+            adapter.commands += 1
+            adapter.command_time += time.monotonic() - start
+
+    async def async_connect(self, mac: str, timeout: float) -> None:
+        """Open a connection to mac ahead of its next command."""
+        await self.async_route(mac).pool.async_connect(mac, timeout)
+
+    @callback
+    def async_create_device(
+        self,
+        device_class: type[switchbot.SwitchbotDevice],
+        *,
+        retry_timeout: float,
+        **kwargs: Any,
+    ) -> switchbot.SwitchbotDevice:
+        """Create a device command object that sends through the adapters."""
+        device = pooled_device_class(device_class)(**kwargs)
+        device.connections = self
+        device.breaker = self.async_get_breaker(kwargs["mac"])
+        device.retry_timeout = retry_timeout
+        self.devices.add(device)
+        return device
+
+    @callback
+    def async_get_breaker(self, mac: str) -> CircuitBreaker:
+        """Return the circuit breaker shared by all command objects of mac."""
+        key = _device_key(mac)
+        if (breaker := self.breakers.get(key)) is None:
+            breaker = self.breakers[key] = CircuitBreaker()
+        return breaker
+
+    async def async_close(self) -> None:
+        """Close all pooled connections and proxy transports."""
+        for adapter in self.adapters:
+            await adapter.pool.async_close()
+            if adapter.transport is not None:
+                await adapter.transport.async_close()
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return routing decisions and adapter utilisation."""
+        return {
+            "routes": dict(self.routes),
+            "adapters": {adapter.name: adapter.as_dict() for adapter in self.adapters},
+        }
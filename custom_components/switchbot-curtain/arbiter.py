@@ -0,0 +1,109 @@
+"""Prioritised access to a Bluetooth adapter for scans and connections."""
+from __future__ import annotations
+
+import asyncio
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from enum import IntEnum
+import heapq
+import itertools
+
+from homeassistant.core import Context, HomeAssistant, callback
+
+from .const import DATA_ADAPTER_ARBITERS, DOMAIN
+
+
+class CommandPriority(IntEnum):
+    """Priority classes for adapter use, lowest value served first."""
+
+    STOP = 0
+    USER = 1
+    AUTOMATION = 2
+    SCAN = 3
+
+
+# Priority of the command the current task is sending.
+command_priority: ContextVar[CommandPriority] = ContextVar(
+    "command_priority", default=CommandPriority.AUTOMATION
+)
+
+
+@callback
+def async_command_priority(command: str, context: Context | None) -> CommandPriority:
+    """Return the priority of a command issued in context."""
+    if command == "stop":
+        return CommandPriority.STOP
+    if context is not None and context.user_id is not None:
+        return CommandPriority.USER
+    return CommandPriority.AUTOMATION
+
+
+class AdapterArbiter:
+    """Grant exclusive use of an adapter in priority order.
+
+    A holder may pass an event that is set as soon as a more urgent request
+    queues up, so long running scans can step aside and resume afterwards.
+    """
+
+    def __init__(self) -> None:
+        """Initialize the arbiter."""
+        self._held = False
+        self._holder_priority: CommandPriority | None = None
+        self._preempt: asyncio.Event | None = None
+        self._waiters: list[tuple[int, int, asyncio.Future[None]]] = []
+        self._order = itertools.count()
+
+    @property
+    def waiting(self) -> int:
+        """Return the number of queued requests."""
+        return sum(not future.done() for _, _, future in self._waiters)
+
+    @asynccontextmanager
+    async def async_acquire(
+        self, priority: CommandPriority, preempt: asyncio.Event | None = None
+    ) -> AsyncIterator[None]:
+        """Hold the adapter, preempt is set when a more urgent request waits."""
+        if self._held or self.waiting:
+            future = asyncio.get_running_loop().create_future()
+            heapq.heappush(self._waiters, (priority, next(self._order), future))
+            if (
+                self._preempt is not None
+                and self._holder_priority is not None
+                and priority < self._holder_priority
+            ):
+                self._preempt.set()
+            try:
+                await future
+            except asyncio.CancelledError:
+                if future.done() and not future.cancelled():
+                    # Granted while being cancelled, pass it on.
+                    self._release()
+                raise
+
+        self._held = True
+        self._holder_priority = priority
+        self._preempt = preempt
+        try:
+            yield
+        finally:
+            self._release()
+
+    @callback
+    def _release(self) -> None:
+        """Hand the adapter to the most urgent waiter."""
+        self._holder_priority = None
+        self._preempt = None
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)
+                return
+        self._held = False
+
+
+@callback
+def async_get_adapter_arbiter(hass: HomeAssistant, name: str) -> AdapterArbiter:
+    """Return the arbiter of an adapter shared by all users."""
+    arbiters = hass.data.setdefault(DOMAIN, {}).setdefault(DATA_ADAPTER_ARBITERS, {})
+    return arbiters.setdefault(name, AdapterArbiter())
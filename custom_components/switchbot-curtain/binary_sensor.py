@@ -1,22 +1,26 @@
 """Support for SwitchBot binary sensors."""
 from __future__ import annotations
 
+from typing import TYPE_CHECKING
+
 from homeassistant.components.binary_sensor import (
+    BinarySensorDeviceClass,
     BinarySensorEntity,
     BinarySensorEntityDescription,
 )
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.const import CONF_MAC, CONF_NAME
 from homeassistant.core import HomeAssistant
-from homeassistant.exceptions import PlatformNotReady
 from homeassistant.helpers.entity import EntityCategory
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
 
-from .const import DATA_COORDINATOR, DOMAIN
-from .coordinator import SwitchbotDataUpdateCoordinator
+from .const import ATTR_CURTAIN, DATA_COORDINATOR, DOMAIN
 from .entity import SwitchbotEntity
+from .models import STATE_TYPES, SwitchbotDeviceConfig, entry_devices
+
+if TYPE_CHECKING:
+    from .coordinator import SwitchbotDataUpdateCoordinator
 
-PARALLEL_UPDATES = 1
+PARALLEL_UPDATES = 0
 
 BINARY_SENSOR_TYPES: dict[str, BinarySensorEntityDescription] = {
     "calibration": BinarySensorEntityDescription(
@@ -34,20 +38,18 @@ async def async_setup_entry(
         DATA_COORDINATOR
     ]
 
-    if not coordinator.data.get(entry.unique_id):
-        raise PlatformNotReady
-
+    devices = entry_devices(entry)
     async_add_entities(
         [
-            SwitchBotBinarySensor(
-                coordinator,
-                entry.unique_id,
-                binary_sensor,
-                entry.data[CONF_MAC],
-                entry.data[CONF_NAME],
-            )
-            for binary_sensor in coordinator.data[entry.unique_id]["data"]
-            if binary_sensor in BINARY_SENSOR_TYPES
+            SwitchBotBinarySensor(coordinator, device, binary_sensor)
+            for device in devices
+            for binary_sensor in BINARY_SENSOR_TYPES
+            if binary_sensor in STATE_TYPES[device.model].FIELDS
+        ]
+        + [
+            SwitchBotMovingSensor(coordinator, device)
+            for device in devices
+            if device.sensor_type == ATTR_CURTAIN
         ]
     )
 
@@ -58,19 +60,40 @@ class SwitchBotBinarySensor(SwitchbotEntity, BinarySensorEntity):
     def __init__(
         self,
         coordinator: SwitchbotDataUpdateCoordinator,
-        idx: str | None,
+        device: SwitchbotDeviceConfig,
         binary_sensor: str,
-        mac: str,
-        switchbot_name: str,
     ) -> None:
         """Initialize the Switchbot sensor."""
-        super().__init__(coordinator, idx, mac, name=switchbot_name)
-        self._sensor = binary_sensor
-        self._attr_unique_id = f"{idx}-{binary_sensor}"
-        self._attr_name = f"{switchbot_name} {binary_sensor.title()}"
+        super().__init__(coordinator, device)
+        self._attribute = STATE_TYPES[device.model].FIELDS[binary_sensor]
+        self._data_keys = {self._attribute}
+        self._attr_unique_id = f"{device.idx}-{binary_sensor}"
+        self._attr_name = f"{device.name} {binary_sensor.title()}"
         self.entity_description = BINARY_SENSOR_TYPES[binary_sensor]
 
     @property
     def is_on(self) -> bool:
         """Return the state of the sensor."""
-        return self.data["data"][self._sensor]
+        return getattr(self.data, self._attribute)
+
+
+class SwitchBotMovingSensor(SwitchbotEntity, BinarySensorEntity):
+    """Whether a Switchbot curtain moves, from the positions it advertises."""
+
+    _attr_device_class = BinarySensorDeviceClass.MOVING
+    _data_keys = {"moving"}
+
+    def __init__(
+        self,
+        coordinator: SwitchbotDataUpdateCoordinator,
+        device: SwitchbotDeviceConfig,
+    ) -> None:
+        """Initialize the Switchbot sensor."""
+        super().__init__(coordinator, device)
+        self._attr_unique_id = f"{device.idx}-moving"
+        self._attr_name = f"{device.name} Moving"
+
+    @property
+    def is_on(self) -> bool:
+        """Return true while the curtain moves."""
+        return self._idx in self.coordinator.movement.movements
@@ -0,0 +1,96 @@
+"""Per-device failure tracking with exponential backoff and a circuit breaker."""
+from __future__ import annotations
+
+import time
+from typing import Any
+
+from homeassistant.core import callback
+
+from .const import (
+    BACKOFF_INITIAL_DELAY,
+    BREAKER_COOLDOWN,
+    BREAKER_MAX_COOLDOWN,
+    BREAKER_THRESHOLD,
+)
+
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """Stop sending commands to a device that keeps failing.
+
+    The breaker opens after BREAKER_THRESHOLD consecutive failed attempts and
+    commands fail fast while it is open. Once the cooldown passed, or the
+    device was heard advertising, a single probe attempt is let through; its
+    outcome closes the breaker or opens it again for twice as long.
+    """
+
+    def __init__(self) -> None:
+        """Initialize the breaker closed."""
+        self.failures = 0
+        self.trips = 0
+        self._open_until: float | None = None
+
+    @property
+    def state(self) -> str:
+        """Return the breaker state."""
+        if self._open_until is None:
+            return STATE_CLOSED
+        if time.monotonic() < self._open_until:
+            return STATE_OPEN
+        return STATE_HALF_OPEN
+
+    @property
+    def is_open(self) -> bool:
+        """Return true while commands fail fast."""
+        return self.state == STATE_OPEN
+
+    def retries(self, retry: int) -> int:
+        """Return the retries a command may use in the current state."""
+        if self._open_until is None:
+            return retry
+        # A half open breaker probes the device with a single attempt.
+        return 0
+
+    @staticmethod
+    def backoff(retry: int, max_delay: float) -> float:
+        """Return the delay before the given zero based retry."""
+        return min(BACKOFF_INITIAL_DELAY * 2**retry, max_delay)
+
+    @callback
+    def async_record_success(self) -> None:
+        """Close the breaker after a successful attempt."""
+        self.failures = 0
+        self.trips = 0
+        self._open_until = None
+
+    @callback
+    def async_record_failure(self) -> None:
+        """Count a failed attempt, opening the breaker when needed."""
+        self.failures += 1
+        if self._open_until is None and self.failures < BREAKER_THRESHOLD:
+            return
+
+        cooldown = min(BREAKER_COOLDOWN * 2**self.trips, BREAKER_MAX_COOLDOWN)
+        self.trips += 1
+        self._open_until = time.monotonic() + cooldown
+
+    @callback
+    def async_heard(self) -> None:
+        """Allow a probe right away, the device is advertising in range."""
+        if self.is_open:
+            self._open_until = time.monotonic()
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the breaker state."""
+        retry_in = None
+        if self.is_open:
+            retry_in = round(self._open_until - time.monotonic(), 1)
+        return {
+            "state": self.state,
+            "failures": self.failures,
+            "trips": self.trips,
+            "retry_in": retry_in,
+        }
@@ -4,39 +4,102 @@ from __future__ import annotations
 import logging
 from typing import Any
 
-from switchbot import GetSwitchbotDevices
 import voluptuous as vol
 
-from homeassistant.config_entries import ConfigEntry, ConfigFlow, OptionsFlow
+from homeassistant.config_entries import (
+    SOURCE_IGNORE,
+    ConfigEntry,
+    ConfigFlow,
+    OptionsFlow,
+)
 from homeassistant.const import CONF_MAC, CONF_NAME, CONF_PASSWORD, CONF_SENSOR_TYPE
-from homeassistant.core import callback
-from homeassistant.data_entry_flow import FlowResult
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.data_entry_flow import AbortFlow, FlowResult
+import homeassistant.helpers.config_validation as cv
 
+from .arbiter import CommandPriority, async_get_adapter_arbiter
 from .const import (
+    CONF_ADAPTERS,
+    CONF_DEVICES,
+    CONF_IDLE_TIMEOUT,
+    CONF_MAX_CONNECTIONS,
+    CONF_OPTIMISTIC,
+    CONF_PASSIVE_LISTENER,
+    CONF_PROXIES,
+    CONF_PROXY_SECRET,
     CONF_RETRY_COUNT,
     CONF_RETRY_TIMEOUT,
     CONF_SCAN_TIMEOUT,
     CONF_TIME_BETWEEN_UPDATE_COMMAND,
+    DATA_COORDINATOR,
+    DEFAULT_ADAPTERS,
+    DEFAULT_IDLE_TIMEOUT,
+    DEFAULT_MAX_CONNECTIONS,
+    DEFAULT_NAME,
+    DEFAULT_OPTIMISTIC,
+    DEFAULT_PASSIVE_LISTENER,
+    DEFAULT_PROXIES,
+    DEFAULT_PROXY_SECRET,
     DEFAULT_RETRY_COUNT,
     DEFAULT_RETRY_TIMEOUT,
     DEFAULT_SCAN_TIMEOUT,
     DEFAULT_TIME_BETWEEN_UPDATE_COMMAND,
+    DISCOVERY_CACHE_TTL,
     DOMAIN,
+    HUB_UNIQUE_ID,
     SUPPORTED_MODEL_TYPES,
 )
+from .models import DeviceState, create_state, entry_devices
+from .util import async_import_api, parse_adapters, parse_proxies
 
 _LOGGER = logging.getLogger(__name__)
 
 
-async def _btle_connect() -> dict:
+async def _btle_connect(hass: HomeAssistant) -> dict[str, DeviceState]:
     """Scan for BTLE advertisement data."""
+    interface = parse_adapters(DEFAULT_ADAPTERS)[0]
+    api = await async_import_api(hass)
+    scanner = api.GetSwitchbotDevices(interface=interface)
 
-    switchbot_devices = await GetSwitchbotDevices().discover()
+    arbiter = async_get_adapter_arbiter(hass, f"hci{interface}")
+    async with arbiter.async_acquire(CommandPriority.SCAN):
+        switchbot_devices = await scanner.discover()
 
     if not switchbot_devices:
         raise NotConnectedError("Failed to discover switchbot")
 
-    return switchbot_devices
+    return {mac: create_state(adv) for mac, adv in switchbot_devices.items()}
+
+
+@callback
+def _async_unconfigured_devices(
+    hass: HomeAssistant, devices: dict[str, DeviceState]
+) -> dict[str, str]:
+    """Return supported devices no entry or hub sets up, labelled by MAC."""
+    configured_devices = {
+        device.mac
+        for entry in hass.config_entries.async_entries(DOMAIN)
+        if entry.source != SOURCE_IGNORE
+        for device in entry_devices(entry)
+    }
+
+    return {
+        device.mac_address: f"{device.mac_address} {device.model_name}"
+        for device in devices.values()
+        if device.model_name in SUPPORTED_MODEL_TYPES
+        and device.mac_address not in configured_devices
+    }
+
+
+def _hub_device(mac: str, state: DeviceState) -> dict[str, str]:
+    """Return the hub entry data of a discovered device."""
+    sensor_type = SUPPORTED_MODEL_TYPES[state.model_name]
+    suffix = mac.replace(":", "")[-4:].upper()
+    return {
+        CONF_MAC: mac,
+        CONF_NAME: f"{DEFAULT_NAME} {sensor_type.title()} {suffix}",
+        CONF_SENSOR_TYPE: sensor_type,
+    }
 
 
 class SwitchbotConfigFlow(ConfigFlow, domain=DOMAIN):
@@ -44,17 +107,43 @@ class SwitchbotConfigFlow(ConfigFlow, domain=DOMAIN):
 
     VERSION = 1
 
-    async def _get_switchbots(self) -> dict:
+    async def _get_switchbots(self) -> dict[str, DeviceState]:
         """Try to discover nearby Switchbot devices."""
-        # asyncio.lock prevents btle adapter exceptions if there are multiple calls to this method.
-        # store asyncio.lock in hass data if not present.
-        if DOMAIN not in self.hass.data:
-            self.hass.data.setdefault(DOMAIN, {})
+        if not (coordinator := self.hass.data.get(DOMAIN, {}).get(DATA_COORDINATOR)):
+            # Nothing is set up yet, scan on the first adapter.
+            return await _btle_connect(self.hass)
 
-        # Discover switchbots nearby.
-        _btle_adv_data = await _btle_connect()
+        # Devices the coordinator heard recently are listed without a scan.
+        devices = coordinator.async_discovered(DISCOVERY_CACHE_TTL)
+        if not _async_unconfigured_devices(self.hass, devices):
+            devices = await coordinator.async_discover()
+
+        if not devices:
+            raise NotConnectedError("Failed to discover switchbot")
+
+        return devices
+
+    async def _async_discover_unconfigured(self) -> dict[str, str]:
+        """Discover devices and return the unconfigured ones, or abort."""
+        try:
+            self._discovered_devices = await self._get_switchbots()
 
-        return _btle_adv_data
+        except NotConnectedError as err:
+            raise AbortFlow("cannot_connect") from err
+
+        except Exception as err:  # pylint: disable=broad-except
+            _LOGGER.exception("Unexpected exception")
+            raise AbortFlow("unknown") from err
+
+        # Get supported devices not yet configured.
+        unconfigured_devices = _async_unconfigured_devices(
+            self.hass, self._discovered_devices
+        )
+
+        if not unconfigured_devices:
+            raise AbortFlow("no_unconfigured_devices")
+
+        return unconfigured_devices
 
     @staticmethod
     @callback
@@ -66,12 +155,26 @@ class SwitchbotConfigFlow(ConfigFlow, domain=DOMAIN):
 
     def __init__(self):
         """Initialize the config flow."""
-        self._discovered_devices = {}
+        self._discovered_devices: dict[str, DeviceState] = {}
 
     async def async_step_user(
         self, user_input: dict[str, Any] | None = None
     ) -> FlowResult:
         """Handle a flow initiated by the user."""
+        if any(
+            entry.unique_id == HUB_UNIQUE_ID
+            for entry in self._async_current_entries(include_ignore=False)
+        ):
+            # Devices are added to an existing hub from its options, not as
+            # entries of their own next to it.
+            return self.async_abort(reason="hub_configured")
+
+        return self.async_show_menu(step_id="user", menu_options=["device", "hub"])
+
+    async def async_step_device(
+        self, user_input: dict[str, Any] | None = None
+    ) -> FlowResult:
+        """Set up a single device."""
 
         errors: dict[str, str] = {}
 
@@ -80,48 +183,60 @@ class SwitchbotConfigFlow(ConfigFlow, domain=DOMAIN):
             self._abort_if_unique_id_configured()
 
             user_input[CONF_SENSOR_TYPE] = SUPPORTED_MODEL_TYPES[
-                self._discovered_devices[self.unique_id]["modelName"]
+                self._discovered_devices[self.unique_id].model_name
             ]
 
             return self.async_create_entry(title=user_input[CONF_NAME], data=user_input)
 
-        try:
-            self._discovered_devices = await self._get_switchbots()
+        unconfigured_devices = await self._async_discover_unconfigured()
 
-        except NotConnectedError:
-            return self.async_abort(reason="cannot_connect")
+        data_schema = vol.Schema(
+            {
+                vol.Required(CONF_MAC): vol.In(unconfigured_devices),
+                vol.Required(CONF_NAME): str,
+                vol.Optional(CONF_PASSWORD): str,
+            }
+        )
 
-        except Exception:  # pylint: disable=broad-except
-            _LOGGER.exception("Unexpected exception")
-            return self.async_abort(reason="unknown")
+        return self.async_show_form(
+            step_id="device", data_schema=data_schema, errors=errors
+        )
 
-        # Get devices already configured.
-        configured_devices = {
-            item.data[CONF_MAC]
-            for item in self._async_current_entries(include_ignore=False)
-        }
+    async def async_step_hub(
+        self, user_input: dict[str, Any] | None = None
+    ) -> FlowResult:
+        """Set up a hub managing many devices with one entry."""
+        await self.async_set_unique_id(HUB_UNIQUE_ID)
+        self._abort_if_unique_id_configured()
 
-        # Get supported devices not yet configured.
-        unconfigured_devices = {
-            device["mac_address"]: f"{device['mac_address']} {device['modelName']}"
-            for device in self._discovered_devices.values()
-            if device.get("modelName") in SUPPORTED_MODEL_TYPES
-            and device["mac_address"] not in configured_devices
-        }
+        errors: dict[str, str] = {}
 
-        if not unconfigured_devices:
-            return self.async_abort(reason="no_unconfigured_devices")
+        if user_input is not None:
+            if user_input[CONF_DEVICES]:
+                devices = {
+                    mac.replace(":", ""): _hub_device(
+                        mac, self._discovered_devices[mac.replace(":", "")]
+                    )
+                    for mac in user_input[CONF_DEVICES]
+                }
+                return self.async_create_entry(
+                    title=user_input[CONF_NAME], data={CONF_DEVICES: devices}
+                )
+            errors[CONF_DEVICES] = "no_devices"
+
+        unconfigured_devices = await self._async_discover_unconfigured()
 
         data_schema = vol.Schema(
             {
-                vol.Required(CONF_MAC): vol.In(unconfigured_devices),
-                vol.Required(CONF_NAME): str,
-                vol.Optional(CONF_PASSWORD): str,
+                vol.Required(CONF_NAME, default=f"{DEFAULT_NAME} Hub"): str,
+                vol.Required(
+                    CONF_DEVICES, default=list(unconfigured_devices)
+                ): cv.multi_select(unconfigured_devices),
             }
         )
 
         return self.async_show_form(
-            step_id="user", data_schema=data_schema, errors=errors
+            step_id="hub", data_schema=data_schema, errors=errors
         )
 
 
@@ -131,19 +246,34 @@ class SwitchbotOptionsFlowHandler(OptionsFlow):
     def __init__(self, config_entry: ConfigEntry) -> None:
         """Initialize options flow."""
         self.config_entry = config_entry
+        self._options: dict[str, Any] = {}
+        # Devices offered by the devices form, they may age out of the cache.
+        self._discovered_devices: dict[str, DeviceState] = {}
 
     async def async_step_init(
         self, user_input: dict[str, Any] | None = None
     ) -> FlowResult:
         """Manage Switchbot options."""
+        errors: dict[str, str] = {}
+
         if user_input is not None:
-            # Update common entity options for all other entities.
-            for entry in self.hass.config_entries.async_entries(DOMAIN):
-                if entry.unique_id != self.config_entry.unique_id:
-                    self.hass.config_entries.async_update_entry(
-                        entry, options=user_input
-                    )
-            return self.async_create_entry(title="", data=user_input)
+            try:
+                parse_adapters(user_input[CONF_ADAPTERS])
+            except ValueError:
+                errors[CONF_ADAPTERS] = "invalid_adapters"
+            try:
+                proxies = parse_proxies(user_input[CONF_PROXIES])
+            except ValueError:
+                errors[CONF_PROXIES] = "invalid_proxies"
+            else:
+                if proxies and not user_input[CONF_PROXY_SECRET]:
+                    errors[CONF_PROXY_SECRET] = "proxy_secret_required"
+
+        if user_input is not None and not errors:
+            self._options = user_input
+            if CONF_DEVICES in self.config_entry.data:
+                return await self.async_step_devices()
+            return self._async_save_options()
 
         options = {
             vol.Optional(
@@ -171,9 +301,102 @@ class SwitchbotOptionsFlowHandler(OptionsFlow):
                     CONF_SCAN_TIMEOUT, DEFAULT_SCAN_TIMEOUT
                 ),
             ): int,
+            vol.Optional(
+                CONF_PASSIVE_LISTENER,
+                default=self.config_entry.options.get(
+                    CONF_PASSIVE_LISTENER, DEFAULT_PASSIVE_LISTENER
+                ),
+            ): bool,
+            vol.Optional(
+                CONF_IDLE_TIMEOUT,
+                default=self.config_entry.options.get(
+                    CONF_IDLE_TIMEOUT, DEFAULT_IDLE_TIMEOUT
+                ),
+            ): int,
+            vol.Optional(
+                CONF_MAX_CONNECTIONS,
+                default=self.config_entry.options.get(
+                    CONF_MAX_CONNECTIONS, DEFAULT_MAX_CONNECTIONS
+                ),
+            ): vol.All(int, vol.Range(min=1)),
+            vol.Optional(
+                CONF_ADAPTERS,
+                default=self.config_entry.options.get(CONF_ADAPTERS, DEFAULT_ADAPTERS),
+            ): str,
+            vol.Optional(
+                CONF_PROXIES,
+                default=self.config_entry.options.get(CONF_PROXIES, DEFAULT_PROXIES),
+            ): str,
+            vol.Optional(
+                CONF_PROXY_SECRET,
+                default=self.config_entry.options.get(
+                    CONF_PROXY_SECRET, DEFAULT_PROXY_SECRET
+                ),
+            ): str,
+            vol.Optional(
+                CONF_OPTIMISTIC,
+                default=self.config_entry.options.get(
+                    CONF_OPTIMISTIC, DEFAULT_OPTIMISTIC
+                ),
+            ): bool,
+        }
+
+        return self.async_show_form(
+            step_id="init", data_schema=vol.Schema(options), errors=errors
+        )
+
+    async def async_step_devices(
+        self, user_input: dict[str, Any] | None = None
+    ) -> FlowResult:
+        """Choose the devices of a hub."""
+        devices: dict[str, Any] = self.config_entry.data[CONF_DEVICES]
+
+        if user_input is not None:
+            selected = {mac.replace(":", ""): mac for mac in user_input[CONF_DEVICES]}
+            self.hass.config_entries.async_update_entry(
+                self.config_entry,
+                data={
+                    CONF_DEVICES: {
+                        idx: devices.get(idx)
+                        or _hub_device(mac, self._discovered_devices[idx])
+                        for idx, mac in selected.items()
+                    }
+                },
+                options=self._options,
+            )
+            return self._async_save_options()
+
+        if coordinator := self.hass.data.get(DOMAIN, {}).get(DATA_COORDINATOR):
+            self._discovered_devices = coordinator.async_discovered(DISCOVERY_CACHE_TTL)
+
+        choices = {
+            device[CONF_MAC]: f"{device[CONF_NAME]} ({device[CONF_MAC]})"
+            for device in devices.values()
         }
+        choices.update(_async_unconfigured_devices(self.hass, self._discovered_devices))
 
-        return self.async_show_form(step_id="init", data_schema=vol.Schema(options))
+        return self.async_show_form(
+            step_id="devices",
+            data_schema=vol.Schema(
+                {
+                    vol.Required(
+                        CONF_DEVICES,
+                        default=[device[CONF_MAC] for device in devices.values()],
+                    ): cv.multi_select(choices),
+                }
+            ),
+        )
+
+    @callback
+    def _async_save_options(self) -> FlowResult:
+        """Store the options, they are shared by all entries."""
+        # Update common entity options for all other entities.
+        for entry in self.hass.config_entries.async_entries(DOMAIN):
+            if entry.unique_id != self.config_entry.unique_id:
+                self.hass.config_entries.async_update_entry(
+                    entry, options=self._options
+                )
+        return self.async_create_entry(title="", data=self._options)
 
 
 class NotConnectedError(Exception):
@@ -0,0 +1,276 @@
+"""Persistent BLE connection pool for Switchbot commands."""
+from __future__ import annotations
+
+import asyncio
+from collections import OrderedDict
+from collections.abc import AsyncIterator, Callable
+from contextlib import asynccontextmanager
+from functools import cache
+import logging
+from typing import TYPE_CHECKING, Any
+
+import bleak
+
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
+from homeassistant.helpers.event import async_call_later
+
+from .arbiter import AdapterArbiter, command_priority
+from .const import NOTIFY_TIMEOUT, RX_CHARACTERISTIC_UUID, TX_CHARACTERISTIC_UUID
+
+if TYPE_CHECKING:
+    import switchbot
+
+    from .adapters import AdapterManager
+    from .breaker import CircuitBreaker
+
+_LOGGER = logging.getLogger(__name__)
+
+
+class _PooledConnection:
+    """A BLE connection to a single device kept open between commands."""
+
+    def __init__(self, mac: str) -> None:
+        """Initialize the connection."""
+        self.mac = mac
+        self.client: bleak.BleakClient | None = None
+        self.lock = asyncio.Lock()
+        self.notification = asyncio.Event()
+        self.last_notification = b""
+        self.cancel_idle: CALLBACK_TYPE | None = None
+
+    @property
+    def is_connected(self) -> bool:
+        """Return true if the connection is open."""
+        return self.client is not None and self.client.is_connected
+
+    def handle_notification(self, sender: int, data: bytearray) -> None:
+        """Store a notification from the device."""
+        self.last_notification = bytes(data)
+        self.notification.set()
+
+
+class SwitchbotConnectionPool:
+    """Keep connections to Switchbot devices warm and reuse them for commands."""
+
+    def __init__(
+        self,
+        hass: HomeAssistant,
+        *,
+        idle_timeout: float,
+        max_connections: int,
+        client_factory: Callable[..., bleak.BleakClient],
+        arbiter: AdapterArbiter,
+    ) -> None:
+        """Initialize the connection pool."""
+        self.hass = hass
+        self.idle_timeout = idle_timeout
+        self.max_connections = max_connections
+        self._client_factory = client_factory
+        # Connections are opened in command priority order between scans.
+        self._arbiter = arbiter
+        self._connections: dict[str, _PooledConnection] = {}
+        # Open connections, least recently used first.
+        self._open: OrderedDict[str, _PooledConnection] = OrderedDict()
+        self._slot_freed = asyncio.Event()
+
+    @property
+    def open_connections(self) -> int:
+        """Return the number of open connections."""
+        return len(self._open)
+
+    @callback
+    def async_is_open(self, mac: str) -> bool:
+        """Return true if a connection to mac is open or being opened."""
+        return mac in self._open
+
+    @asynccontextmanager
+    async def async_connection(
+        self, mac: str, timeout: float
+    ) -> AsyncIterator[_PooledConnection]:
+        """Lease a connected client for a device, connecting if needed."""
+        conn = self._connections.setdefault(mac, _PooledConnection(mac))
+
+        async with conn.lock:
+            if conn.cancel_idle:
+                conn.cancel_idle()
+                conn.cancel_idle = None
+
+            if not conn.is_connected:
+                # Drop what is left of a connection lost while leased.
+                await self._async_close_client(conn.mac, self._detach(conn))
+                await self._async_connect(conn, timeout)
+
+            self._open.move_to_end(mac)
+
+            try:
+                yield conn
+            except (bleak.BleakError, asyncio.TimeoutError):
+                await self._async_close_client(conn.mac, self._detach(conn))
+                raise
+            finally:
+                if conn.is_connected:
+                    conn.cancel_idle = async_call_later(
+                        self.hass, self.idle_timeout, self._idle_callback(conn)
+                    )
+                    # Commands waiting for a slot may evict it now.
+                    self._slot_freed.set()
+                else:
+                    # Dropped while leased, _async_dropped left it to us.
+                    await self._async_close_client(conn.mac, self._detach(conn))
+
+    async def async_connect(self, mac: str, timeout: float) -> None:
+        """Open a connection to a device ahead of its next command."""
+        async with self.async_connection(mac, timeout):
+            pass
+
+    async def _async_connect(self, conn: _PooledConnection, timeout: float) -> None:
+        """Open a connection, evicting an idle one when the pool is full."""
+        self._open.pop(conn.mac, None)
+        while len(self._open) >= self.max_connections:
+            if idle := next(
+                (c for c in self._open.values() if not c.lock.locked()), None
+            ):
+                await self._async_close_client(idle.mac, self._detach(idle))
+                continue
+            self._slot_freed.clear()
+            await self._slot_freed.wait()
+
+        # Reserve the slot before yielding to the event loop.
+        self._open[conn.mac] = conn
+
+        client = self._client_factory(
+            conn.mac,
+            timeout=timeout,
+            disconnected_callback=lambda _: self._async_dropped(conn),
+        )
+
+        _LOGGER.debug("Opening pooled connection to %s", conn.mac)
+        try:
+            async with self._arbiter.async_acquire(command_priority.get()):
+                await client.connect()
+            await client.start_notify(RX_CHARACTERISTIC_UUID, conn.handle_notification)
+        except (bleak.BleakError, asyncio.TimeoutError):
+            self._detach(conn)
+            await self._async_close_client(conn.mac, client)
+            raise
+
+        conn.client = client
+
+    @callback
+    def _detach(self, conn: _PooledConnection) -> bleak.BleakClient | None:
+        """Remove conn from the pool and return its client for closing."""
+        if conn.cancel_idle:
+            conn.cancel_idle()
+            conn.cancel_idle = None
+
+        client, conn.client = conn.client, None
+        if self._open.pop(conn.mac, None) is not None:
+            self._slot_freed.set()
+
+        return client
+
+    async def _async_close_client(
+        self, mac: str, client: bleak.BleakClient | None
+    ) -> None:
+        """Disconnect a detached client."""
+        if client is None:
+            return
+
+        _LOGGER.debug("Closing pooled connection to %s", mac)
+        try:
+            await client.disconnect()
+        except (bleak.BleakError, asyncio.TimeoutError) as err:
+            _LOGGER.debug("Error disconnecting from %s: %s", mac, err)
+
+    def _idle_callback(self, conn: _PooledConnection) -> Callable[[Any], None]:
+        """Return a callback closing conn once it has been idle long enough."""
+
+        @callback
+        def _async_expire(_now: Any) -> None:
+            conn.cancel_idle = None
+            if not conn.lock.locked():
+                self.hass.async_create_task(
+                    self._async_close_client(conn.mac, self._detach(conn))
+                )
+
+        return _async_expire
+
+    @callback
+    def _async_dropped(self, conn: _PooledConnection) -> None:
+        """Handle a connection dropped by the device or the adapter."""
+        _LOGGER.debug("Pooled connection to %s dropped", conn.mac)
+        if not conn.lock.locked():
+            self._detach(conn)
+
+    async def async_close(self) -> None:
+        """Close all pooled connections."""
+        for conn in list(self._open.values()):
+            await self._async_close_client(conn.mac, self._detach(conn))
+
+
+class _PooledDevice:
+    """Mixin sending Switchbot commands over a pooled connection."""
+
+    connections: AdapterManager
+    breaker: CircuitBreaker
+    # Longest wait between retries of a failed command, in seconds.
+    retry_timeout: float
+    # Retries the last command needed.
+    last_retries = 0
+
+    async def _sendcommand(self, key: str, retry: int) -> bytes:
+        """Send command to device and read response."""
+        self.last_retries = 0
+        if self.breaker.is_open:
+            _LOGGER.debug("Switchbot %s keeps failing, not sending command", self._mac)
+            return b"\x00"
+
+        command = bytearray.fromhex(self._commandkey(key))
+        _LOGGER.debug("Sending command to switchbot %s", command)
+        retry = self.breaker.retries(retry)
+
+        while True:
+            notify_msg = b""
+            try:
+                async with self.connections.async_connection(
+                    self._mac, self._scan_timeout
+                ) as conn:
+                    conn.notification.clear()
+                    await conn.client.write_gatt_char(
+                        TX_CHARACTERISTIC_UUID, command, False
+                    )
+                    await asyncio.wait_for(conn.notification.wait(), NOTIFY_TIMEOUT)
+                    notify_msg = conn.last_notification
+            except (bleak.BleakError, asyncio.TimeoutError):
+                _LOGGER.debug("Switchbot communication failed with:", exc_info=True)
+
+            if notify_msg:
+                self.breaker.async_record_success()
+                if notify_msg == b"\x07":
+                    _LOGGER.error("Password required")
+                elif notify_msg == b"\t":
+                    _LOGGER.error("Password incorrect")
+                return notify_msg
+
+            self.breaker.async_record_failure()
+            if retry < 1 or self.breaker.is_open:
+                _LOGGER.error("Switchbot communication failed. Stopping trying")
+                return b"\x00"
+
+            delay = self.breaker.backoff(self.last_retries, self.retry_timeout)
+            _LOGGER.warning(
+                "Cannot connect to Switchbot. Retrying in %.1fs (remaining: %d)",
+                delay,
+                retry,
+            )
+            retry -= 1
+            self.last_retries += 1
+            await asyncio.sleep(delay)
+
+
+@cache
+def pooled_device_class(
+    device_class: type[switchbot.SwitchbotDevice],
+) -> type[switchbot.SwitchbotDevice]:
+    """Return a subclass of device_class that sends through the pool."""
+    return type(f"Pooled{device_class.__name__}", (_PooledDevice, device_class), {})
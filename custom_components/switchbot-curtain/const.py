@@ -7,19 +7,95 @@ ATTR_BOT = "bot"
 ATTR_CURTAIN = "curtain"
 DEFAULT_NAME = "Switchbot"
 SUPPORTED_MODEL_TYPES = {"WoHand": ATTR_BOT, "WoCurtain": ATTR_CURTAIN}
+MODEL_NAMES = {ATTR_BOT: "WoHand", ATTR_CURTAIN: "WoCurtain"}
+SERVICE_UUID = "cba20d00-224d-11e6-9fb8-0002a5d5c51b"
+# Advertisements carry the device state as service data under this UUID.
+SERVICE_DATA_UUID = "00000d00-0000-1000-8000-00805f9b34fb"
+TX_CHARACTERISTIC_UUID = "cba20002-224d-11e6-9fb8-0002a5d5c51b"
+RX_CHARACTERISTIC_UUID = "cba20003-224d-11e6-9fb8-0002a5d5c51b"
+NOTIFY_TIMEOUT = 5
+
+# Curtain motion estimate, speed in percent per second
+DEFAULT_CURTAIN_SPEED = 100 / 15
+MOTION_GRACE = 3
+MOTION_UPDATE_INTERVAL = 1
+
+# Curtain movement detection, in seconds
+# A curtain has stopped once its position held this long without motion.
+MOVEMENT_SETTLE = 2
+# A moving curtain unheard for this long is considered stopped.
+MOVEMENT_TIMEOUT = 30
+
+# Discovery
+DISCOVERY_CACHE_TTL = 120
+
+# Snapshot of the last known device states
+STORAGE_KEY = f"{DOMAIN}.snapshot"
+STORAGE_VERSION = 1
+SNAPSHOT_SAVE_DELAY = 30
+
+# Command retries and circuit breaker, in seconds
+BACKOFF_INITIAL_DELAY = 0.5
+BREAKER_THRESHOLD = 4
+BREAKER_COOLDOWN = 60
+BREAKER_MAX_COOLDOWN = 900
+
+# Remote proxies, in seconds
+DEFAULT_PROXY_PORT = 7777
+PROXY_CONNECT_TIMEOUT = 5
+PROXY_REQUEST_TIMEOUT = 10
+# How long a device is followed through the adapter hearing it loudest.
+ADVERTISEMENT_SOURCE_MAX_AGE = 30
+
+# Adaptive refresh
+FAST_REFRESH_INTERVAL = 1
+FAST_SCAN_TIMEOUT = 1
 
 # Config Defaults
 DEFAULT_RETRY_COUNT = 3
 DEFAULT_RETRY_TIMEOUT = 5
 DEFAULT_TIME_BETWEEN_UPDATE_COMMAND = 60
 DEFAULT_SCAN_TIMEOUT = 5
+DEFAULT_PASSIVE_LISTENER = False
+DEFAULT_IDLE_TIMEOUT = 15
+DEFAULT_MAX_CONNECTIONS = 3
+DEFAULT_ADAPTERS = "0"
+DEFAULT_OPTIMISTIC = False
+DEFAULT_PROXIES = ""
+DEFAULT_PROXY_SECRET = ""
 
 # Config Options
 CONF_TIME_BETWEEN_UPDATE_COMMAND = "update_time"
 CONF_RETRY_COUNT = "retry_count"
 CONF_RETRY_TIMEOUT = "retry_timeout"
 CONF_SCAN_TIMEOUT = "scan_timeout"
+CONF_PASSIVE_LISTENER = "passive_listener"
+CONF_IDLE_TIMEOUT = "idle_timeout"
+CONF_MAX_CONNECTIONS = "max_connections"
+CONF_ADAPTERS = "adapters"
+CONF_OPTIMISTIC = "optimistic"
+CONF_PROXIES = "proxies"
+CONF_PROXY_SECRET = "proxy_secret"
+
+# Hub entries
+CONF_DEVICES = "devices"
+HUB_UNIQUE_ID = "hub"
+HUB_MODEL = "Bluetooth Hub"
+
+# Services
+SERVICE_SET_POSITIONS = "set_positions"
+ATTR_POSITIONS = "positions"
+EVENT_SET_POSITIONS_RESULT = f"{DOMAIN}_set_positions_result"
+
+# Events
+EVENT_COMMAND_COMPLETED = f"{DOMAIN}_command_completed"
+EVENT_COMMAND_FAILED = f"{DOMAIN}_command_failed"
+EVENT_MOVEMENT_STARTED = f"{DOMAIN}_movement_started"
+EVENT_MOVEMENT_STOPPED = f"{DOMAIN}_movement_stopped"
 
 # Data
 DATA_COORDINATOR = "coordinator"
+DATA_DEVICES = "devices"
+DATA_PLATFORMS = "platforms"
+DATA_ADAPTER_ARBITERS = "adapter_arbiters"
 COMMON_OPTIONS = "common_options"
@@ -1,18 +1,61 @@
 """Provides the switchbot DataUpdateCoordinator."""
 from __future__ import annotations
 
+import asyncio
+from contextlib import suppress
 from datetime import timedelta
+from functools import partial
 import logging
+import time
+from typing import TYPE_CHECKING, Any
 
-import switchbot
+import bleak
 
-from homeassistant.core import HomeAssistant
+from homeassistant.const import Platform
+from homeassistant.core import HomeAssistant, callback
+from homeassistant.exceptions import ConfigEntryNotReady
+from homeassistant.helpers import entity_registry as er
+from homeassistant.helpers.storage import Store
 from homeassistant.helpers.update_coordinator import DataUpdateCoordinator, UpdateFailed
 
-from .const import DOMAIN
+from .adapters import AdapterManager, AdvertisementMerger, SwitchbotAdapter
+from .arbiter import CommandPriority
+from .const import (
+    DOMAIN,
+    EVENT_MOVEMENT_STARTED,
+    EVENT_MOVEMENT_STOPPED,
+    FAST_REFRESH_INTERVAL,
+    FAST_SCAN_TIMEOUT,
+    SNAPSHOT_SAVE_DELAY,
+    STORAGE_KEY,
+    STORAGE_VERSION,
+)
+from .decoder import decode_advertisement
+from .models import (
+    CurtainState,
+    DeviceState,
+    create_state,
+    entry_devices,
+    restore_state,
+    snapshot_state,
+)
+from .movement import Movement, MovementTracker
+from .scheduler import RefreshScheduler
+from .stats import PerformanceStats
+
+if TYPE_CHECKING:
+    import switchbot
+
+    from .cover import SwitchBotCurtainEntity
 
 _LOGGER = logging.getLogger(__name__)
 
+# State attributes whose changes mean a device is in use.
+_ACTIVITY_KEYS = {"position", "in_motion", "is_on"}
+# Curtain attributes that tell it moves, and those resetting its tracking.
+_MOVEMENT_KEYS = {"position", "in_motion"}
+_BASELINE_KEYS = {"model_name", "stale"}
+
 
 class SwitchbotDataUpdateCoordinator(DataUpdateCoordinator):
     """Class to manage fetching switchbot data."""
@@ -24,27 +67,546 @@ class SwitchbotDataUpdateCoordinator(DataUpdateCoordinator):
         update_interval: int,
         api: switchbot,
         retry_count: int,
+        retry_timeout: int,
         scan_timeout: int,
+        passive_listener: bool = False,
+        adapters: list[int],
+        idle_timeout: int,
+        max_connections: int,
+        optimistic: bool = False,
+        proxies: list[tuple[str, int]] | None = None,
+        proxy_secret: str = "",
     ) -> None:
         """Initialize global switchbot data updater."""
         self.switchbot_api = api
-        self.switchbot_data = self.switchbot_api.GetSwitchbotDevices()
         self.retry_count = retry_count
+        self.retry_timeout = retry_timeout
         self.scan_timeout = scan_timeout
         self.update_interval = timedelta(seconds=update_interval)
+        self.scheduler = RefreshScheduler(
+            min_interval=FAST_REFRESH_INTERVAL, max_interval=update_interval
+        )
+        self.passive_listener = passive_listener
+        # Entities write the intended state and confirm commands in the background.
+        self.optimistic = optimistic
+        self.adapters = AdapterManager.from_interfaces(
+            hass,
+            adapters,
+            idle_timeout=idle_timeout,
+            max_connections=max_connections,
+            proxies=proxies,
+            proxy_secret=proxy_secret,
+        )
+        # The listener runs on the first adapter and every proxy.
+        self._listener_adapter = self.adapters.adapters[0]
+        self._first_refresh: asyncio.Task | None = None
+        self._store = Store(hass, STORAGE_VERSION, STORAGE_KEY)
+        # Task running the listener on the local adapter.
+        self._listener: asyncio.Task | None = None
+        self._proxy_listeners: dict[str, bleak.BleakScanner] = {}
+        # Devices heard by several adapters are followed through the loudest.
+        self._merger = AdvertisementMerger()
+        self._last_advertisement: float | None = None
+        # Per-MAC state records shared by active scans and the listener.
+        self._adv_table: dict[str, DeviceState] = {}
+        # Per-MAC attributes changed by the update listeners are notified of.
+        self.changed_fields: dict[str, set[str]] = {}
+        self._pending_changes: dict[str, set[str]] = {}
+        # Moving curtains are refreshed at the fastest cadence.
+        self.movement = MovementTracker()
+        self.state_writes = 0
+        self.skipped_writes = 0
+        self.stats = PerformanceStats()
+        # Curtain entities by entity_id, used for group commands.
+        self.curtain_entities: dict[str, SwitchBotCurtainEntity] = {}
 
         super().__init__(
             hass, _LOGGER, name=DOMAIN, update_interval=self.update_interval
         )
 
-    async def _async_update_data(self) -> dict | None:
-        """Fetch data from switchbot."""
+    async def async_first_refresh(self) -> None:
+        """Run the startup refresh once and share it between all entries.
+
+        Devices the startup scan missed are set up unavailable and filled in
+        by later refreshes, only a failing scan defers setup.
+        """
+        if self._first_refresh is None:
+            self._first_refresh = self.hass.async_create_task(
+                self._async_first_refresh()
+            )
+
+        await asyncio.shield(self._first_refresh)
+
+        if not self.last_update_success:
+            self._first_refresh = None
+            raise ConfigEntryNotReady from self.last_exception
+
+    async def _async_first_refresh(self) -> None:
+        """Seed the data from the snapshot, or refresh when there is none."""
+        if not await self._async_restore_snapshot():
+            await self._async_refresh(log_failures=False)
+            return
+
+        self.data = self._adv_table
+        # Replace the snapshot by a full scan as soon as entities listen.
+        self.update_interval = timedelta(seconds=self.scheduler.min_interval)
+
+    async def _async_restore_snapshot(self) -> bool:
+        """Load the last known device states, return true if any were stored."""
+        if not (snapshot := await self._store.async_load()):
+            return False
+
+        for mac, stored in snapshot["devices"].items():
+            self._adv_table.setdefault(mac, restore_state(stored))
+
+        _LOGGER.debug("Restored %d device(s) from snapshot", len(self._adv_table))
+        return bool(self._adv_table)
+
+    @callback
+    def _async_snapshot(self) -> dict[str, Any]:
+        """Return the device states to store."""
+        return {
+            "devices": {
+                mac: snapshot_state(state) for mac, state in self._adv_table.items()
+            }
+        }
+
+    @property
+    def listener_active(self) -> bool:
+        """Return true if the listener delivered adverts within update interval."""
+        return (
+            self._listener is not None
+            and self._last_advertisement is not None
+            and time.monotonic() - self._last_advertisement
+            < self.scheduler.max_interval
+        )
+
+    async def async_start_listener(self) -> None:
+        """Start the long-running advertisement listener."""
+        if self._listener is not None:
+            return
+
+        started = self.hass.loop.create_future()
+        # Runs until the listener is stopped, outside of tracked tasks.
+        listener = self.hass.loop.create_task(
+            self._async_listen(self._listener_adapter, started)
+        )
+
+        try:
+            await started
+        except (bleak.BleakError, OSError) as err:
+            _LOGGER.warning(
+                "Unable to start advertisement listener, using active scans: %s", err
+            )
+            return
+
+        self._listener = listener
+        _LOGGER.debug("Switchbot advertisement listener started")
+        await self._async_start_proxy_listeners()
+
+    async def _async_listen(
+        self, adapter: SwitchbotAdapter, started: asyncio.Future[None]
+    ) -> None:
+        """Listen on adapter, stepping aside while commands wait for it.
+
+        The listener holds the adapter like a scan, so connections are not
+        opened while it scans. It resumes once the waiting commands are done.
+        """
+        preempt = asyncio.Event()
+        while True:
+            preempt.clear()
+            async with adapter.arbiter.async_acquire(CommandPriority.SCAN, preempt):
+                scanner = self._async_create_listener(adapter)
+                try:
+                    await scanner.start()
+                except (bleak.BleakError, OSError) as err:
+                    if not started.done():
+                        started.set_exception(err)
+                    else:
+                        # The listener goes stale, a refresh restarts it.
+                        _LOGGER.warning(
+                            "Unable to resume advertisement listener: %s", err
+                        )
+                    return
+                if not started.done():
+                    started.set_result(None)
+
+                try:
+                    await preempt.wait()
+                finally:
+                    try:
+                        await scanner.stop()
+                    except (bleak.BleakError, OSError) as err:
+                        _LOGGER.debug("Error pausing advertisement listener: %s", err)
 
-        switchbot_data = await self.switchbot_data.discover(
-            retry=self.retry_count, scan_timeout=self.scan_timeout
+            adapter.scan_pauses += 1
+            _LOGGER.debug("Listener on %s paused for waiting commands", adapter.name)
+
+    async def _async_start_proxy_listeners(self) -> None:
+        """Listen on the proxies that aren't listening, reconnecting dropped ones."""
+        for adapter in self.adapters.remote_adapters:
+            try:
+                if (listener := self._proxy_listeners.get(adapter.name)) is None:
+                    listener = self._async_create_listener(adapter)
+                    await listener.start()
+                    self._proxy_listeners[adapter.name] = listener
+                elif not adapter.reachable:
+                    # The listener is still subscribed and resumes on reconnect.
+                    await adapter.transport.async_connect()
+            except (bleak.BleakError, OSError) as err:
+                _LOGGER.debug("Unable to listen on %s: %s", adapter.name, err)
+
+    @callback
+    def _async_create_listener(self, adapter: SwitchbotAdapter) -> bleak.BleakScanner:
+        """Return a scanner passing the advertisements of adapter to the table."""
+        listener = adapter.scanner_factory()
+        listener.register_detection_callback(
+            partial(self._async_handle_advertisement, adapter)
         )
+        return listener
+
+    async def async_apply_options(
+        self,
+        *,
+        update_interval: int,
+        retry_count: int,
+        retry_timeout: int,
+        scan_timeout: int,
+        passive_listener: bool,
+        idle_timeout: int,
+        max_connections: int,
+        optimistic: bool,
+    ) -> None:
+        """Apply changed options to the running coordinator and devices."""
+        self.optimistic = optimistic
+        self.retry_count = retry_count
+        self.retry_timeout = retry_timeout
+        self.scan_timeout = scan_timeout
+        self.scheduler.max_interval = update_interval
+
+        for adapter in self.adapters.adapters:
+            adapter.pool.idle_timeout = idle_timeout
+            adapter.pool.max_connections = max_connections
+
+        for device in self.adapters.devices:
+            self._async_configure_device(device)
+
+        self.passive_listener = passive_listener
+        if passive_listener:
+            await self.async_start_listener()
+        else:
+            await self.async_stop_listener()
+
+        self._async_reschedule()
+
+    @callback
+    def async_create_device(
+        self, device_class: type[switchbot.SwitchbotDevice], **kwargs: Any
+    ) -> switchbot.SwitchbotDevice:
+        """Create a device command object using the current options."""
+        device = self.adapters.async_create_device(
+            device_class, retry_timeout=self.retry_timeout, **kwargs
+        )
+        self._async_configure_device(device)
+        return device
+
+    @callback
+    def _async_configure_device(self, device: switchbot.SwitchbotDevice) -> None:
+        """Apply the command options to a device command object."""
+        # pylint: disable=protected-access
+        device._retry_count = self.retry_count
+        device._scan_timeout = self.scan_timeout
+        device.retry_timeout = self.retry_timeout
+
+    async def async_stop_listener(self) -> None:
+        """Stop the advertisement listener."""
+        if (listener := self._listener) is None:
+            return
+
+        self._listener = None
+        self._last_advertisement = None
+        proxy_listeners, self._proxy_listeners = self._proxy_listeners, {}
 
-        if not switchbot_data:
-            raise UpdateFailed("Unable to fetch switchbot services data")
+        listener.cancel()
+        with suppress(asyncio.CancelledError):
+            await listener
+
+        for scanner in proxy_listeners.values():
+            try:
+                await scanner.stop()
+            except (bleak.BleakError, OSError) as err:
+                _LOGGER.debug("Error stopping advertisement listener: %s", err)
+
+    async def async_stop(self) -> None:
+        """Stop the listener and close pooled connections."""
+        await self.async_stop_listener()
+        await self.adapters.async_close()
+
+    @callback
+    def _async_handle_advertisement(
+        self,
+        adapter: SwitchbotAdapter,
+        device: bleak.backends.device.BLEDevice,
+        advertisement_data: bleak.backends.scanner.AdvertisementData,
+    ) -> None:
+        """Ingest a single advertisement from a listener."""
+        raw = adapter.async_raw(device, advertisement_data)
+        if raw is None:
+            return
+
+        mac, data, rssi = raw
+        self._last_advertisement = time.monotonic()
+        if not self._merger.async_accept(adapter.name, mac, rssi):
+            return
+        if self._async_ingest_raw(mac, device.address, data, rssi):
+            self._async_publish_changes()
+            self.async_set_updated_data(self._adv_table)
+
+    @callback
+    def _async_ingest_raw(
+        self, mac: str, address: str, data: bytes, rssi: int | None
+    ) -> bool:
+        """Merge raw service data into the state table, return true if changed.
+
+        Known devices keeping their model are updated without building the
+        advertisement dict of the library.
+        """
+        state = self._adv_table.get(mac)
+        if state is None or state.raw_adv_data[:1] != data[:1]:
+            return bool(
+                self._async_ingest({mac: decode_advertisement(address, data, rssi)})
+            )
+
+        if (breaker := self.adapters.breakers.get(mac)) is not None:
+            breaker.async_heard()
+        changed = state.raw_adv_data != data
+        if fields := state.update_raw(data, rssi):
+            self._pending_changes.setdefault(mac, set()).update(fields)
+        return self._async_track_movement(mac, state, fields) or changed
+
+    @callback
+    def _async_ingest(self, adv_data: dict[str, Any]) -> set[str]:
+        """Merge advertisements into the state table, return changed MACs."""
+        changed: set[str] = set()
+
+        for mac, adv in adv_data.items():
+            if (breaker := self.adapters.breakers.get(mac)) is not None:
+                breaker.async_heard()
+            state = self._adv_table.get(mac)
+            if state is None or state.model_name != adv.get("modelName"):
+                state = self._adv_table[mac] = create_state(adv)
+                fields = {"model_name", *state.FIELDS.values()}
+                changed.add(mac)
+            else:
+                if state.raw_adv_data != adv["rawAdvData"]:
+                    changed.add(mac)
+                fields = state.update(adv)
+            if fields:
+                self._pending_changes.setdefault(mac, set()).update(fields)
+            if self._async_track_movement(mac, state, fields):
+                changed.add(mac)
+
+        return changed
+
+    @callback
+    def _async_track_movement(
+        self, mac: str, state: DeviceState, fields: set[str]
+    ) -> bool:
+        """Follow the position of a curtain, return true if it started or stopped."""
+        if not isinstance(state, CurtainState):
+            return False
+        if not fields.isdisjoint(_BASELINE_KEYS):
+            self.movement.async_forget(mac)
+        elif mac not in self.movement.movements and fields.isdisjoint(_MOVEMENT_KEYS):
+            return False
+
+        movement = self.movement.async_update(mac, state.position, state.in_motion)
+        if movement is None:
+            return False
+        if mac in self.movement.movements:
+            self.scheduler.async_mark_active(mac)
+            self._async_reschedule()
+        self._async_movement_changed(mac, state, movement)
+        return True
+
+    @callback
+    def _async_movement_changed(
+        self, mac: str, state: CurtainState, movement: Movement
+    ) -> None:
+        """Let entities and automations know a curtain started or stopped."""
+        self._pending_changes.setdefault(mac, set()).add("moving")
+        data = {
+            "entity_id": er.async_get(self.hass).async_get_entity_id(
+                Platform.COVER, DOMAIN, mac
+            ),
+            "mac_address": state.mac_address,
+            "position": state.position,
+            "start_position": movement.start_position,
+        }
+        if mac in self.movement.movements:
+            _LOGGER.debug("Curtain %s started moving", state.mac_address)
+            self.hass.bus.async_fire(EVENT_MOVEMENT_STARTED, data)
+            return
+
+        _LOGGER.debug(
+            "Curtain %s stopped after %.1fs", state.mac_address, movement.duration
+        )
+        self.hass.bus.async_fire(
+            EVENT_MOVEMENT_STOPPED,
+            {**data, "duration": round(movement.duration, 3)},
+        )
+
+    @callback
+    def _async_configured_devices(self) -> set[str]:
+        """Return the advertisement table keys of all configured devices."""
+        return {
+            device.idx
+            for entry in self.hass.config_entries.async_entries(DOMAIN)
+            if entry.unique_id is not None
+            for device in entry_devices(entry)
+        }
+
+    @callback
+    def _async_scan_targets(self) -> set[str]:
+        """Return the configured devices a scan waits for.
+
+        Devices whose circuit breaker is open are likely out of range, a scan
+        still picks up their advertisements but does not wait for them.
+        """
+        return {
+            mac
+            for mac in self._async_configured_devices()
+            if (breaker := self.adapters.breakers.get(mac)) is None
+            or not breaker.is_open
+        }
+
+    @callback
+    def _async_publish_changes(self) -> None:
+        """Expose the accumulated field changes to the next listener update."""
+        self.changed_fields = self._pending_changes
+        self._pending_changes = {}
+
+        # Signal strength alone changes constantly, it is stored with the rest.
+        if any(fields - {"rssi"} for fields in self.changed_fields.values()):
+            self._store.async_delay_save(self._async_snapshot, SNAPSHOT_SAVE_DELAY)
+
+    @callback
+    def _async_finish_refresh(self, *, full: bool) -> None:
+        """Publish changes of a refresh and adapt device cadences to them."""
+        for mac, movement in self.movement.async_expire().items():
+            self._async_movement_changed(mac, self._adv_table[mac], movement)
+        self._async_publish_changes()
+        active = {
+            mac
+            for mac, fields in self.changed_fields.items()
+            if "model_name" not in fields and not fields.isdisjoint(_ACTIVITY_KEYS)
+        }
+        active.update(self.movement.movements)
+        self.scheduler.async_refreshed(active, full=full)
+        self.update_interval = timedelta(seconds=self.scheduler.next_refresh_in())
+
+    @callback
+    def async_discovered(self, max_age: float) -> dict[str, DeviceState]:
+        """Return the devices heard within max_age seconds."""
+        oldest = time.monotonic() - max_age
+        return {
+            mac: state
+            for mac, state in self._adv_table.items()
+            if state.last_seen >= oldest
+        }
+
+    async def async_discover(self) -> dict[str, DeviceState]:
+        """Scan for all devices in range, queued behind other adapter use."""
+        start = time.monotonic()
+        if self._listener is not None:
+            # The listener holds the adapter and hears what a scan would.
+            await asyncio.sleep(self.scan_timeout)
+            return self.async_discovered(time.monotonic() - start)
+
+        adv_data = await self.adapters.async_scan(
+            self.adapters.async_pick_scanner(),
+            scan_timeout=self.scan_timeout,
+            targets=set(),
+        )
+
+        if self._async_ingest(adv_data):
+            self._async_publish_changes()
+            self.async_set_updated_data(self._adv_table)
+
+        return self.async_discovered(time.monotonic() - start)
+
+    @callback
+    def async_device_commanded(self, mac: str | None) -> None:
+        """Refresh a device quickly after a command was sent to it."""
+        if mac is None:
+            return
+
+        self.scheduler.async_mark_active(mac)
+        self._async_reschedule()
+
+    @callback
+    def async_update_availability(self) -> None:
+        """Let entities follow an availability change outside of a refresh."""
+        self.changed_fields = {}
+        for update_callback in list(self._listeners):
+            update_callback()
+
+    @callback
+    def _async_reschedule(self) -> None:
+        """Schedule the next refresh for the most urgent device."""
+        self.update_interval = timedelta(seconds=self.scheduler.next_refresh_in())
+        if self._listeners:
+            self._schedule_refresh()
+
+    @callback
+    def async_device_changed(self, mac: str | None, keys: set[str] | None) -> bool:
+        """Return true if any of the keys changed for mac in the current update."""
+        if not (changed := self.changed_fields.get(mac)):
+            return False
+        return keys is None or "stale" in changed or not changed.isdisjoint(keys)
+
+    async def _async_update_data(self) -> dict[str, DeviceState]:
+        """Fetch data from switchbot."""
+        self.changed_fields = {}
+
+        if self.listener_active:
+            await self._async_start_proxy_listeners()
+            self._async_finish_refresh(full=True)
+            return self._adv_table
+
+        restart_listener = self._listener is not None
+        if restart_listener:
+            # Listener went quiet, run a full active scan as fallback.
+            _LOGGER.debug("Advertisement listener stale, running active scan")
+            await self.async_stop_listener()
+
+        fast_refresh = self.scheduler.async_fast_refresh()
+        targets = self._async_scan_targets()
+        first_seen: dict[str, float] = {}
+        try:
+            switchbot_data = await self.adapters.async_scan(
+                self.adapters.async_pick_scanner(),
+                scan_timeout=min(self.scan_timeout, FAST_SCAN_TIMEOUT)
+                if fast_refresh
+                else self.scan_timeout,
+                targets=targets,
+                first_seen=first_seen,
+            )
+        except (bleak.BleakError, OSError) as err:
+            raise UpdateFailed(f"Unable to scan for switchbot devices: {err}") from err
+        finally:
+            if restart_listener:
+                await self.async_start_listener()
+
+        self.stats.async_record_scan(targets, first_seen)
+
+        self._async_ingest(switchbot_data)
+        self._async_finish_refresh(full=not fast_refresh)
+
+        _LOGGER.debug(
+            "Refresh changed %d device(s), %d state writes skipped so far",
+            len(self.changed_fields),
+            self.skipped_writes,
+        )
 
-        return switchbot_data
+        return self._adv_table
@@ -1,10 +1,13 @@
 """Support for SwitchBot curtains."""
 from __future__ import annotations
 
+import asyncio
+from functools import partial
 import logging
-from typing import Any
+import time
+from typing import TYPE_CHECKING, Any
 
-from switchbot import SwitchbotCurtain
+import voluptuous as vol
 
 from homeassistant.components.cover import (
     ATTR_CURRENT_POSITION,
@@ -14,19 +17,51 @@ from homeassistant.components.cover import (
     CoverEntityFeature,
 )
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.const import CONF_MAC, CONF_NAME, CONF_PASSWORD
-from homeassistant.core import HomeAssistant, callback
-from homeassistant.exceptions import PlatformNotReady
+from homeassistant.core import (
+    CALLBACK_TYPE,
+    Context,
+    HomeAssistant,
+    ServiceCall,
+    callback,
+)
+from homeassistant.exceptions import HomeAssistantError
+import homeassistant.helpers.config_validation as cv
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
+from homeassistant.helpers.event import async_call_later
 from homeassistant.helpers.restore_state import RestoreEntity
 
-from .const import CONF_RETRY_COUNT, DATA_COORDINATOR, DOMAIN
-from .coordinator import SwitchbotDataUpdateCoordinator
+from .arbiter import async_command_priority, command_priority
+from .const import (
+    ATTR_CURTAIN,
+    ATTR_POSITIONS,
+    DATA_COORDINATOR,
+    DOMAIN,
+    EVENT_SET_POSITIONS_RESULT,
+    MOTION_UPDATE_INTERVAL,
+    SERVICE_SET_POSITIONS,
+)
 from .entity import SwitchbotEntity
+from .models import SwitchbotDeviceConfig, entry_devices
+from .motion import CurtainMotion
+
+if TYPE_CHECKING:
+    from switchbot import SwitchbotCurtain
+
+    from .adapters import SwitchbotAdapter
+    from .coordinator import SwitchbotDataUpdateCoordinator
 
 # Initialize the logger
 _LOGGER = logging.getLogger(__name__)
-PARALLEL_UPDATES = 1
+# Commands are serialised per curtain so bursts can be coalesced.
+PARALLEL_UPDATES = 0
+
+SET_POSITIONS_SCHEMA = vol.Schema(
+    {
+        vol.Required(ATTR_POSITIONS): {
+            cv.entity_id: vol.All(vol.Coerce(int), vol.Range(min=0, max=100))
+        }
+    }
+)
 
 
 async def async_setup_entry(
@@ -37,26 +72,118 @@ async def async_setup_entry(
         DATA_COORDINATOR
     ]
 
-    if not coordinator.data.get(entry.unique_id):
-        raise PlatformNotReady
+    if not hass.services.has_service(DOMAIN, SERVICE_SET_POSITIONS):
+
+        async def _async_handle_set_positions(call: ServiceCall) -> None:
+            await _async_set_positions(hass, call)
+
+        hass.services.async_register(
+            DOMAIN,
+            SERVICE_SET_POSITIONS,
+            _async_handle_set_positions,
+            schema=SET_POSITIONS_SCHEMA,
+        )
 
     async_add_entities(
         [
             SwitchBotCurtainEntity(
                 coordinator,
-                entry.unique_id,
-                entry.data[CONF_MAC],
-                entry.data[CONF_NAME],
-                coordinator.switchbot_api.SwitchbotCurtain(
-                    mac=entry.data[CONF_MAC],
-                    password=entry.data.get(CONF_PASSWORD),
-                    retry_count=entry.options[CONF_RETRY_COUNT],
+                device,
+                coordinator.async_create_device(
+                    coordinator.switchbot_api.SwitchbotCurtain,
+                    mac=device.mac,
+                    password=device.password,
                 ),
             )
+            for device in entry_devices(entry)
+            if device.sensor_type == ATTR_CURTAIN
         ]
     )
 
 
+async def _async_set_positions(hass: HomeAssistant, call: ServiceCall) -> None:
+    """Move several curtains with their commands released together."""
+    coordinator: SwitchbotDataUpdateCoordinator = hass.data[DOMAIN][DATA_COORDINATOR]
+
+    # Entities compare by value and can't be hashed, they are kept by entity_id.
+    positions: dict[str, int] = call.data[ATTR_POSITIONS]
+    entities: dict[str, SwitchBotCurtainEntity] = {}
+    for entity_id in positions:
+        if (entity := coordinator.curtain_entities.get(entity_id)) is None:
+            raise HomeAssistantError(f"{entity_id} is not a Switchbot curtain")
+        entity.async_set_context(call.context)
+        entities[entity_id] = entity
+
+    # Connect to the curtains first so the moves only pay for the GATT write.
+    # An adapter only keeps max_connections open, connecting more would evict
+    # the first ones again. The remaining curtains connect when moved.
+    slots: dict[str, int] = {}
+    synchronised: list[str] = []
+    for entity_id, entity in entities.items():
+        adapter = entity.async_route()
+        if slots.setdefault(adapter.name, adapter.pool.max_connections) > 0:
+            slots[adapter.name] -= 1
+            synchronised.append(entity_id)
+    if unsynchronised := [
+        entity_id for entity_id in entities if entity_id not in synchronised
+    ]:
+        _LOGGER.warning(
+            "Too many curtains per adapter to move together, moving %s after the"
+            " others",
+            ", ".join(unsynchronised),
+        )
+
+    token = command_priority.set(async_command_priority("set_position", call.context))
+    start = time.monotonic()
+    try:
+        connect_results = await asyncio.gather(
+            *(entities[entity_id].async_connect() for entity_id in synchronised),
+            return_exceptions=True,
+        )
+    finally:
+        command_priority.reset(token)
+    connected = {
+        entity_id
+        for entity_id, result in zip(synchronised, connect_results)
+        if not isinstance(result, Exception)
+    }
+    released = time.monotonic()
+
+    async def _async_move(entity: SwitchBotCurtainEntity, position: int) -> float:
+        # The results are reported below, so wait for them even when optimistic.
+        await entity.async_move_confirmed(position)
+        return time.monotonic() - released
+
+    durations = await asyncio.gather(
+        *(
+            _async_move(entity, positions[entity_id])
+            for entity_id, entity in entities.items()
+        )
+    )
+
+    results = {
+        entity_id: {
+            "position": positions[entity_id],
+            "success": entity.last_run_success,
+            "connected": entity_id in connected,
+            "command_time": round(duration, 3),
+        }
+        for (entity_id, entity), duration in zip(entities.items(), durations)
+    }
+    _LOGGER.debug(
+        "Switchbot group move connected in %.3fs: %s", released - start, results
+    )
+    hass.bus.async_fire(
+        EVENT_SET_POSITIONS_RESULT,
+        {
+            "connect_time": round(released - start, 3),
+            "results": results,
+            "unsynchronised": unsynchronised,
+        },
+        context=call.context,
+    )
+
+
 class SwitchBotCurtainEntity(SwitchbotEntity, CoverEntity, RestoreEntity):
     """Representation of a Switchbot."""
 
@@ -68,64 +195,182 @@ class SwitchBotCurtainEntity(SwitchbotEntity, CoverEntity, RestoreEntity):
         | CoverEntityFeature.SET_POSITION
     )
     _attr_assumed_state = True
+    _data_keys = {"position", "in_motion", "moving"}
 
     def __init__(
         self,
         coordinator: SwitchbotDataUpdateCoordinator,
-        idx: str | None,
-        mac: str,
-        name: str,
-        device: SwitchbotCurtain,
+        device: SwitchbotDeviceConfig,
+        switchbot_device: SwitchbotCurtain,
     ) -> None:
         """Initialize the Switchbot."""
-        super().__init__(coordinator, idx, mac, name)
-        self._attr_unique_id = idx
+        super().__init__(coordinator, device)
+        self._attr_unique_id = device.idx
         self._attr_is_closed = None
-        self._device = device
+        self._device = switchbot_device
+        # Commands queue behind the in-flight one; queued moves collapse to
+        # the newest command issued.
+        self._command_lock = asyncio.Lock()
+        self._command_seq = 0
+        self._motion = CurtainMotion()
+        self._cancel_motion_update: CALLBACK_TYPE | None = None
 
     async def async_added_to_hass(self) -> None:
         """Run when entity about to be added."""
         await super().async_added_to_hass()
+        self.coordinator.curtain_entities[self.entity_id] = self
+        self.async_on_remove(
+            lambda: self.coordinator.curtain_entities.pop(self.entity_id, None)
+        )
+        self.async_on_remove(self._async_cancel_motion_update)
         last_state = await self.async_get_last_state()
         if not last_state or ATTR_CURRENT_POSITION not in last_state.attributes:
             return
 
-        self._attr_current_cover_position = last_state.attributes[ATTR_CURRENT_POSITION]
         self._last_run_success = last_state.attributes["last_run_success"]
-        self._attr_is_closed = last_state.attributes[ATTR_CURRENT_POSITION] <= 20
+        if self.available:
+            # The device has been heard, its advertised position is current.
+            return
+
+        self._motion.async_sample(
+            last_state.attributes[ATTR_CURRENT_POSITION], in_motion=False
+        )
+        self._async_update_motion_attrs()
+
+    @property
+    def last_run_success(self) -> bool | None:
+        """Return true if the last command succeeded."""
+        return self._last_run_success
+
+    @callback
+    def async_route(self) -> SwitchbotAdapter:
+        """Return the adapter commands to the curtain go through."""
+        return self.coordinator.adapters.async_route(self._mac)
+
+    async def async_connect(self) -> None:
+        """Open the connection to the curtain ahead of a command."""
+        await self.coordinator.adapters.async_connect(
+            self._mac, self._device._scan_timeout  # pylint: disable=protected-access
+        )
+
+    async def _async_move(
+        self, command: str, *args: Any, target: int, optimistic: bool | None = None
+    ) -> None:
+        """Move the curtain towards target."""
+        self._command_seq += 1
+        seq = self._command_seq
+
+        @callback
+        def _async_rollback() -> None:
+            if seq == self._command_seq:
+                self._motion.async_abort()
+                self._async_update_motion_attrs()
+
+        await self._async_execute(
+            partial(self._async_send_move, seq, command, *args),
+            partial(self._async_start_motion, target),
+            _async_rollback,
+            optimistic,
+        )
+
+    async def _async_send_move(
+        self, seq: int, command: str, *args: Any, context: Context | None
+    ) -> bool | None:
+        """Send a move command unless a newer command supersedes it."""
+        async with self._command_lock:
+            if seq != self._command_seq:
+                _LOGGER.debug("Switchbot %s %s superseded", command, self._mac)
+                return None
+            return await self._async_send_command(command, *args, context=context)
+
+    @callback
+    def _async_start_motion(self, target: int) -> None:
+        """Track the move towards target."""
+        self._motion.async_start(target)
+        self._async_update_motion_attrs()
 
     async def async_open_cover(self, **kwargs: Any) -> None:
         """Open the curtain."""
 
         _LOGGER.debug("Switchbot to open curtain %s", self._mac)
-        self._last_run_success = bool(await self._device.open())
-        self.async_write_ha_state()
+        await self._async_move("open", target=100)
 
     async def async_close_cover(self, **kwargs: Any) -> None:
         """Close the curtain."""
 
         _LOGGER.debug("Switchbot to close the curtain %s", self._mac)
-        self._last_run_success = bool(await self._device.close())
-        self.async_write_ha_state()
+        await self._async_move("close", target=0)
 
     async def async_stop_cover(self, **kwargs: Any) -> None:
         """Stop the moving of this device."""
 
         _LOGGER.debug("Switchbot to stop %s", self._mac)
-        self._last_run_success = bool(await self._device.stop())
-        self.async_write_ha_state()
+        # Drop queued moves so only the in-flight command runs before stop.
+        self._command_seq += 1
+        await self._async_execute(self._async_send_stop, self._async_stop_motion)
+
+    async def _async_send_stop(self, context: Context | None) -> bool:
+        """Send the stop command after the in-flight command."""
+        async with self._command_lock:
+            return await self._async_send_command("stop", context=context)
+
+    @callback
+    def _async_stop_motion(self) -> None:
+        """Stop tracking the move at the estimated position."""
+        self._motion.async_stop()
+        self._async_update_motion_attrs()
 
     async def async_set_cover_position(self, **kwargs: Any) -> None:
         """Move the cover shutter to a specific position."""
         position = kwargs.get(ATTR_POSITION)
 
         _LOGGER.debug("Switchbot to move at %d %s", position, self._mac)
-        self._last_run_success = bool(await self._device.set_position(position))
-        self.async_write_ha_state()
+        await self._async_move("set_position", position, target=position)
+
+    async def async_move_confirmed(self, position: int) -> None:
+        """Move to position, waiting for the curtain to confirm the command."""
+        await self._async_move(
+            "set_position", position, target=position, optimistic=False
+        )
+
+    @callback
+    def _async_update_attrs(self) -> None:
+        """Update entity attributes from coordinator data."""
+        self._motion.async_sample(self.data.position, self.data.in_motion)
+        self._async_update_motion_attrs()
 
     @callback
-    def _handle_coordinator_update(self) -> None:
-        """Handle updated data from the coordinator."""
-        self._attr_current_cover_position = self.data["data"]["position"]
-        self._attr_is_closed = self.data["data"]["position"] <= 20
+    def _async_update_motion_attrs(self) -> None:
+        """Render the estimated position, tracking it while moving."""
+        position = self._motion.position()
+        self._attr_current_cover_position = position
+        self._attr_is_closed = None if position is None else position <= 20
+        # Opening and closing follow the advertised movement, as the moving
+        # sensor does, rather than the estimated position.
+        movement = self.coordinator.movement.movements.get(self._idx)
+        self._attr_is_opening = movement is not None and movement.opening
+        self._attr_is_closing = movement is not None and movement.closing
+
+        if not self._motion.moving:
+            self._async_cancel_motion_update()
+        elif self._cancel_motion_update is None:
+            self._cancel_motion_update = async_call_later(
+                self.hass, MOTION_UPDATE_INTERVAL, self._async_motion_update
+            )
+
+    @callback
+    def _async_motion_update(self, _now: Any) -> None:
+        """Write the estimated position of a moving curtain."""
+        self._cancel_motion_update = None
+        if self._motion.position() == self._motion.target:
+            # Arrived as far as the estimate goes, the next advert resyncs.
+            self._motion.async_stop()
+        self._async_update_motion_attrs()
         self.async_write_ha_state()
+
+    @callback
+    def _async_cancel_motion_update(self) -> None:
+        """Stop tracking the estimated position."""
+        if self._cancel_motion_update:
+            self._cancel_motion_update()
+            self._cancel_motion_update = None
@@ -0,0 +1,91 @@
+"""Decode Switchbot service data with precompiled struct layouts."""
+from __future__ import annotations
+
+from collections.abc import Callable
+import struct
+from typing import Any, NamedTuple, Union
+
+Buffer = Union[bytes, bytearray, memoryview]
+
+# Service data after the first byte, which holds the model and encryption flag.
+_BOT = struct.Struct("xBB")
+_CURTAIN = struct.Struct("xBBBB")
+
+
+def decode_bot(data: Buffer) -> tuple[bool, bool, int]:
+    """Return the switch mode, on state and battery of a bot."""
+    flags, battery = _BOT.unpack_from(data)
+    switch_mode = bool(flags & 0x80)
+    return switch_mode, switch_mode and not flags & 0x40, battery & 0x7F
+
+
+def decode_curtain(data: Buffer) -> tuple[bool, int, bool, int, int, int]:
+    """Return calibration, battery, motion, position, light level and chain."""
+    flags, battery, motion, light = _CURTAIN.unpack_from(data)
+    return (
+        bool(flags & 0x40),
+        battery & 0x7F,
+        bool(motion & 0x80),
+        # Curtains advertise 0 for open.
+        100 - min(motion & 0x7F, 100),
+        light >> 4 & 0x0F,
+        light & 0x07,
+    )
+
+
+class ModelLayout(NamedTuple):
+    """How the service data of a model is decoded."""
+
+    model_name: str
+    size: int
+    decode: Callable[[Buffer], tuple[Any, ...]]
+    # Advertisement data keys of the decoded values, in order.
+    keys: tuple[str, ...]
+
+
+MODEL_LAYOUTS: dict[int, ModelLayout] = {
+    ord("H"): ModelLayout(
+        "WoHand", _BOT.size, decode_bot, ("switchMode", "isOn", "battery")
+    ),
+    ord("c"): ModelLayout(
+        "WoCurtain",
+        _CURTAIN.size,
+        decode_curtain,
+        (
+            "calibration",
+            "battery",
+            "inMotion",
+            "position",
+            "lightLevel",
+            "deviceChain",
+        ),
+    ),
+}
+
+
+def model_layout(data: Buffer) -> ModelLayout | None:
+    """Return the layout of service data, None if it can't be decoded."""
+    if not data or (layout := MODEL_LAYOUTS.get(data[0] & 0x7F)) is None:
+        return None
+    return layout if len(data) >= layout.size else None
+
+
+def decode_advertisement(address: str, data: bytes, rssi: int | None) -> dict[str, Any]:
+    """Return advertisement data laid out as PySwitchbot reports it."""
+    adv: dict[str, Any] = {
+        "mac_address": address.lower(),
+        "rawAdvData": data,
+        "data": {"rssi": rssi},
+    }
+    if (layout := model_layout(data)) is None:
+        return adv
+
+    adv.update(
+        {
+            "isEncrypted": bool(data[0] & 0x80),
+            "model": chr(data[0] & 0x7F),
+            "modelName": layout.model_name,
+            "data": {**dict(zip(layout.keys, layout.decode(data))), "rssi": rssi},
+        }
+    )
+    return adv
@@ -0,0 +1,63 @@
+"""Diagnostics support for Switchbot."""
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Any
+
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import CONF_PASSWORD
+from homeassistant.core import HomeAssistant
+
+from .const import CONF_DEVICES, DATA_COORDINATOR, DOMAIN
+from .models import entry_devices
+
+if TYPE_CHECKING:
+    from .coordinator import SwitchbotDataUpdateCoordinator
+
+TO_REDACT = {CONF_PASSWORD}
+
+
+def _device_diagnostics(
+    coordinator: SwitchbotDataUpdateCoordinator, idx: str
+) -> dict[str, Any]:
+    """Return the state and statistics of a device."""
+    state = (coordinator.data or {}).get(idx)
+    breaker = coordinator.adapters.breakers.get(idx)
+    return {
+        "state": state.as_dict() if state else None,
+        "performance": coordinator.stats.async_get(idx).as_dict(),
+        "breaker": breaker.as_dict() if breaker else None,
+    }
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, entry: ConfigEntry
+) -> dict[str, Any]:
+    """Return diagnostics for a config entry."""
+    coordinator: SwitchbotDataUpdateCoordinator = hass.data[DOMAIN][entry.entry_id][
+        DATA_COORDINATOR
+    ]
+
+    if CONF_DEVICES in entry.data:
+        devices = {
+            "devices": {
+                device.idx: _device_diagnostics(coordinator, device.idx)
+                for device in entry_devices(entry)
+            }
+        }
+    else:
+        devices = _device_diagnostics(coordinator, entry.unique_id)
+
+    return {
+        "entry": async_redact_data(entry.as_dict(), TO_REDACT),
+        **devices,
+        "coordinator": {
+            "update_interval": coordinator.update_interval.total_seconds(),
+            "refresh_intervals": coordinator.scheduler.intervals,
+            "moving": list(coordinator.movement.movements),
+            "listener_active": coordinator.listener_active,
+            "state_writes": coordinator.state_writes,
+            "skipped_writes": coordinator.skipped_writes,
+        },
+        "adapters": coordinator.adapters.as_dict(),
+    }
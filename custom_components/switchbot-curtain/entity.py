@@ -1,46 +1,212 @@
 """An abstract class common to all Switchbot entities."""
 from __future__ import annotations
 
-from collections.abc import Mapping
-from typing import Any
+import asyncio
+from collections.abc import Awaitable, Callable, Mapping
+import time
+from typing import TYPE_CHECKING, Any
 
+from homeassistant.core import Context, callback
 from homeassistant.helpers import device_registry as dr
 from homeassistant.helpers.entity import DeviceInfo, Entity
 from homeassistant.helpers.update_coordinator import CoordinatorEntity
 
-from .const import MANUFACTURER
-from .coordinator import SwitchbotDataUpdateCoordinator
+from .arbiter import async_command_priority, command_priority
+from .const import (
+    DOMAIN,
+    EVENT_COMMAND_COMPLETED,
+    EVENT_COMMAND_FAILED,
+    MANUFACTURER,
+)
+from .models import DeviceState, SwitchbotDeviceConfig
 
+if TYPE_CHECKING:
+    import switchbot
 
-class SwitchbotEntity(CoordinatorEntity[SwitchbotDataUpdateCoordinator], Entity):
+    from .coordinator import SwitchbotDataUpdateCoordinator
+
+
+class SwitchbotEntity(CoordinatorEntity["SwitchbotDataUpdateCoordinator"], Entity):
     """Generic entity encapsulating common features of Switchbot device."""
 
+    # State attributes rendered by this entity, None for all of them.
+    _data_keys: set[str] | None = None
+    _device: switchbot.SwitchbotDevice
+
     def __init__(
         self,
         coordinator: SwitchbotDataUpdateCoordinator,
-        idx: str | None,
-        mac: str,
-        name: str,
+        device: SwitchbotDeviceConfig,
     ) -> None:
         """Initialize the entity."""
         super().__init__(coordinator)
         self._last_run_success: bool | None = None
-        self._idx = idx
-        self._mac = mac
-        self._attr_name = name
+        self._last_available: bool | None = None
+        # Optimistic commands still waiting for the device to answer.
+        self._command_tasks: set[asyncio.Task] = set()
+        self._idx = device.idx
+        self._mac = device.mac
+        self._attr_name = device.name
         self._attr_device_info = DeviceInfo(
             connections={(dr.CONNECTION_NETWORK_MAC, self._mac)},
             manufacturer=MANUFACTURER,
-            model=self.data["modelName"],
-            name=name,
+            model=device.model,
+            name=device.name,
+        )
+        if device.hub is not None:
+            self._attr_device_info["via_device"] = (DOMAIN, device.hub)
+
+    async def async_added_to_hass(self) -> None:
+        """Render the current device state when added."""
+        await super().async_added_to_hass()
+        self.async_on_remove(self._async_cancel_commands)
+        self._last_available = self.available
+        if self._last_available:
+            self._async_update_attrs()
+
+    @property
+    def available(self) -> bool:
+        """Return true once the device has been heard."""
+        return (
+            super().available
+            and self._idx in self.coordinator.data
+            and not self._breaker_open
         )
 
     @property
-    def data(self) -> dict[str, Any]:
-        """Return coordinator data for this entity."""
+    def _breaker_open(self) -> bool:
+        """Return true while commands to the device fail fast."""
+        breaker = self.coordinator.adapters.breakers.get(self._idx)
+        return breaker is not None and breaker.is_open
+
+    @property
+    def data(self) -> DeviceState:
+        """Return the state record of this entity's device."""
         return self.coordinator.data[self._idx]
 
     @property
     def extra_state_attributes(self) -> Mapping[Any, Any]:
         """Return the state attributes."""
-        return {"last_run_success": self._last_run_success, "mac_address": self._mac}
+        return {
+            "last_run_success": self._last_run_success,
+            "mac_address": self._mac,
+            "adapter": self.coordinator.adapters.routes.get(self._idx),
+            "stale": self.data.stale,
+            **self._breaker_attributes(),
+        }
+
+    def _breaker_attributes(self) -> dict[str, Any]:
+        """Return the circuit breaker state of the device."""
+        if (breaker := self.coordinator.adapters.breakers.get(self._idx)) is None:
+            return {}
+        return {
+            "breaker_state": breaker.state,
+            "breaker_failures": breaker.failures,
+            "breaker_trips": breaker.trips,
+        }
+
+    @property
+    def _command_pending(self) -> bool:
+        """Return true while an optimistic command awaits confirmation."""
+        return bool(self._command_tasks)
+
+    async def _async_execute(
+        self,
+        send: Callable[..., Awaitable[bool | None]],
+        apply: Callable[[], None],
+        rollback: Callable[[], None] | None = None,
+        optimistic: bool | None = None,
+    ) -> None:
+        """Send a command and apply its outcome to the entity state.
+
+        In optimistic mode the intended state is written right away and the
+        command runs in the background, rolling the state back if it fails.
+        """
+        if optimistic is None:
+            optimistic = self.coordinator.optimistic
+        # Later service calls replace the context, keep the one of this call.
+        sent = send(context=self._context)
+        if not optimistic:
+            await self._async_confirm(sent, apply, None)
+            return
+
+        apply()
+        self.async_write_ha_state()
+        task = self.hass.async_create_task(self._async_confirm(sent, apply, rollback))
+        self._command_tasks.add(task)
+        task.add_done_callback(self._command_tasks.discard)
+
+    async def _async_confirm(
+        self,
+        sent: Awaitable[bool | None],
+        apply: Callable[[], None],
+        rollback: Callable[[], None] | None,
+    ) -> None:
+        """Apply the outcome of a command once the device answered."""
+        if (success := await sent) is None:
+            # Superseded by a newer command.
+            return
+
+        self._last_run_success = success
+        if success:
+            apply()
+        elif rollback is not None:
+            rollback()
+        self.coordinator.async_device_commanded(self._idx)
+        self.async_write_ha_state()
+
+    @callback
+    def _async_cancel_commands(self) -> None:
+        """Cancel the optimistic commands still running."""
+        for task in self._command_tasks:
+            task.cancel()
+
+    async def _async_send_command(
+        self, command: str, *args: Any, context: Context | None = None
+    ) -> bool:
+        """Send a command to the device and record its performance."""
+        if context is None:
+            context = self._context
+        token = command_priority.set(async_command_priority(command, context))
+        start = time.monotonic()
+        try:
+            success = bool(await getattr(self._device, command)(*args))
+        finally:
+            command_priority.reset(token)
+        duration = time.monotonic() - start
+        self.coordinator.stats.async_get(self._idx).async_record_command(
+            command, duration, success, self._device.last_retries
+        )
+        if self._breaker_open:
+            self.coordinator.async_update_availability()
+        self.hass.bus.async_fire(
+            EVENT_COMMAND_COMPLETED if success else EVENT_COMMAND_FAILED,
+            {
+                "entity_id": self.entity_id,
+                "command": command,
+                "duration": round(duration, 3),
+                "retries": self._device.last_retries,
+            },
+            context=context,
+        )
+        return success
+
+    @callback
+    def _async_update_attrs(self) -> None:
+        """Update entity attributes from coordinator data."""
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Handle updated data from the coordinator."""
+        available = self.available
+        if available == self._last_available and not (
+            self.coordinator.async_device_changed(self._idx, self._data_keys)
+        ):
+            self.coordinator.skipped_writes += 1
+            return
+
+        self._last_available = available
+        self.coordinator.state_writes += 1
+        if available:
+            self._async_update_attrs()
+        self.async_write_ha_state()
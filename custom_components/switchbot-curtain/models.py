@@ -0,0 +1,231 @@
+"""Typed state records of Switchbot devices built from advertisements."""
+from __future__ import annotations
+
+from collections.abc import Callable
+from dataclasses import dataclass
+import struct
+import time
+from typing import Any, ClassVar
+
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import CONF_MAC, CONF_NAME, CONF_PASSWORD, CONF_SENSOR_TYPE
+
+from .const import CONF_DEVICES, MODEL_NAMES
+from .decoder import decode_bot, decode_curtain
+
+
+@dataclass
+class SwitchbotDeviceConfig:
+    """A configured device, set up by its own entry or by a hub entry."""
+
+    idx: str
+    mac: str
+    name: str
+    sensor_type: str
+    password: str | None = None
+    # Entry id of the hub the device belongs to.
+    hub: str | None = None
+
+    @property
+    def model(self) -> str:
+        """Return the model name of the device."""
+        return MODEL_NAMES[self.sensor_type]
+
+
+def entry_devices(entry: ConfigEntry) -> list[SwitchbotDeviceConfig]:
+    """Return the devices a config entry sets up."""
+    if CONF_DEVICES not in entry.data:
+        return [
+            SwitchbotDeviceConfig(
+                idx=entry.unique_id,
+                mac=entry.data[CONF_MAC],
+                name=entry.data[CONF_NAME],
+                sensor_type=entry.data[CONF_SENSOR_TYPE],
+                password=entry.data.get(CONF_PASSWORD),
+            )
+        ]
+
+    return [
+        SwitchbotDeviceConfig(
+            idx=idx,
+            mac=device[CONF_MAC],
+            name=device[CONF_NAME],
+            sensor_type=device[CONF_SENSOR_TYPE],
+            password=device.get(CONF_PASSWORD),
+            hub=entry.entry_id,
+        )
+        for idx, device in entry.data[CONF_DEVICES].items()
+    ]
+
+
+class DeviceState:
+    """State of a Switchbot device, updated in place by advertisements."""
+
+    __slots__ = (
+        "mac_address",
+        "model",
+        "model_name",
+        "is_encrypted",
+        "raw_adv_data",
+        "last_seen",
+        "stale",
+        "rssi",
+        "battery",
+    )
+
+    # Advertisement data keys and the attributes they are stored in.
+    FIELDS: ClassVar[dict[str, str]] = {"rssi": "rssi", "battery": "battery"}
+    # Decoder of the raw service data and the attributes of its values.
+    decode: ClassVar[Callable[[bytes], tuple[Any, ...]] | None] = None
+    DECODED: ClassVar[tuple[str, ...]] = ()
+
+    def __init__(self, adv: dict[str, Any]) -> None:
+        """Initialize the state from the first advertisement of a device."""
+        self.mac_address: str = adv["mac_address"]
+        self.model: str | None = adv.get("model")
+        self.model_name: str | None = adv.get("modelName")
+        self.is_encrypted: bool | None = adv.get("isEncrypted")
+        self.raw_adv_data: bytes = adv["rawAdvData"]
+        # True while the state comes from a snapshot taken before a restart.
+        self.stale = False
+        for attribute in self.FIELDS.values():
+            setattr(self, attribute, None)
+        self.update(adv)
+
+    def update(self, adv: dict[str, Any]) -> set[str]:
+        """Apply an advertisement, return the attributes that changed."""
+        self.raw_adv_data = adv["rawAdvData"]
+        self.last_seen = time.monotonic()
+        data = adv["data"]
+        changed = set()
+        if self.stale:
+            self.stale = False
+            changed.add("stale")
+        for key, attribute in self.FIELDS.items():
+            if (value := data.get(key)) != getattr(self, attribute):
+                setattr(self, attribute, value)
+                changed.add(attribute)
+        return changed
+
+    def update_raw(self, data: bytes, rssi: int | None) -> set[str]:
+        """Apply raw service data of the same model, return what changed.
+
+        Service data repeating the previous advertisement is not decoded.
+        """
+        self.last_seen = time.monotonic()
+        changed = set()
+        if self.stale:
+            self.stale = False
+            changed.add("stale")
+        if rssi != self.rssi:
+            self.rssi = rssi
+            changed.add("rssi")
+        if data == self.raw_adv_data:
+            return changed
+
+        if self.decode is not None:
+            try:
+                values = self.decode(data)
+            except struct.error:
+                # Truncated service data, keep the previous state.
+                return changed
+            for attribute, value in zip(self.DECODED, values):
+                if value != getattr(self, attribute):
+                    setattr(self, attribute, value)
+                    changed.add(attribute)
+        self.raw_adv_data = data
+        return changed
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the state as a dict."""
+        return {
+            "mac_address": self.mac_address,
+            "model": self.model,
+            "model_name": self.model_name,
+            "is_encrypted": self.is_encrypted,
+            "raw_adv_data": self.raw_adv_data.hex(),
+            "stale": self.stale,
+            **{
+                attribute: getattr(self, attribute)
+                for attribute in self.FIELDS.values()
+            },
+        }
+
+
+class BotState(DeviceState):
+    """State of a Switchbot bot."""
+
+    __slots__ = ("switch_mode", "is_on")
+
+    FIELDS = {
+        **DeviceState.FIELDS,
+        "switchMode": "switch_mode",
+        "isOn": "is_on",
+    }
+    decode = staticmethod(decode_bot)
+    DECODED = ("switch_mode", "is_on", "battery")
+
+
+class CurtainState(DeviceState):
+    """State of a Switchbot curtain."""
+
+    __slots__ = (
+        "calibration",
+        "in_motion",
+        "position",
+        "light_level",
+        "device_chain",
+    )
+
+    FIELDS = {
+        **DeviceState.FIELDS,
+        "calibration": "calibration",
+        "inMotion": "in_motion",
+        "position": "position",
+        "lightLevel": "light_level",
+        "deviceChain": "device_chain",
+    }
+    decode = staticmethod(decode_curtain)
+    DECODED = (
+        "calibration",
+        "battery",
+        "in_motion",
+        "position",
+        "light_level",
+        "device_chain",
+    )
+
+
+STATE_TYPES: dict[str | None, type[DeviceState]] = {
+    "WoHand": BotState,
+    "WoCurtain": CurtainState,
+}
+
+
+def create_state(adv: dict[str, Any]) -> DeviceState:
+    """Create the state record matching the model of an advertisement."""
+    return STATE_TYPES.get(adv.get("modelName"), DeviceState)(adv)
+
+
+def snapshot_state(state: DeviceState) -> dict[str, Any]:
+    """Return a state as a storable dict with a wall clock last_seen."""
+    return {
+        **state.as_dict(),
+        "last_seen": time.time() - (time.monotonic() - state.last_seen),
+    }
+
+
+def restore_state(snapshot: dict[str, Any]) -> DeviceState:
+    """Create a stale state record from a stored snapshot."""
+    state_type = STATE_TYPES.get(snapshot["model_name"], DeviceState)
+    state = state_type.__new__(state_type)
+    state.mac_address = snapshot["mac_address"]
+    state.model = snapshot["model"]
+    state.model_name = snapshot["model_name"]
+    state.is_encrypted = snapshot["is_encrypted"]
+    state.raw_adv_data = bytes.fromhex(snapshot["raw_adv_data"])
+    state.last_seen = time.monotonic() - max(time.time() - snapshot["last_seen"], 0)
+    state.stale = True
+    for attribute in state.FIELDS.values():
+        setattr(state, attribute, snapshot.get(attribute))
+    return state
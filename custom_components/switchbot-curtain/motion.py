@@ -0,0 +1,100 @@
+"""Estimate curtain positions between advertisements."""
+from __future__ import annotations
+
+import math
+import time
+
+from homeassistant.core import callback
+
+from .const import DEFAULT_CURTAIN_SPEED, MOTION_GRACE
+
+# Weight of a new speed sample in the running speed estimate.
+_SPEED_SMOOTHING = 0.3
+
+
+class CurtainMotion:
+    """Interpolate the position of a curtain moving towards a target.
+
+    The travel speed in percent per second is learned from the positions
+    advertised while the curtain moves, every advertisement resyncs the
+    estimate with the real position.
+    """
+
+    def __init__(self, speed: float = DEFAULT_CURTAIN_SPEED) -> None:
+        """Initialize the estimator."""
+        self.speed = speed
+        self.target: int | None = None
+        self._position: int | None = None
+        self._updated = 0.0
+        self._commanded = 0.0
+        # Last position advertised while moving and when it was received.
+        self._motion_sample: tuple[float, int] | None = None
+
+    @property
+    def moving(self) -> bool:
+        """Return true while a commanded move is being tracked."""
+        return self.target is not None and self._position is not None
+
+    def position(self, now: float | None = None) -> int | None:
+        """Return the estimated position."""
+        if self.target is None or self._position is None:
+            return self._position
+
+        if now is None:
+            now = time.monotonic()
+        travelled = self.speed * (now - self._updated)
+        remaining = self.target - self._position
+        if abs(remaining) <= travelled:
+            return self.target
+        return round(self._position + math.copysign(travelled, remaining))
+
+    @callback
+    def async_start(self, target: int) -> None:
+        """Track a move to target that was just commanded."""
+        if self._position is None:
+            return
+
+        now = time.monotonic()
+        self._position = self.position(now)
+        self._updated = self._commanded = now
+        self.target = target
+
+    @callback
+    def async_stop(self) -> None:
+        """Stop tracking at the estimated position."""
+        now = time.monotonic()
+        self._position = self.position(now)
+        self._updated = now
+        self.target = None
+        self._motion_sample = None
+
+    @callback
+    def async_abort(self) -> None:
+        """Forget a move that failed to start, keeping the last position."""
+        self.target = None
+        self._motion_sample = None
+        self._updated = time.monotonic()
+
+    @callback
+    def async_sample(self, position: int, in_motion: bool) -> None:
+        """Resync with an advertised position and learn the travel speed."""
+        now = time.monotonic()
+
+        if in_motion and self._motion_sample is not None:
+            sampled, previous = self._motion_sample
+            if (elapsed := now - sampled) > 0 and position != previous:
+                self.speed += _SPEED_SMOOTHING * (
+                    abs(position - previous) / elapsed - self.speed
+                )
+
+        self._motion_sample = (now, position) if in_motion else None
+        self._position = position
+        self._updated = now
+
+        if self.target is None:
+            return
+        # Adverts sent just after the command may not report the motion yet.
+        if position == self.target or (
+            not in_motion and now - self._commanded > MOTION_GRACE
+        ):
+            self.target = None
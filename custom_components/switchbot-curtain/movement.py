@@ -0,0 +1,110 @@
+"""Detect curtain movement from successive advertised positions."""
+from __future__ import annotations
+
+from dataclasses import dataclass
+import time
+
+from homeassistant.core import callback
+
+from .const import MOVEMENT_SETTLE, MOVEMENT_TIMEOUT
+
+
+@dataclass
+class Movement:
+    """A curtain movement in progress."""
+
+    start_position: int | None
+    # Position of the last update.
+    position: int | None
+    started: float
+    # When the curtain was last seen moving and last heard at all.
+    moved: float
+    heard: float
+
+    @property
+    def duration(self) -> float:
+        """Return the seconds the curtain was seen moving."""
+        return self.moved - self.started
+
+    @property
+    def opening(self) -> bool:
+        """Return true if the curtain moved towards open since it started."""
+        return self._travelled > 0
+
+    @property
+    def closing(self) -> bool:
+        """Return true if the curtain moved towards closed since it started."""
+        return self._travelled < 0
+
+    @property
+    def _travelled(self) -> int:
+        """Return how far the curtain opened since it started moving."""
+        if self.start_position is None or self.position is None:
+            return 0
+        return self.position - self.start_position
+
+
+class MovementTracker:
+    """Follow the positions curtains report to tell which of them move.
+
+    A curtain starts moving when its position changes between updates or it
+    advertises motion. It stops once its position held for MOVEMENT_SETTLE
+    seconds without motion, or when it goes unheard for MOVEMENT_TIMEOUT.
+    """
+
+    def __init__(self) -> None:
+        """Initialize the tracker."""
+        self._positions: dict[str, int | None] = {}
+        self.movements: dict[str, Movement] = {}
+
+    @callback
+    def async_forget(self, mac: str) -> None:
+        """Drop what is known about a curtain, its next update is a baseline."""
+        self._positions.pop(mac, None)
+        self.movements.pop(mac, None)
+
+    @callback
+    def async_update(
+        self, mac: str, position: int | None, in_motion: bool
+    ) -> Movement | None:
+        """Record an update of a curtain.
+
+        Return the movement of the curtain if it just started or stopped, it
+        is in movements while it goes on.
+        """
+        now = time.monotonic()
+        if mac not in self._positions:
+            self._positions[mac] = position
+            return None
+
+        previous = self._positions[mac]
+        self._positions[mac] = position
+        moving = in_motion or position != previous
+        if (movement := self.movements.get(mac)) is None:
+            if not moving:
+                return None
+            movement = self.movements[mac] = Movement(
+                previous, position, now, now, now
+            )
+            return movement
+
+        movement.position = position
+        movement.heard = now
+        if moving:
+            movement.moved = now
+        if moving or now - movement.moved < MOVEMENT_SETTLE:
+            return None
+        return self.movements.pop(mac)
+
+    @callback
+    def async_expire(self) -> dict[str, Movement]:
+        """Stop the movements of curtains unheard for too long, return them."""
+        oldest = time.monotonic() - MOVEMENT_TIMEOUT
+        expired = {
+            mac: movement
+            for mac, movement in self.movements.items()
+            if movement.heard < oldest
+        }
+        for mac in expired:
+            del self.movements[mac]
+        return expired
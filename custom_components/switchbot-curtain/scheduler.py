@@ -0,0 +1,75 @@
+"""Adaptive per-device refresh scheduling for Switchbot devices."""
+from __future__ import annotations
+
+import time
+
+from homeassistant.core import callback
+
+
+class RefreshScheduler:
+    """Track a refresh cadence per device.
+
+    Devices are refreshed every min_interval right after a command or a
+    state change, backing off exponentially while idle until they fall back
+    to max_interval and are no longer tracked.
+    """
+
+    def __init__(
+        self, *, min_interval: float, max_interval: float, backoff: float = 2
+    ) -> None:
+        """Initialize the scheduler."""
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self._intervals: dict[str, float] = {}
+        self._due: dict[str, float] = {}
+        self._last_full_refresh = 0.0
+
+    @property
+    def intervals(self) -> dict[str, float]:
+        """Return the current cadence of every fast-tracked device."""
+        return dict(self._intervals)
+
+    @callback
+    def async_mark_active(self, mac: str) -> None:
+        """Refresh mac at the fastest cadence."""
+        self._intervals[mac] = self.min_interval
+        self._due[mac] = time.monotonic() + self.min_interval
+
+    @callback
+    def async_refreshed(self, changed: set[str], *, full: bool) -> None:
+        """Update cadences after a refresh, changed holds the active devices."""
+        now = time.monotonic()
+        if full:
+            self._last_full_refresh = now
+
+        for mac in changed:
+            self._intervals[mac] = self.min_interval
+
+        for mac, interval in list(self._intervals.items()):
+            if mac not in changed:
+                interval *= self.backoff
+            if interval >= self.max_interval:
+                del self._intervals[mac]
+                self._due.pop(mac, None)
+                continue
+            self._intervals[mac] = interval
+            self._due[mac] = now + interval
+
+    @callback
+    def async_fast_refresh(self) -> bool:
+        """Return true if a short scan for fast-tracked devices is enough."""
+        return (
+            bool(self._due)
+            and time.monotonic() - self._last_full_refresh < self.max_interval
+        )
+
+    @callback
+    def next_refresh_in(self) -> float:
+        """Return the seconds until the next device is due for a refresh."""
+        if not self._due:
+            return self.max_interval
+        return max(
+            self.min_interval,
+            min(min(self._due.values()) - time.monotonic(), self.max_interval),
+        )
@@ -1,51 +1,132 @@
 """Support for SwitchBot sensors."""
 from __future__ import annotations
 
+from collections.abc import Callable
+from dataclasses import dataclass
+import time
+from typing import TYPE_CHECKING, Any
+
 from homeassistant.components.sensor import (
     SensorDeviceClass,
     SensorEntity,
     SensorEntityDescription,
+    SensorStateClass,
 )
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.const import (
-    CONF_MAC,
-    CONF_NAME,
     PERCENTAGE,
     SIGNAL_STRENGTH_DECIBELS_MILLIWATT,
+    TIME_MILLISECONDS,
 )
-from homeassistant.core import HomeAssistant
-from homeassistant.exceptions import PlatformNotReady
+from homeassistant.core import CALLBACK_TYPE, HomeAssistant, callback
 from homeassistant.helpers.entity import EntityCategory
 from homeassistant.helpers.entity_platform import AddEntitiesCallback
+from homeassistant.helpers.event import async_call_later
+from homeassistant.helpers.typing import StateType
 
 from .const import DATA_COORDINATOR, DOMAIN
-from .coordinator import SwitchbotDataUpdateCoordinator
 from .entity import SwitchbotEntity
+from .models import STATE_TYPES, SwitchbotDeviceConfig, entry_devices
+from .stats import DeviceStats
+
+if TYPE_CHECKING:
+    from .coordinator import SwitchbotDataUpdateCoordinator
+
+PARALLEL_UPDATES = 0
+
 
-PARALLEL_UPDATES = 1
+@dataclass
+class SwitchbotSensorEntityDescription(SensorEntityDescription):
+    """Describes a Switchbot sensor and how often its state is written."""
 
-SENSOR_TYPES: dict[str, SensorEntityDescription] = {
-    "rssi": SensorEntityDescription(
+    # Smallest change of the value that is written.
+    deadband: float = 0
+    # Seconds between two state writes of changed values.
+    min_interval: float = 0
+    # Weight of a new sample in an exponential moving average of the value.
+    smoothing: float | None = None
+
+
+SENSOR_TYPES: dict[str, SwitchbotSensorEntityDescription] = {
+    "rssi": SwitchbotSensorEntityDescription(
         key="rssi",
         native_unit_of_measurement=SIGNAL_STRENGTH_DECIBELS_MILLIWATT,
         device_class=SensorDeviceClass.SIGNAL_STRENGTH,
         entity_registry_enabled_default=False,
         entity_category=EntityCategory.DIAGNOSTIC,
+        deadband=5,
+        min_interval=300,
+        smoothing=0.3,
     ),
-    "battery": SensorEntityDescription(
+    "battery": SwitchbotSensorEntityDescription(
         key="battery",
         native_unit_of_measurement=PERCENTAGE,
         device_class=SensorDeviceClass.BATTERY,
         entity_category=EntityCategory.DIAGNOSTIC,
     ),
-    "lightLevel": SensorEntityDescription(
+    "lightLevel": SwitchbotSensorEntityDescription(
         key="lightLevel",
         native_unit_of_measurement="Level",
         device_class=SensorDeviceClass.ILLUMINANCE,
+        deadband=1,
+        min_interval=60,
     ),
 }
 
 
+def _milliseconds(seconds: float | None) -> int | None:
+    """Convert seconds to rounded milliseconds."""
+    return None if seconds is None else round(seconds * 1000)
+
+
+@dataclass
+class SwitchbotPerformanceSensorEntityDescription(SensorEntityDescription):
+    """Describes a Switchbot performance sensor."""
+
+    value_fn: Callable[[DeviceStats], StateType] = lambda stats: None
+
+
+PERFORMANCE_SENSOR_TYPES: tuple[SwitchbotPerformanceSensorEntityDescription, ...] = (
+    SwitchbotPerformanceSensorEntityDescription(
+        key="command_rtt",
+        name="Command Round Trip",
+        native_unit_of_measurement=TIME_MILLISECONDS,
+        device_class=SensorDeviceClass.DURATION,
+        state_class=SensorStateClass.MEASUREMENT,
+        entity_registry_enabled_default=False,
+        entity_category=EntityCategory.DIAGNOSTIC,
+        value_fn=lambda stats: _milliseconds(stats.median_rtt),
+    ),
+    SwitchbotPerformanceSensorEntityDescription(
+        key="command_success_rate",
+        name="Command Success Rate",
+        native_unit_of_measurement=PERCENTAGE,
+        state_class=SensorStateClass.MEASUREMENT,
+        entity_registry_enabled_default=False,
+        entity_category=EntityCategory.DIAGNOSTIC,
+        value_fn=lambda stats: stats.success_rate,
+    ),
+    SwitchbotPerformanceSensorEntityDescription(
+        key="command_retries",
+        name="Command Retries",
+        state_class=SensorStateClass.TOTAL_INCREASING,
+        entity_registry_enabled_default=False,
+        entity_category=EntityCategory.DIAGNOSTIC,
+        value_fn=lambda stats: stats.retries,
+    ),
+    SwitchbotPerformanceSensorEntityDescription(
+        key="first_advertisement",
+        name="Scan Latency",
+        native_unit_of_measurement=TIME_MILLISECONDS,
+        device_class=SensorDeviceClass.DURATION,
+        state_class=SensorStateClass.MEASUREMENT,
+        entity_registry_enabled_default=False,
+        entity_category=EntityCategory.DIAGNOSTIC,
+        value_fn=lambda stats: _milliseconds(stats.median_first_advertisement),
+    ),
+)
+
+
 async def async_setup_entry(
     hass: HomeAssistant, entry: ConfigEntry, async_add_entities: AddEntitiesCallback
 ) -> None:
@@ -53,44 +134,179 @@ async def async_setup_entry(
     coordinator: SwitchbotDataUpdateCoordinator = hass.data[DOMAIN][entry.entry_id][
         DATA_COORDINATOR
     ]
+    entities: list[SwitchbotEntity] = []
+    for device in entry_devices(entry):
+        fields = STATE_TYPES[device.model].FIELDS
+        entities.extend(
+            SwitchBotSensor(coordinator, device, sensor)
+            for sensor in SENSOR_TYPES
+            if sensor in fields
+        )
+        entities.extend(
+            SwitchBotPerformanceSensor(coordinator, device, description)
+            for description in PERFORMANCE_SENSOR_TYPES
+        )
+    async_add_entities(entities)
 
-    if not coordinator.data.get(entry.unique_id):
-        raise PlatformNotReady
 
-    async_add_entities(
-        [
-            SwitchBotSensor(
-                coordinator,
-                entry.unique_id,
-                sensor,
-                entry.data[CONF_MAC],
-                entry.data[CONF_NAME],
-            )
-            for sensor in coordinator.data[entry.unique_id]["data"]
-            if sensor in SENSOR_TYPES
-        ]
-    )
+class SwitchBotSensor(SwitchbotEntity, SensorEntity):
+    """Representation of a Switchbot sensor.
 
+    Changes within the deadband of the last written value are not written.
+    Changes sooner than min_interval after it are written once it has passed.
+    """
 
-class SwitchBotSensor(SwitchbotEntity, SensorEntity):
-    """Representation of a Switchbot sensor."""
+    entity_description: SwitchbotSensorEntityDescription
 
     def __init__(
         self,
         coordinator: SwitchbotDataUpdateCoordinator,
-        idx: str | None,
+        device: SwitchbotDeviceConfig,
         sensor: str,
-        mac: str,
-        switchbot_name: str,
     ) -> None:
         """Initialize the Switchbot sensor."""
-        super().__init__(coordinator, idx, mac, name=switchbot_name)
-        self._sensor = sensor
-        self._attr_unique_id = f"{idx}-{sensor}"
-        self._attr_name = f"{switchbot_name} {sensor.title()}"
+        super().__init__(coordinator, device)
+        self._attribute = STATE_TYPES[device.model].FIELDS[sensor]
+        self._data_keys = {self._attribute}
+        self._attr_unique_id = f"{device.idx}-{sensor}"
+        self._attr_name = f"{device.name} {sensor.title()}"
         self.entity_description = SENSOR_TYPES[sensor]
+        self._smoothed: float | None = None
+        self._written_at = 0.0
+        self._cancel_flush: CALLBACK_TYPE | None = None
+
+    async def async_will_remove_from_hass(self) -> None:
+        """Drop a pending write of a held back change."""
+        await super().async_will_remove_from_hass()
+        self._async_cancel_flush()
+
+    @callback
+    def _async_sample(self) -> None:
+        """Fold the current device value into the smoothed value."""
+        value = getattr(self.data, self._attribute)
+        smoothing = self.entity_description.smoothing
+        if value is None or smoothing is None or self._smoothed is None:
+            self._smoothed = value
+        else:
+            self._smoothed += smoothing * (value - self._smoothed)
 
     @property
-    def native_value(self) -> str:
-        """Return the state of the sensor."""
-        return self.data["data"][self._sensor]
+    def _sampled_value(self) -> StateType:
+        """Return the value a state write would show."""
+        if self._smoothed is None or self.entity_description.smoothing is None:
+            return self._smoothed
+        return round(self._smoothed)
+
+    @callback
+    def _async_update_attrs(self) -> None:
+        """Show the current device value."""
+        self._async_sample()
+        self._attr_native_value = self._sampled_value
+        self._written_at = time.monotonic()
+
+    @callback
+    def _async_due(self) -> bool:
+        """Return true if the sampled value differs enough to be written.
+
+        A change held back by min_interval is written once it has passed.
+        """
+        value, written = self._sampled_value, self._attr_native_value
+        if value == written:
+            return False
+        if value is None or written is None:
+            return True
+
+        description = self.entity_description
+        if abs(value - written) < description.deadband:
+            return False
+        wait = self._written_at + description.min_interval - time.monotonic()
+        if wait > 0:
+            if self._cancel_flush is None:
+                self._cancel_flush = async_call_later(
+                    self.hass, wait, self._async_flush
+                )
+            return False
+        return True
+
+    @callback
+    def _async_flush(self, _now: Any) -> None:
+        """Write a change held back by min_interval."""
+        self._cancel_flush = None
+        # Written unless the value went back within the deadband meanwhile.
+        if self._last_available and self.available and self._async_due():
+            self._async_write_state()
+
+    @callback
+    def _async_cancel_flush(self) -> None:
+        """Cancel the pending write of a held back change."""
+        if self._cancel_flush:
+            self._cancel_flush()
+            self._cancel_flush = None
+
+    @callback
+    def _async_write_state(self) -> None:
+        """Write the state, with the sampled value while available."""
+        self._async_cancel_flush()
+        if self._last_available:
+            self._attr_native_value = self._sampled_value
+            self._written_at = time.monotonic()
+        self.coordinator.state_writes += 1
+        self.async_write_ha_state()
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Write the state when the value moved out of the deadband."""
+        available = self.available
+        changed = self.coordinator.changed_fields.get(self._idx, set())
+        if available and self._attribute in changed:
+            self._async_sample()
+
+        if (
+            available == self._last_available
+            and "stale" not in changed
+            and not (available and self._async_due())
+        ):
+            self.coordinator.skipped_writes += 1
+            return
+
+        self._last_available = available
+        self._async_write_state()
+
+
+class SwitchBotPerformanceSensor(SwitchbotEntity, SensorEntity):
+    """Representation of a Switchbot performance sensor."""
+
+    entity_description: SwitchbotPerformanceSensorEntityDescription
+
+    def __init__(
+        self,
+        coordinator: SwitchbotDataUpdateCoordinator,
+        device: SwitchbotDeviceConfig,
+        description: SwitchbotPerformanceSensorEntityDescription,
+    ) -> None:
+        """Initialize the Switchbot performance sensor."""
+        super().__init__(coordinator, device)
+        self._attr_unique_id = f"{device.idx}-{description.key}"
+        self._attr_name = f"{device.name} {description.name}"
+        self.entity_description = description
+        self._attr_native_value = self._value()
+
+    def _value(self) -> StateType:
+        """Return the current value from the device statistics."""
+        return self.entity_description.value_fn(
+            self.coordinator.stats.async_get(self._idx)
+        )
+
+    @callback
+    def _handle_coordinator_update(self) -> None:
+        """Write the state only when the statistic changed."""
+        available = self.available
+        value = self._value()
+        if available == self._last_available and value == self._attr_native_value:
+            self.coordinator.skipped_writes += 1
+            return
+
+        self._last_available = available
+        self._attr_native_value = value
+        self.coordinator.state_writes += 1
+        self.async_write_ha_state()
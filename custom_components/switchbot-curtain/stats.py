@@ -0,0 +1,142 @@
+"""Per-device performance statistics for Switchbot scans and commands."""
+from __future__ import annotations
+
+from bisect import bisect_left
+from collections import deque
+import statistics
+from typing import Any
+
+from homeassistant.core import callback
+
+# Upper bounds in seconds of the command round trip histogram buckets.
+RTT_BUCKETS = (0.25, 0.5, 1.0, 2.0, 5.0, 10.0)
+# Number of recent samples kept for medians.
+SAMPLE_SIZE = 50
+
+
+class CommandStats:
+    """Outcome counters of one command type."""
+
+    def __init__(self) -> None:
+        """Initialize the counters."""
+        self.count = 0
+        self.success = 0
+        self.retries = 0
+
+    @property
+    def success_rate(self) -> float | None:
+        """Return the share of successful commands in percent."""
+        if not self.count:
+            return None
+        return round(self.success * 100 / self.count, 1)
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the counters."""
+        return {
+            "count": self.count,
+            "success": self.success,
+            "retries": self.retries,
+            "success_rate": self.success_rate,
+        }
+
+
+class DeviceStats:
+    """Scan latency and command statistics of a single device."""
+
+    def __init__(self) -> None:
+        """Initialize the statistics."""
+        self.scans = 0
+        self.scan_misses = 0
+        self.first_advertisement: deque[float] = deque(maxlen=SAMPLE_SIZE)
+        self.rtt: deque[float] = deque(maxlen=SAMPLE_SIZE)
+        self.rtt_histogram = [0] * (len(RTT_BUCKETS) + 1)
+        self.commands: dict[str, CommandStats] = {}
+
+    @property
+    def median_first_advertisement(self) -> float | None:
+        """Return the median time to the first advertisement of a scan."""
+        if not self.first_advertisement:
+            return None
+        return statistics.median(self.first_advertisement)
+
+    @property
+    def median_rtt(self) -> float | None:
+        """Return the median command round trip time."""
+        if not self.rtt:
+            return None
+        return statistics.median(self.rtt)
+
+    @property
+    def success_rate(self) -> float | None:
+        """Return the share of successful commands of all types in percent."""
+        count = sum(command.count for command in self.commands.values())
+        if not count:
+            return None
+        success = sum(command.success for command in self.commands.values())
+        return round(success * 100 / count, 1)
+
+    @property
+    def retries(self) -> int:
+        """Return the retries of all command types."""
+        return sum(command.retries for command in self.commands.values())
+
+    @callback
+    def async_record_scan(self, first_advertisement: float | None) -> None:
+        """Record when a scan first heard the device, None if it never did."""
+        self.scans += 1
+        if first_advertisement is None:
+            self.scan_misses += 1
+            return
+        self.first_advertisement.append(first_advertisement)
+
+    @callback
+    def async_record_command(
+        self, command: str, rtt: float, success: bool, retries: int
+    ) -> None:
+        """Record the outcome of a command."""
+        self.rtt.append(rtt)
+        self.rtt_histogram[bisect_left(RTT_BUCKETS, rtt)] += 1
+        stats = self.commands.setdefault(command, CommandStats())
+        stats.count += 1
+        stats.success += success
+        stats.retries += retries
+
+    def as_dict(self) -> dict[str, Any]:
+        """Return the statistics."""
+        return {
+            "scans": self.scans,
+            "scan_misses": self.scan_misses,
+            "median_first_advertisement": self.median_first_advertisement,
+            "median_rtt": self.median_rtt,
+            "rtt_histogram": {
+                f"<={bound}s": count
+                for bound, count in zip(RTT_BUCKETS, self.rtt_histogram)
+            }
+            | {f">{RTT_BUCKETS[-1]}s": self.rtt_histogram[-1]},
+            "commands": {
+                command: stats.as_dict() for command, stats in self.commands.items()
+            },
+        }
+
+
+class PerformanceStats:
+    """Statistics of all devices by advertisement table key."""
+
+    def __init__(self) -> None:
+        """Initialize the statistics."""
+        self.devices: dict[str, DeviceStats] = {}
+
+    @callback
+    def async_get(self, mac: str) -> DeviceStats:
+        """Return the statistics of mac, creating them on first use."""
+        if (stats := self.devices.get(mac)) is None:
+            stats = self.devices[mac] = DeviceStats()
+        return stats
+
+    @callback
+    def async_record_scan(
+        self, targets: set[str], first_seen: dict[str, float]
+    ) -> None:
+        """Record a scan for targets, first_seen holds the delay per device."""
+        for mac in targets:
+            self.async_get(mac).async_record_scan(first_seen.get(mac))
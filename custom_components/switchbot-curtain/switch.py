@@ -1,26 +1,29 @@
 """Support for Switchbot bot."""
 from __future__ import annotations
 
+from functools import partial
 import logging
-from typing import Any
-
-from switchbot import Switchbot
+from typing import TYPE_CHECKING, Any
 
 from homeassistant.components.switch import SwitchDeviceClass, SwitchEntity
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.const import CONF_MAC, CONF_NAME, CONF_PASSWORD, STATE_ON
-from homeassistant.core import HomeAssistant
-from homeassistant.exceptions import PlatformNotReady
+from homeassistant.const import STATE_ON
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.helpers import entity_platform
 from homeassistant.helpers.restore_state import RestoreEntity
 
-from .const import CONF_RETRY_COUNT, DATA_COORDINATOR, DOMAIN
-from .coordinator import SwitchbotDataUpdateCoordinator
+from .const import ATTR_BOT, DATA_COORDINATOR, DOMAIN
 from .entity import SwitchbotEntity
+from .models import SwitchbotDeviceConfig, entry_devices
+
+if TYPE_CHECKING:
+    from switchbot import Switchbot
+
+    from .coordinator import SwitchbotDataUpdateCoordinator
 
 # Initialize the logger
 _LOGGER = logging.getLogger(__name__)
-PARALLEL_UPDATES = 1
+PARALLEL_UPDATES = 0
 
 
 async def async_setup_entry(
@@ -33,22 +36,19 @@ async def async_setup_entry(
         DATA_COORDINATOR
     ]
 
-    if not coordinator.data.get(entry.unique_id):
-        raise PlatformNotReady
-
     async_add_entities(
         [
             SwitchBotBotEntity(
                 coordinator,
-                entry.unique_id,
-                entry.data[CONF_MAC],
-                entry.data[CONF_NAME],
-                coordinator.switchbot_api.Switchbot(
-                    mac=entry.data[CONF_MAC],
-                    password=entry.data.get(CONF_PASSWORD),
-                    retry_count=entry.options[CONF_RETRY_COUNT],
+                device,
+                coordinator.async_create_device(
+                    coordinator.switchbot_api.Switchbot,
+                    mac=device.mac,
+                    password=device.password,
                 ),
             )
+            for device in entry_devices(entry)
+            if device.sensor_type == ATTR_BOT
         ]
     )
 
@@ -57,19 +57,18 @@ class SwitchBotBotEntity(SwitchbotEntity, SwitchEntity, RestoreEntity):
     """Representation of a Switchbot."""
 
     _attr_device_class = SwitchDeviceClass.SWITCH
+    _data_keys = {"switch_mode", "is_on"}
 
     def __init__(
         self,
         coordinator: SwitchbotDataUpdateCoordinator,
-        idx: str | None,
-        mac: str,
-        name: str,
-        device: Switchbot,
+        device: SwitchbotDeviceConfig,
+        switchbot_device: Switchbot,
     ) -> None:
         """Initialize the Switchbot."""
-        super().__init__(coordinator, idx, mac, name)
-        self._attr_unique_id = idx
-        self._device = device
+        super().__init__(coordinator, device)
+        self._attr_unique_id = device.idx
+        self._device = switchbot_device
         self._attr_is_on = False
 
     async def async_added_to_hass(self) -> None:
@@ -83,39 +82,49 @@ class SwitchBotBotEntity(SwitchbotEntity, SwitchEntity, RestoreEntity):
     async def async_turn_on(self, **kwargs: Any) -> None:
         """Turn device on."""
         _LOGGER.info("Turn Switchbot bot on %s", self._mac)
-
-        self._last_run_success = bool(await self._device.turn_on())
-        if self._last_run_success:
-            self._attr_is_on = True
-        self.async_write_ha_state()
+        await self._async_switch("turn_on", True)
 
     async def async_turn_off(self, **kwargs: Any) -> None:
         """Turn device off."""
         _LOGGER.info("Turn Switchbot bot off %s", self._mac)
+        await self._async_switch("turn_off", False)
+
+    async def _async_switch(self, command: str, is_on: bool) -> None:
+        """Switch the bot, keeping the previous state if the command fails."""
+        previous = self.is_on
+
+        @callback
+        def _async_apply() -> None:
+            self._attr_is_on = is_on
+
+        @callback
+        def _async_rollback() -> None:
+            self._attr_is_on = previous
 
-        self._last_run_success = bool(await self._device.turn_off())
-        if self._last_run_success:
-            self._attr_is_on = False
-        self.async_write_ha_state()
+        await self._async_execute(
+            partial(self._async_send_command, command),
+            _async_apply,
+            _async_rollback,
+        )
 
     @property
     def assumed_state(self) -> bool:
         """Return true if unable to access real state of entity."""
-        if not self.data["data"]["switchMode"]:
+        if not self.available or not self.data.switch_mode:
             return True
         return False
 
     @property
     def is_on(self) -> bool | None:
         """Return true if device is on."""
-        if not self.data["data"]["switchMode"]:
+        if not self.data.switch_mode or self._command_pending:
             return self._attr_is_on
-        return self.data["data"]["isOn"]
+        return self.data.is_on
 
     @property
     def extra_state_attributes(self) -> dict:
         """Return the state attributes."""
         return {
             **super().extra_state_attributes,
-            "switch_mode": self.data["data"]["switchMode"],
+            "switch_mode": self.data.switch_mode,
         }
@@ -0,0 +1,381 @@
+"""Remote Bluetooth proxies reached over TCP.
+
+A proxy node scans and connects with its own radio. It forwards the
+advertisements it hears and the GATT operations it is asked for as JSON
+messages, one per line, see benchmarks/proxy.py for a stand-in node.
+
+Both ends share a secret. On connecting, the proxy sends a random nonce and
+the integration answers with an HMAC of it under the secret and a nonce of
+its own, which the proxy answers in turn. The secret itself is never sent.
+"""
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Callable
+import hashlib
+import hmac
+import itertools
+import json
+import logging
+import secrets
+from typing import Any
+
+import bleak
+
+from homeassistant.core import HomeAssistant, callback
+
+from .const import PROXY_CONNECT_TIMEOUT, PROXY_REQUEST_TIMEOUT, SERVICE_DATA_UUID
+
+_LOGGER = logging.getLogger(__name__)
+
+
+def _digest(secret: str, role: str, nonce: str) -> str:
+    """Return the proof of knowing secret a role gives for a nonce."""
+    return hmac.new(
+        secret.encode(), f"{role}:{nonce}".encode(), hashlib.sha256
+    ).hexdigest()
+
+
+class ProxyDevice:
+    """A device heard by a proxy, as passed to detection callbacks."""
+
+    __slots__ = ("address", "name", "rssi", "details")
+
+    def __init__(self, address: str, name: str | None, rssi: int) -> None:
+        """Initialize the device."""
+        self.address = address
+        self.name = name
+        self.rssi = rssi
+        self.details = None
+
+
+class ProxyAdvertisement:
+    """Advertisement data forwarded by a proxy."""
+
+    __slots__ = ("service_data", "rssi")
+
+    def __init__(self, service_data: dict[str, bytes], rssi: int) -> None:
+        """Initialize the advertisement data."""
+        self.service_data = service_data
+        self.rssi = rssi
+
+
+class ProxyTransport:
+    """Connection to a proxy node shared by its scanners and clients."""
+
+    def __init__(self, hass: HomeAssistant, host: str, port: int, secret: str) -> None:
+        """Initialize the transport, it connects on first use."""
+        self.hass = hass
+        self.host = host
+        self.port = port
+        self._secret = secret
+        self._writer: asyncio.StreamWriter | None = None
+        self._read_task: asyncio.Task | None = None
+        self._connect_lock = asyncio.Lock()
+        self._ids = itertools.count(1)
+        self._requests: dict[int, asyncio.Future[None]] = {}
+        self._scan_callbacks: list[
+            Callable[[ProxyDevice, ProxyAdvertisement], None]
+        ] = []
+        # Clients by lower case address, for notifications and disconnects.
+        self.clients: dict[str, ProxyClient] = {}
+
+    @property
+    def name(self) -> str:
+        """Return the adapter name of the proxy."""
+        return f"proxy:{self.host}:{self.port}"
+
+    @property
+    def connected(self) -> bool:
+        """Return true while the proxy is reachable."""
+        return self._writer is not None
+
+    async def async_connect(self) -> None:
+        """Connect to the proxy unless connected."""
+        async with self._connect_lock:
+            if self._writer is not None:
+                return
+
+            try:
+                reader, writer = await asyncio.wait_for(
+                    asyncio.open_connection(self.host, self.port),
+                    PROXY_CONNECT_TIMEOUT,
+                )
+            except (OSError, asyncio.TimeoutError) as err:
+                raise bleak.BleakError(f"Unable to reach {self.name}: {err}") from err
+
+            try:
+                await asyncio.wait_for(
+                    self._async_authenticate(reader, writer), PROXY_CONNECT_TIMEOUT
+                )
+            except (
+                AttributeError,
+                KeyError,
+                OSError,
+                TypeError,
+                ValueError,
+                asyncio.TimeoutError,
+            ) as err:
+                writer.close()
+                raise bleak.BleakError(
+                    f"Unable to authenticate with {self.name}: {err}"
+                ) from err
+
+            _LOGGER.debug("Connected to %s", self.name)
+            self._writer = writer
+            # Runs for the lifetime of the connection, outside of tracked tasks.
+            self._read_task = self.hass.loop.create_task(self._async_read(reader))
+            if self._scan_callbacks:
+                self._async_send({"op": "scan", "on": True})
+
+    async def _async_authenticate(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        """Prove to the proxy that we share its secret and have it prove it too."""
+        hello = json.loads(await reader.readline())
+        if hello["op"] != "hello":
+            raise ValueError(f"expected hello, got {hello['op']}")
+        nonce = secrets.token_hex(16)
+        writer.write(
+            json.dumps(
+                {
+                    "op": "auth",
+                    "digest": _digest(self._secret, "integration", hello["nonce"]),
+                    "nonce": nonce,
+                }
+            ).encode()
+            + b"\n"
+        )
+        reply = json.loads(await reader.readline())
+        if reply["op"] != "welcome":
+            raise ValueError("the proxy refused the secret")
+        if not hmac.compare_digest(
+            reply["digest"], _digest(self._secret, "proxy", nonce)
+        ):
+            raise ValueError("the proxy doesn't know the secret")
+
+    async def async_close(self) -> None:
+        """Close the connection to the proxy."""
+        self._scan_callbacks.clear()
+        if self._read_task is not None:
+            self._read_task.cancel()
+        self._async_lost()
+
+    async def async_request(self, message: dict[str, Any], timeout: float) -> None:
+        """Send a request and wait for the proxy to carry it out."""
+        await self.async_connect()
+        request_id = next(self._ids)
+        future = self.hass.loop.create_future()
+        self._requests[request_id] = future
+        try:
+            self._async_send({**message, "id": request_id})
+            await asyncio.wait_for(future, timeout)
+        finally:
+            self._requests.pop(request_id, None)
+
+    async def async_start_scan(
+        self, detection_callback: Callable[[ProxyDevice, ProxyAdvertisement], None]
+    ) -> None:
+        """Forward the advertisements the proxy hears to detection_callback.
+
+        The callback stays subscribed if the connection drops, the proxy
+        resumes forwarding once reconnected.
+        """
+        await self.async_connect()
+        self._scan_callbacks.append(detection_callback)
+        if len(self._scan_callbacks) == 1:
+            self._async_send({"op": "scan", "on": True})
+
+    @callback
+    def async_stop_scan(
+        self, detection_callback: Callable[[ProxyDevice, ProxyAdvertisement], None]
+    ) -> None:
+        """Stop forwarding advertisements to detection_callback."""
+        if detection_callback in self._scan_callbacks:
+            self._scan_callbacks.remove(detection_callback)
+        if not self._scan_callbacks and self._writer is not None:
+            self._async_send({"op": "scan", "on": False})
+
+    @callback
+    def _async_send(self, message: dict[str, Any]) -> None:
+        """Write a message to the proxy."""
+        if self._writer is None:
+            raise bleak.BleakError(f"Not connected to {self.name}")
+        self._writer.write(json.dumps(message).encode() + b"\n")
+
+    async def _async_read(self, reader: asyncio.StreamReader) -> None:
+        """Dispatch the messages of the proxy until the connection ends."""
+        try:
+            while line := await reader.readline():
+                # A malformed message is skipped, it doesn't end the connection.
+                try:
+                    self._async_dispatch(json.loads(line))
+                except (AttributeError, KeyError, TypeError, ValueError) as err:
+                    _LOGGER.debug(
+                        "Ignoring malformed message from %s: %r (%s)",
+                        self.name,
+                        line,
+                        err,
+                    )
+        except (OSError, ValueError) as err:
+            _LOGGER.debug("Connection to %s failed: %s", self.name, err)
+        finally:
+            self._async_lost()
+
+    @callback
+    def _async_dispatch(self, message: dict[str, Any]) -> None:
+        """Handle a message from the proxy."""
+        op = message["op"]
+        if op == "adv":
+            # Only Switchbot service data is of use, skip other advertisements.
+            if (data := message["service_data"].get(SERVICE_DATA_UUID)) is None:
+                return
+            device = ProxyDevice(
+                message["address"], message.get("name"), message["rssi"]
+            )
+            advertisement = ProxyAdvertisement(
+                {SERVICE_DATA_UUID: bytes.fromhex(data)}, message["rssi"]
+            )
+            for detection_callback in list(self._scan_callbacks):
+                detection_callback(device, advertisement)
+        elif op == "result":
+            future = self._requests.get(message["id"])
+            if future is None or future.done():
+                return
+            if error := message.get("error"):
+                future.set_exception(bleak.BleakError(f"{self.name}: {error}"))
+            else:
+                future.set_result(None)
+        elif op == "notify":
+            if client := self.clients.get(message["address"].lower()):
+                client.async_notified(bytes.fromhex(message["data"]))
+        elif op == "disconnected":
+            if client := self.clients.get(message["address"].lower()):
+                client.async_disconnected()
+
+    @callback
+    def _async_lost(self) -> None:
+        """Fail everything that depended on the connection."""
+        if (writer := self._writer) is None:
+            return
+
+        _LOGGER.debug("Disconnected from %s", self.name)
+        self._writer = None
+        self._read_task = None
+        writer.close()
+        for future in self._requests.values():
+            if not future.done():
+                future.set_exception(bleak.BleakError(f"Lost {self.name}"))
+        for client in list(self.clients.values()):
+            client.async_disconnected()
+
+
+class ProxyScanner:
+    """Scanner interface over the advertisements a proxy forwards."""
+
+    def __init__(self, transport: ProxyTransport) -> None:
+        """Initialize the scanner."""
+        self._transport = transport
+        self._callback: Callable[[ProxyDevice, ProxyAdvertisement], None] | None = None
+
+    def register_detection_callback(
+        self, detection_callback: Callable[[ProxyDevice, ProxyAdvertisement], None]
+    ) -> None:
+        """Set the callback advertisements are passed to."""
+        self._callback = detection_callback
+
+    async def start(self) -> None:
+        """Start receiving advertisements."""
+        if self._callback is not None:
+            await self._transport.async_start_scan(self._callback)
+
+    async def stop(self) -> None:
+        """Stop receiving advertisements."""
+        if self._callback is not None:
+            self._transport.async_stop_scan(self._callback)
+
+
+class ProxyClient:
+    """GATT client interface for a device connected through a proxy."""
+
+    def __init__(
+        self,
+        transport: ProxyTransport,
+        address: str,
+        *,
+        timeout: float,
+        disconnected_callback: Callable[[ProxyClient], None] | None = None,
+    ) -> None:
+        """Initialize the client."""
+        self._transport = transport
+        self.address = address.lower()
+        self._timeout = timeout
+        self._disconnected_callback = disconnected_callback
+        self._notify_callback: Callable[[int, bytearray], None] | None = None
+        self._connected = False
+
+    @property
+    def is_connected(self) -> bool:
+        """Return true while the proxy holds the connection."""
+        return self._connected
+
+    async def connect(self) -> bool:
+        """Have the proxy connect to the device."""
+        self._transport.clients[self.address] = self
+        try:
+            await self._request(
+                "connect", self._timeout + PROXY_REQUEST_TIMEOUT, timeout=self._timeout
+            )
+        except (bleak.BleakError, asyncio.TimeoutError):
+            self._transport.clients.pop(self.address, None)
+            raise
+        self._connected = True
+        return True
+
+    async def disconnect(self) -> bool:
+        """Have the proxy disconnect from the device."""
+        if not self._connected:
+            return True
+        self._connected = False
+        self._transport.clients.pop(self.address, None)
+        await self._request("disconnect")
+        return True
+
+    async def start_notify(
+        self, char_specifier: Any, notify_callback: Callable[[int, bytearray], None]
+    ) -> None:
+        """Subscribe to the notifications of a characteristic."""
+        self._notify_callback = notify_callback
+        await self._request("start_notify", char=str(char_specifier))
+
+    async def write_gatt_char(
+        self, char_specifier: Any, data: bytes, response: bool = False
+    ) -> None:
+        """Write to a characteristic."""
+        await self._request(
+            "write", char=str(char_specifier), data=bytes(data).hex(), response=response
+        )
+
+    async def _request(
+        self, op: str, request_timeout: float = PROXY_REQUEST_TIMEOUT, **fields: Any
+    ) -> None:
+        """Send a request about the device to the proxy."""
+        await self._transport.async_request(
+            {"op": op, "address": self.address, **fields}, request_timeout
+        )
+
+    @callback
+    def async_notified(self, data: bytes) -> None:
+        """Pass a notification forwarded by the proxy on."""
+        if self._notify_callback is not None:
+            self._notify_callback(0, bytearray(data))
+
+    @callback
+    def async_disconnected(self) -> None:
+        """Handle the device or the proxy dropping the connection."""
+        if not self._connected:
+            return
+        self._connected = False
+        self._transport.clients.pop(self.address, None)
+        if self._disconnected_callback is not None:
+            self._disconnected_callback(self)
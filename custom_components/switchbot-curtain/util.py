@@ -0,0 +1,49 @@
+"""Helpers for Switchbot that do not load the BLE backend."""
+from __future__ import annotations
+
+import importlib
+from types import ModuleType
+
+from homeassistant.core import HomeAssistant
+
+from .const import DEFAULT_PROXY_PORT
+
+
+def parse_adapters(value: str) -> list[int]:
+    """Parse a comma separated list of hci interface numbers."""
+    interfaces = [int(part) for part in value.split(",") if part.strip()]
+    if not interfaces or any(interface < 0 for interface in interfaces):
+        raise ValueError(f"Invalid adapter list: {value}")
+    return list(dict.fromkeys(interfaces))
+
+
+def parse_proxies(value: str) -> list[tuple[str, int]]:
+    """Parse a comma separated list of host[:port] proxy addresses."""
+    proxies = []
+    for part in filter(None, (part.strip() for part in value.split(","))):
+        host, _, port = part.partition(":")
+        port_number = int(port) if port else DEFAULT_PROXY_PORT
+        if not host or not 0 < port_number < 65536:
+            raise ValueError(f"Invalid proxy address: {part}")
+        proxies.append((host, port_number))
+    return list(dict.fromkeys(proxies))
+
+
+async def async_import_api(hass: HomeAssistant) -> ModuleType:
+    """Import PySwitchbot and its BLE backend outside the event loop.
+
+    The module is in sys.modules before it finished executing, so entries set
+    up concurrently all go through import_module, which waits for it.
+    """
+    return await hass.async_add_executor_job(importlib.import_module, "switchbot")
+
+
+async def async_import_coordinator(hass: HomeAssistant) -> ModuleType:
+    """Import the coordinator and the modules it runs on outside the event loop.
+
+    Adapters, connections and proxies import bleak when loaded, platforms
+    only reference them for type checking.
+    """
+    return await hass.async_add_executor_job(
+        importlib.import_module, f"{__package__}.coordinator"
+    )
@@ -0,0 +1,10 @@
+"""Tests for the Switchbot integration."""
+from __future__ import annotations
+
+import importlib
+from types import ModuleType
+
+
+def import_integration(module: str) -> ModuleType:
+    """Import a module of the integration, its package name has a dash."""
+    return importlib.import_module(f"custom_components.switchbot-curtain.{module}")
@@ -0,0 +1,15 @@
+"""Fixtures for Switchbot tests."""
+from __future__ import annotations
+
+from collections.abc import AsyncIterator
+
+from homeassistant.core import HomeAssistant
+import pytest
+
+
+@pytest.fixture
+async def hass() -> AsyncIterator[HomeAssistant]:
+    """Return a Home Assistant instance on the test loop, without components."""
+    hass = HomeAssistant()
+    yield hass
+    await hass.async_block_till_done()
@@ -0,0 +1,296 @@
+"""Test spreading scans and commands over several adapters."""
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Callable
+from types import SimpleNamespace
+from typing import Any
+
+import bleak
+from homeassistant.core import HomeAssistant
+import pytest
+
+from . import import_integration
+
+adapters = import_integration("adapters")
+const = import_integration("const")
+
+BOT = bytes.fromhex("48001c")
+CURTAIN = bytes.fromhex("6340236450")
+
+
+class Clock:
+    """Monotonic clock advanced by hand."""
+
+    def __init__(self) -> None:
+        """Initialize the clock."""
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        """Return the current time."""
+        return self.now
+
+
+class FakeScanner:
+    """Scanner hearing a fixed set of advertisements after a delay each."""
+
+    def __init__(
+        self, adverts: list[tuple[str, int, bytes, float]], error: Exception | None
+    ) -> None:
+        """Initialize the scanner."""
+        self._adverts = adverts
+        self._error = error
+        self._callback: Callable[[Any, Any], None] | None = None
+        self._handles: list[asyncio.TimerHandle] = []
+
+    def register_detection_callback(self, callback: Callable[[Any, Any], None]) -> None:
+        """Set the callback advertisements are passed to."""
+        self._callback = callback
+
+    async def start(self) -> None:
+        """Start hearing the advertisements."""
+        if self._error is not None:
+            raise self._error
+        loop = asyncio.get_running_loop()
+        for address, rssi, data, delay in self._adverts:
+            self._handles.append(
+                loop.call_later(delay, self._advertise, address, rssi, data)
+            )
+
+    def _advertise(self, address: str, rssi: int, data: bytes) -> None:
+        """Pass an advertisement to the callback."""
+        assert self._callback is not None
+        self._callback(
+            SimpleNamespace(address=address, rssi=rssi),
+            SimpleNamespace(service_data={const.SERVICE_DATA_UUID: data}),
+        )
+
+    async def stop(self) -> None:
+        """Stop hearing advertisements."""
+        for handle in self._handles:
+            handle.cancel()
+
+
+class FakeClient:
+    """BLE client of a device that always answers."""
+
+    def __init__(self, address: str, **kwargs: Any) -> None:
+        """Initialize the client."""
+        self.is_connected = False
+
+    async def connect(self) -> bool:
+        """Connect to the device."""
+        self.is_connected = True
+        return True
+
+    async def start_notify(self, char_specifier: Any, callback: Any) -> None:
+        """Subscribe to notifications."""
+
+    async def disconnect(self) -> bool:
+        """Disconnect from the device."""
+        self.is_connected = False
+        return True
+
+
+class FakeTransport:
+    """Connection to a proxy, as far as adapters look at it."""
+
+    def __init__(self) -> None:
+        """Initialize the transport connected."""
+        self.connected = True
+
+    async def async_close(self) -> None:
+        """Close the connection."""
+        self.connected = False
+
+
+def _adapter(
+    hass: HomeAssistant,
+    name: str,
+    adverts: list[tuple[str, int, bytes, float]] = (),
+    *,
+    remote: bool = False,
+    error: Exception | None = None,
+) -> adapters.SwitchbotAdapter:
+    """Return an adapter hearing adverts on every scan."""
+    return adapters.SwitchbotAdapter(
+        hass,
+        name=name,
+        scanner_factory=lambda: FakeScanner(list(adverts), error),
+        client_factory=FakeClient,
+        idle_timeout=60,
+        max_connections=2,
+        transport=FakeTransport() if remote else None,
+    )
+
+
+def test_merger_keeps_loudest(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test duplicates are only kept from the adapter hearing a device loudest."""
+    clock = Clock()
+    monkeypatch.setattr(adapters, "time", SimpleNamespace(monotonic=clock.monotonic))
+    merger = adapters.AdvertisementMerger(max_age=10)
+
+    assert merger.async_accept("hci0", "aabbccddeeff", -70)
+    assert merger.async_accept("hci0", "aabbccddeeff", -90)
+    assert not merger.async_accept("proxy", "aabbccddeeff", -90)
+    assert merger.async_accept("proxy", "aabbccddeeff", -60)
+    assert not merger.async_accept("hci0", "aabbccddeeff", -60)
+    assert not merger.async_accept("hci0", "aabbccddeeff", None)
+    # Devices are followed independently.
+    assert merger.async_accept("hci0", "aabbccddee00", -95)
+
+
+def test_merger_source_expires(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test another adapter takes over once the source stopped hearing a device."""
+    clock = Clock()
+    monkeypatch.setattr(adapters, "time", SimpleNamespace(monotonic=clock.monotonic))
+    merger = adapters.AdvertisementMerger(max_age=10)
+    assert merger.async_accept("proxy", "aabbccddeeff", -40)
+
+    clock.now += 9
+    assert not merger.async_accept("hci0", "aabbccddeeff", -80)
+    clock.now += 1
+    assert merger.async_accept("hci0", "aabbccddeeff", -80)
+    assert not merger.async_accept("proxy", "aabbccddeeff", -80)
+
+
+async def test_route_by_signal(hass: HomeAssistant) -> None:
+    """Test commands go through the adapter hearing the device loudest."""
+    hci0 = _adapter(hass, "hci0")
+    hci1 = _adapter(hass, "hci1")
+    manager = adapters.AdapterManager([hci0, hci1])
+    hci0.rssi["aabbccddeeff"] = -80
+    hci1.rssi["aabbccddeeff"] = -60
+    hci0.rssi["aabbccddee00"] = -70
+
+    assert manager.async_route("AA:BB:CC:DD:EE:FF") is hci1
+    assert manager.async_route("AA:BB:CC:DD:EE:00") is hci0
+    assert manager.as_dict()["routes"] == {
+        "aabbccddeeff": "hci1",
+        "aabbccddee00": "hci0",
+    }
+
+
+async def test_route_keeps_open_connection(hass: HomeAssistant) -> None:
+    """Test a device stays on the adapter holding its connection."""
+    hci0 = _adapter(hass, "hci0")
+    hci1 = _adapter(hass, "hci1")
+    manager = adapters.AdapterManager([hci0, hci1])
+    hci0.rssi["aabbccddeeff"] = -60
+    await manager.async_connect("AA:BB:CC:DD:EE:FF", 5)
+    assert hci0.pool.async_is_open("AA:BB:CC:DD:EE:FF")
+
+    hci1.rssi["aabbccddeeff"] = -40
+    assert manager.async_route("AA:BB:CC:DD:EE:FF") is hci0
+    await manager.async_close()
+
+
+async def test_route_skips_unreachable_proxy(hass: HomeAssistant) -> None:
+    """Test a proxy that can't be reached is only used as a last resort."""
+    hci0 = _adapter(hass, "hci0")
+    proxy = _adapter(hass, "proxy", remote=True)
+    manager = adapters.AdapterManager([hci0, proxy])
+    hci0.rssi["aabbccddeeff"] = -90
+    proxy.rssi["aabbccddeeff"] = -40
+    assert manager.async_route("AA:BB:CC:DD:EE:FF") is proxy
+
+    proxy.transport.connected = False
+    assert manager.async_route("AA:BB:CC:DD:EE:FF") is hci0
+
+
+async def test_pick_scanner_spreads_scans(hass: HomeAssistant) -> None:
+    """Test scans rotate over idle local adapters, avoiding busy ones."""
+    hci0 = _adapter(hass, "hci0")
+    hci1 = _adapter(hass, "hci1")
+    proxy = _adapter(hass, "proxy", remote=True)
+    manager = adapters.AdapterManager([hci0, hci1, proxy])
+
+    picked = [manager.async_pick_scanner() for _ in range(4)]
+    assert picked == [hci0, hci1, hci0, hci1]
+
+    hci0.active_commands = 1
+    assert [manager.async_pick_scanner() for _ in range(2)] == [hci1, hci1]
+
+    hci0.active_commands = 0
+    await manager.async_connect("AA:BB:CC:DD:EE:FF", 5)
+    assert hci0.pool.open_connections == 1
+    assert manager.async_pick_scanner() is hci1
+    await manager.async_close()
+
+
+async def test_targeted_scan_merges_adapters(hass: HomeAssistant) -> None:
+    """Test each device is reported by the adapter hearing it loudest."""
+    hci0 = _adapter(
+        hass,
+        "hci0",
+        [
+            ("AA:BB:CC:00:00:01", -80, BOT, 0.01),
+            ("AA:BB:CC:00:00:02", -50, CURTAIN, 0.02),
+            ("AA:BB:CC:00:00:03", -60, BOT, 0.03),
+        ],
+    )
+    proxy = _adapter(
+        hass,
+        "proxy",
+        [("AA:BB:CC:00:00:01", -40, BOT, 0), ("AA:BB:CC:00:00:02", -70, CURTAIN, 0)],
+        remote=True,
+    )
+    manager = adapters.AdapterManager([hci0, proxy])
+    first_seen: dict[str, float] = {}
+
+    seen = await manager.async_scan(
+        hci0,
+        scan_timeout=5,
+        targets={"aabbcc000001", "aabbcc000002", "aabbcc000003"},
+        first_seen=first_seen,
+    )
+
+    assert {mac: adv["data"]["rssi"] for mac, adv in seen.items()} == {
+        "aabbcc000001": -40,
+        "aabbcc000002": -50,
+        "aabbcc000003": -60,
+    }
+    assert seen["aabbcc000002"]["data"]["position"] == 0
+    assert set(first_seen) == set(seen)
+    # Both adapters remember what they heard for routing.
+    assert hci0.rssi == {"aabbcc000001": -80, "aabbcc000002": -50, "aabbcc000003": -60}
+    assert proxy.rssi == {"aabbcc000001": -40, "aabbcc000002": -70}
+    assert hci0.scans == proxy.scans == 1
+
+
+async def test_targeted_scan_ends_once_targets_heard(hass: HomeAssistant) -> None:
+    """Test a scan stops as soon as every target was heard."""
+    hci0 = _adapter(hass, "hci0", [("AA:BB:CC:00:00:01", -60, BOT, 0.01)])
+    manager = adapters.AdapterManager([hci0])
+
+    seen = await asyncio.wait_for(
+        manager.async_scan(hci0, scan_timeout=30, targets={"aabbcc000001"}),
+        1,
+    )
+    assert list(seen) == ["aabbcc000001"]
+
+
+async def test_targeted_scan_times_out(hass: HomeAssistant) -> None:
+    """Test a scan missing targets returns what it heard after scan_timeout."""
+    hci0 = _adapter(hass, "hci0", [("AA:BB:CC:00:00:01", -60, BOT, 0)])
+    manager = adapters.AdapterManager([hci0])
+
+    seen = await manager.async_scan(
+        hci0, scan_timeout=0.05, targets={"aabbcc000001", "aabbcc000009"}
+    )
+    assert list(seen) == ["aabbcc000001"]
+
+
+async def test_targeted_scan_without_failing_proxy(hass: HomeAssistant) -> None:
+    """Test a proxy failing to scan is left out, a local adapter failing isn't."""
+    hci0 = _adapter(hass, "hci0", [("AA:BB:CC:00:00:01", -60, BOT, 0)])
+    proxy = _adapter(hass, "proxy", remote=True, error=bleak.BleakError("gone"))
+    manager = adapters.AdapterManager([hci0, proxy])
+
+    seen = await manager.async_scan(hci0, scan_timeout=5, targets={"aabbcc000001"})
+    assert list(seen) == ["aabbcc000001"]
+
+    broken = _adapter(hass, "hci1", error=OSError("adapter down"))
+    manager = adapters.AdapterManager([broken, proxy])
+    with pytest.raises(OSError):
+        await manager.async_scan(broken, scan_timeout=5, targets={"aabbcc000001"})
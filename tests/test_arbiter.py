@@ -0,0 +1,159 @@
+"""Test the prioritised access to an adapter."""
+from __future__ import annotations
+
+import asyncio
+
+from homeassistant.core import Context
+import pytest
+
+from . import import_integration
+
+arbiter = import_integration("arbiter")
+CommandPriority = arbiter.CommandPriority
+
+
+async def _hold(
+    adapter: arbiter.AdapterArbiter,
+    priority: CommandPriority,
+    name: str,
+    served: list[str],
+) -> None:
+    """Acquire the adapter and record being served."""
+    async with adapter.async_acquire(priority):
+        served.append(name)
+        await asyncio.sleep(0)
+
+
+async def test_free_adapter_is_granted() -> None:
+    """Test acquiring a free adapter doesn't wait."""
+    adapter = arbiter.AdapterArbiter()
+    async with adapter.async_acquire(CommandPriority.AUTOMATION):
+        assert adapter.waiting == 0
+    async with adapter.async_acquire(CommandPriority.SCAN):
+        pass
+
+
+async def test_served_in_priority_order() -> None:
+    """Test waiters are served most urgent first, in arrival order otherwise."""
+    adapter = arbiter.AdapterArbiter()
+    served: list[str] = []
+
+    async with adapter.async_acquire(CommandPriority.SCAN):
+        tasks = [
+            asyncio.create_task(_hold(adapter, priority, name, served))
+            for name, priority in (
+                ("scan", CommandPriority.SCAN),
+                ("automation", CommandPriority.AUTOMATION),
+                ("user 1", CommandPriority.USER),
+                ("stop", CommandPriority.STOP),
+                ("user 2", CommandPriority.USER),
+            )
+        ]
+        await asyncio.sleep(0)
+        assert adapter.waiting == 5
+        assert not served
+
+    await asyncio.gather(*tasks)
+    assert served == ["stop", "user 1", "user 2", "automation", "scan"]
+    assert adapter.waiting == 0
+
+
+async def test_more_urgent_request_preempts() -> None:
+    """Test the holder is asked to step aside for more urgent requests only."""
+    adapter = arbiter.AdapterArbiter()
+    preempt = asyncio.Event()
+    served: list[str] = []
+
+    async with adapter.async_acquire(CommandPriority.AUTOMATION, preempt):
+        same = asyncio.create_task(
+            _hold(adapter, CommandPriority.AUTOMATION, "automation", served)
+        )
+        await asyncio.sleep(0)
+        assert not preempt.is_set()
+
+        urgent = asyncio.create_task(
+            _hold(adapter, CommandPriority.USER, "user", served)
+        )
+        await asyncio.sleep(0)
+        assert preempt.is_set()
+
+    await asyncio.gather(same, urgent)
+    assert served == ["user", "automation"]
+
+
+async def test_preempt_is_per_holder() -> None:
+    """Test a later holder isn't preempted through an earlier holder's event."""
+    adapter = arbiter.AdapterArbiter()
+    preempt = asyncio.Event()
+
+    async with adapter.async_acquire(CommandPriority.SCAN, preempt):
+        pass
+    async with adapter.async_acquire(CommandPriority.SCAN):
+        waiter = asyncio.create_task(_hold(adapter, CommandPriority.STOP, "stop", []))
+        await asyncio.sleep(0)
+    await waiter
+
+    assert not preempt.is_set()
+
+
+async def test_cancelled_waiter_is_skipped() -> None:
+    """Test a waiter cancelled in the queue doesn't block the next one."""
+    adapter = arbiter.AdapterArbiter()
+    served: list[str] = []
+
+    async with adapter.async_acquire(CommandPriority.SCAN):
+        cancelled = asyncio.create_task(
+            _hold(adapter, CommandPriority.STOP, "cancelled", served)
+        )
+        waiter = asyncio.create_task(
+            _hold(adapter, CommandPriority.AUTOMATION, "waiter", served)
+        )
+        await asyncio.sleep(0)
+        cancelled.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await cancelled
+        assert adapter.waiting == 1
+
+    await waiter
+    assert served == ["waiter"]
+
+    # The adapter is free again.
+    await asyncio.wait_for(_hold(adapter, CommandPriority.SCAN, "scan", served), 1)
+
+
+async def test_waiter_cancelled_once_granted_passes_on() -> None:
+    """Test a waiter cancelled after it was granted hands the adapter on."""
+    adapter = arbiter.AdapterArbiter()
+    served: list[str] = []
+
+    async with adapter.async_acquire(CommandPriority.SCAN):
+        granted = asyncio.create_task(
+            _hold(adapter, CommandPriority.STOP, "granted", served)
+        )
+        waiter = asyncio.create_task(
+            _hold(adapter, CommandPriority.AUTOMATION, "waiter", served)
+        )
+        await asyncio.sleep(0)
+
+    # Released to granted, which is cancelled before it got to run.
+    granted.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await granted
+    await asyncio.wait_for(waiter, 1)
+    assert served == ["waiter"]
+
+
+@pytest.mark.parametrize(
+    ("command", "user_id", "priority"),
+    [
+        ("stop", None, CommandPriority.STOP),
+        ("stop", "user", CommandPriority.STOP),
+        ("open", "user", CommandPriority.USER),
+        ("open", None, CommandPriority.AUTOMATION),
+    ],
+)
+def test_command_priority(
+    command: str, user_id: str | None, priority: CommandPriority
+) -> None:
+    """Test stops go first, then what users asked for, then automations."""
+    assert arbiter.async_command_priority(command, Context(user_id=user_id)) == priority
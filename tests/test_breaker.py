@@ -0,0 +1,129 @@
+"""Test the circuit breaker of failing devices."""
+from __future__ import annotations
+
+from types import SimpleNamespace
+
+import pytest
+
+from . import import_integration
+
+breaker = import_integration("breaker")
+const = import_integration("const")
+
+
+class Clock:
+    """Monotonic clock advanced by hand."""
+
+    def __init__(self) -> None:
+        """Initialize the clock."""
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        """Return the current time."""
+        return self.now
+
+
+@pytest.fixture(name="clock")
+def clock_fixture(monkeypatch: pytest.MonkeyPatch) -> Clock:
+    """Run the breaker on a clock advanced by the test."""
+    clock = Clock()
+    monkeypatch.setattr(breaker, "time", SimpleNamespace(monotonic=clock.monotonic))
+    return clock
+
+
+def _trip(circuit: breaker.CircuitBreaker) -> None:
+    """Record failures until the breaker opens."""
+    for _ in range(const.BREAKER_THRESHOLD):
+        circuit.async_record_failure()
+
+
+def test_opens_after_threshold(clock: Clock) -> None:
+    """Test the breaker stays closed until enough attempts failed in a row."""
+    circuit = breaker.CircuitBreaker()
+    for _ in range(const.BREAKER_THRESHOLD - 1):
+        circuit.async_record_failure()
+    assert circuit.state == breaker.STATE_CLOSED
+    assert circuit.retries(3) == 3
+
+    circuit.async_record_failure()
+    assert circuit.state == breaker.STATE_OPEN
+    assert circuit.is_open
+    assert circuit.as_dict() == {
+        "state": breaker.STATE_OPEN,
+        "failures": const.BREAKER_THRESHOLD,
+        "trips": 1,
+        "retry_in": const.BREAKER_COOLDOWN,
+    }
+
+
+def test_success_resets_failures(clock: Clock) -> None:
+    """Test a success in between failures keeps the breaker closed."""
+    circuit = breaker.CircuitBreaker()
+    for _ in range(const.BREAKER_THRESHOLD - 1):
+        circuit.async_record_failure()
+    circuit.async_record_success()
+    circuit.async_record_failure()
+    assert circuit.state == breaker.STATE_CLOSED
+    assert circuit.failures == 1
+
+
+def test_half_open_probe_closes(clock: Clock) -> None:
+    """Test a successful probe once the cooldown passed closes the breaker."""
+    circuit = breaker.CircuitBreaker()
+    _trip(circuit)
+
+    clock.now += const.BREAKER_COOLDOWN
+    assert circuit.state == breaker.STATE_HALF_OPEN
+    assert not circuit.is_open
+    # A half open breaker probes with a single attempt.
+    assert circuit.retries(3) == 0
+
+    circuit.async_record_success()
+    assert circuit.state == breaker.STATE_CLOSED
+    assert circuit.retries(3) == 3
+    assert circuit.trips == 0
+
+
+def test_failed_probe_doubles_cooldown(clock: Clock) -> None:
+    """Test a failed probe opens the breaker again for twice as long."""
+    circuit = breaker.CircuitBreaker()
+    _trip(circuit)
+    clock.now += const.BREAKER_COOLDOWN
+
+    circuit.async_record_failure()
+    assert circuit.state == breaker.STATE_OPEN
+    clock.now += const.BREAKER_COOLDOWN * 2 - 1
+    assert circuit.state == breaker.STATE_OPEN
+    clock.now += 1
+    assert circuit.state == breaker.STATE_HALF_OPEN
+
+
+def test_cooldown_is_capped(clock: Clock) -> None:
+    """Test the cooldown stops growing at BREAKER_MAX_COOLDOWN."""
+    circuit = breaker.CircuitBreaker()
+    _trip(circuit)
+    for _ in range(10):
+        clock.now += const.BREAKER_MAX_COOLDOWN
+        circuit.async_record_failure()
+
+    assert circuit.as_dict()["retry_in"] == const.BREAKER_MAX_COOLDOWN
+
+
+def test_heard_allows_probe(clock: Clock) -> None:
+    """Test hearing the device advertise lets a probe through right away."""
+    circuit = breaker.CircuitBreaker()
+    circuit.async_heard()
+    assert circuit.state == breaker.STATE_CLOSED
+
+    _trip(circuit)
+    circuit.async_heard()
+    assert circuit.state == breaker.STATE_HALF_OPEN
+    assert circuit.retries(3) == 0
+
+
+def test_backoff() -> None:
+    """Test retries back off exponentially up to the longest wait."""
+    delays = [breaker.CircuitBreaker.backoff(retry, 5) for retry in range(6)]
+    assert delays == [
+        const.BACKOFF_INITIAL_DELAY * 2**retry for retry in range(4)
+    ] + [5, 5]
@@ -0,0 +1,228 @@
+"""Test the pool of device connections."""
+from __future__ import annotations
+
+import asyncio
+from collections.abc import Callable
+from typing import Any
+
+import bleak
+from homeassistant.core import HomeAssistant
+import pytest
+
+from . import import_integration
+
+arbiter = import_integration("arbiter")
+connection = import_integration("connection")
+
+# Long enough that no test passes by waiting for idle connections to close.
+IDLE_TIMEOUT = 60
+
+
+class FakeClient:
+    """BLE client of a device that always answers."""
+
+    def __init__(
+        self,
+        address: str,
+        *,
+        timeout: float,
+        disconnected_callback: Callable[[FakeClient], None],
+    ) -> None:
+        """Initialize the client."""
+        self.address = address
+        self.is_connected = False
+        self.connect_error: Exception | None = None
+        self._disconnected_callback = disconnected_callback
+
+    async def connect(self) -> bool:
+        """Connect to the device."""
+        if self.connect_error is not None:
+            raise self.connect_error
+        self.is_connected = True
+        return True
+
+    async def start_notify(self, char_specifier: Any, callback: Any) -> None:
+        """Subscribe to notifications."""
+
+    async def disconnect(self) -> bool:
+        """Disconnect from the device."""
+        self.is_connected = False
+        return True
+
+    def drop(self) -> None:
+        """Lose the connection as a device going out of range does."""
+        self.is_connected = False
+        self._disconnected_callback(self)
+
+
+class ClientFactory:
+    """Create fake clients and remember them."""
+
+    def __init__(self) -> None:
+        """Initialize the factory."""
+        self.clients: list[FakeClient] = []
+        self.connect_error: Exception | None = None
+
+    def __call__(self, address: str, **kwargs: Any) -> FakeClient:
+        """Create a client."""
+        client = FakeClient(address, **kwargs)
+        client.connect_error = self.connect_error
+        self.clients.append(client)
+        return client
+
+    def connected(self) -> list[str]:
+        """Return the addresses of the connected clients."""
+        return [client.address for client in self.clients if client.is_connected]
+
+
+@pytest.fixture(name="factory")
+def factory_fixture() -> ClientFactory:
+    """Return the factory of the fake clients."""
+    return ClientFactory()
+
+
+def _pool(
+    hass: HomeAssistant,
+    factory: ClientFactory,
+    max_connections: int,
+    idle_timeout: float = IDLE_TIMEOUT,
+) -> connection.SwitchbotConnectionPool:
+    """Return a pool creating fake clients."""
+    return connection.SwitchbotConnectionPool(
+        hass,
+        idle_timeout=idle_timeout,
+        max_connections=max_connections,
+        client_factory=factory,
+        arbiter=arbiter.AdapterArbiter(),
+    )
+
+
+async def test_connection_is_reused(
+    hass: HomeAssistant, factory: ClientFactory
+) -> None:
+    """Test consecutive commands share one connection."""
+    pool = _pool(hass, factory, 2)
+    for _ in range(3):
+        async with pool.async_connection("aa", 5) as conn:
+            assert conn.is_connected
+
+    assert len(factory.clients) == 1
+    assert pool.open_connections == 1
+    assert pool.async_is_open("aa")
+    await pool.async_close()
+    assert factory.connected() == []
+
+
+async def test_least_recently_used_is_evicted(
+    hass: HomeAssistant, factory: ClientFactory
+) -> None:
+    """Test a full pool closes the idle connection used longest ago."""
+    pool = _pool(hass, factory, 2)
+    await pool.async_connect("aa", 5)
+    await pool.async_connect("bb", 5)
+    await pool.async_connect("aa", 5)
+
+    await pool.async_connect("cc", 5)
+    assert factory.connected() == ["aa", "cc"]
+    assert pool.open_connections == 2
+    await pool.async_close()
+
+
+async def test_waits_for_leased_connection(
+    hass: HomeAssistant, factory: ClientFactory
+) -> None:
+    """Test a full pool of leased connections waits for a lease to end."""
+    pool = _pool(hass, factory, 1)
+    release = asyncio.Event()
+
+    async def _lease() -> None:
+        async with pool.async_connection("aa", 5):
+            await release.wait()
+
+    lease = asyncio.create_task(_lease())
+    await asyncio.sleep(0)
+    waiting = asyncio.create_task(pool.async_connect("bb", 5))
+    await asyncio.sleep(0.01)
+    assert not waiting.done()
+    assert factory.connected() == ["aa"]
+
+    # The connection is evicted as soon as its lease ends, not when idle.
+    release.set()
+    await asyncio.wait_for(asyncio.gather(lease, waiting), 1)
+    assert factory.connected() == ["bb"]
+    await pool.async_close()
+
+
+async def test_dropped_while_leased(
+    hass: HomeAssistant, factory: ClientFactory
+) -> None:
+    """Test a connection dropped during a command is closed and reopened."""
+    pool = _pool(hass, factory, 1)
+    async with pool.async_connection("aa", 5):
+        factory.clients[-1].drop()
+        # Kept until the lease ends, the command may still be using it.
+        assert pool.async_is_open("aa")
+    assert pool.open_connections == 0
+
+    async def _lease_again() -> None:
+        async with pool.async_connection("aa", 5) as conn:
+            assert conn.is_connected
+
+    await asyncio.wait_for(_lease_again(), 1)
+    assert len(factory.clients) == 2
+    assert factory.connected() == ["aa"]
+    await pool.async_close()
+
+
+async def test_dropped_while_idle(hass: HomeAssistant, factory: ClientFactory) -> None:
+    """Test an idle connection that drops frees its slot right away."""
+    pool = _pool(hass, factory, 1)
+    await pool.async_connect("aa", 5)
+    factory.clients[-1].drop()
+    assert pool.open_connections == 0
+
+    await asyncio.wait_for(pool.async_connect("bb", 5), 1)
+    assert factory.connected() == ["bb"]
+    await pool.async_close()
+
+
+async def test_failed_connect_frees_slot(
+    hass: HomeAssistant, factory: ClientFactory
+) -> None:
+    """Test a connection that can't be opened doesn't hold a slot."""
+    pool = _pool(hass, factory, 1)
+    factory.connect_error = bleak.BleakError("out of range")
+    with pytest.raises(bleak.BleakError):
+        await pool.async_connect("aa", 5)
+    assert pool.open_connections == 0
+
+    factory.connect_error = None
+    await asyncio.wait_for(pool.async_connect("bb", 5), 1)
+    assert factory.connected() == ["bb"]
+    await pool.async_close()
+
+
+async def test_failed_command_closes_connection(
+    hass: HomeAssistant, factory: ClientFactory
+) -> None:
+    """Test a command failing on a connection closes it."""
+    pool = _pool(hass, factory, 1)
+    with pytest.raises(asyncio.TimeoutError):
+        async with pool.async_connection("aa", 5):
+            raise asyncio.TimeoutError
+
+    assert pool.open_connections == 0
+    assert factory.connected() == []
+
+
+async def test_idle_connection_closes(
+    hass: HomeAssistant, factory: ClientFactory
+) -> None:
+    """Test a connection closes once idle for idle_timeout."""
+    pool = _pool(hass, factory, 1, idle_timeout=0)
+    await pool.async_connect("aa", 5)
+    await asyncio.sleep(0.01)
+    await hass.async_block_till_done()
+
+    assert pool.open_connections == 0
+    assert factory.connected() == []
@@ -0,0 +1,103 @@
+"""Test the advertisement decoder against known service data."""
+from __future__ import annotations
+
+import pytest
+
+from . import import_integration
+
+decoder = import_integration("decoder")
+
+ADDRESS = "AA:BB:CC:DD:EE:FF"
+
+
+@pytest.mark.parametrize(
+    ("data", "model", "encrypted", "expected"),
+    [
+        (
+            bytes.fromhex("48001c"),
+            "H",
+            False,
+            {"switchMode": False, "isOn": False, "battery": 28},
+        ),
+        (
+            bytes.fromhex("4880e4"),
+            "H",
+            False,
+            {"switchMode": True, "isOn": True, "battery": 100},
+        ),
+        (
+            bytes.fromhex("48c064"),
+            "H",
+            False,
+            {"switchMode": True, "isOn": False, "battery": 100},
+        ),
+        (
+            bytes.fromhex("6340236450"),
+            "c",
+            False,
+            {
+                "calibration": True,
+                "battery": 35,
+                "inMotion": False,
+                "position": 0,
+                "lightLevel": 5,
+                "deviceChain": 0,
+            },
+        ),
+        (
+            bytes.fromhex("e3c0e48511"),
+            "c",
+            True,
+            {
+                "calibration": True,
+                "battery": 100,
+                "inMotion": True,
+                "position": 95,
+                "lightLevel": 1,
+                "deviceChain": 1,
+            },
+        ),
+    ],
+)
+def test_decode_known_packets(
+    data: bytes, model: str, encrypted: bool, expected: dict
+) -> None:
+    """Test decoding service data of bots and curtains."""
+    assert decoder.decode_advertisement(ADDRESS, data, -60) == {
+        "mac_address": "aa:bb:cc:dd:ee:ff",
+        "rawAdvData": data,
+        "isEncrypted": encrypted,
+        "model": model,
+        "modelName": decoder.MODEL_LAYOUTS[ord(model)].model_name,
+        "data": {**expected, "rssi": -60},
+    }
+
+
+def test_curtain_position_is_clamped() -> None:
+    """Test a curtain reporting past closed decodes as fully closed."""
+    assert decoder.decode_curtain(bytes.fromhex("63400c7f00"))[3] == 0
+
+
+@pytest.mark.parametrize(
+    "data",
+    [b"", bytes.fromhex("48"), bytes.fromhex("634023"), bytes.fromhex("7400e4")],
+)
+def test_undecodable_packets(data: bytes) -> None:
+    """Test short and unknown service data only reports the basics."""
+    assert decoder.model_layout(data) is None
+    assert decoder.decode_advertisement(ADDRESS, data, None) == {
+        "mac_address": "aa:bb:cc:dd:ee:ff",
+        "rawAdvData": data,
+        "data": {"rssi": None},
+    }
+
+
+def test_decode_from_memoryview() -> None:
+    """Test the layouts decode from a view without copying the data."""
+    data = bytearray.fromhex("6340236450")
+    assert decoder.decode_curtain(memoryview(data)) == (True, 35, False, 0, 5, 0)
+    assert decoder.decode_bot(memoryview(bytearray.fromhex("4880e4"))) == (
+        True,
+        True,
+        100,
+    )
@@ -0,0 +1,230 @@
+"""Test the transport to remote proxies against the stand-in proxy node."""
+from __future__ import annotations
+
+import asyncio
+from collections.abc import AsyncIterator, Awaitable, Callable
+from contextlib import asynccontextmanager
+import json
+from types import SimpleNamespace
+from typing import Any
+
+import bleak
+from homeassistant.core import HomeAssistant
+import pytest
+
+from benchmarks import proxy
+
+from . import import_integration
+
+const = import_integration("const")
+transport = import_integration("transport")
+
+SECRET = "s3cret"
+RSSI_OFFSET = 10
+ADDRESS = "AA:BB:CC:DD:EE:FF"
+CURTAIN = bytes.fromhex("6340236450")
+
+
+class FakeScanner:
+    """Scanner of the proxy, advertisements are passed in by the test."""
+
+    def __init__(self, radio: FakeRadio, filters: dict[str, list[str]]) -> None:
+        """Initialize the scanner."""
+        self._radio = radio
+        self.filters = filters
+        self.callback: Callable[[Any, Any], None] | None = None
+
+    def register_detection_callback(self, callback: Callable[[Any, Any], None]) -> None:
+        """Set the callback advertisements are passed to."""
+        self.callback = callback
+
+    async def start(self) -> None:
+        """Start scanning."""
+        self._radio.scanning.set()
+
+    async def stop(self) -> None:
+        """Stop scanning."""
+        self._radio.scanning.clear()
+
+
+class FakeClient:
+    """BLE client of the proxy recording what it is asked for."""
+
+    def __init__(self, address: str, **kwargs: Any) -> None:
+        """Initialize the client."""
+        self.address = address
+        self.writes: list[tuple[str, bytes]] = []
+
+    async def connect(self) -> bool:
+        """Connect to the device."""
+        return True
+
+    async def disconnect(self) -> bool:
+        """Disconnect from the device."""
+        return True
+
+    async def write_gatt_char(self, char: str, data: bytes, response: bool) -> None:
+        """Write to a characteristic."""
+        self.writes.append((char, data))
+
+
+class FakeRadio:
+    """Stands in for the bleak module on the proxy node."""
+
+    def __init__(self) -> None:
+        """Initialize the radio."""
+        self.scanners: list[FakeScanner] = []
+        self.clients: list[FakeClient] = []
+        self.scanning = asyncio.Event()
+
+    def BleakScanner(self, **kwargs: Any) -> FakeScanner:  # noqa: N802
+        """Create a scanner."""
+        self.scanners.append(scanner := FakeScanner(self, **kwargs))
+        return scanner
+
+    def BleakClient(self, address: str, **kwargs: Any) -> FakeClient:  # noqa: N802
+        """Create a client."""
+        self.clients.append(client := FakeClient(address, **kwargs))
+        return client
+
+    def advertise(self, rssi: int, service_data: dict[str, bytes]) -> None:
+        """Have the proxy hear an advertisement."""
+        callback = self.scanners[-1].callback
+        assert callback is not None
+        callback(
+            SimpleNamespace(address=ADDRESS, name=None, rssi=rssi),
+            SimpleNamespace(service_data=service_data, rssi=rssi),
+        )
+
+
+@asynccontextmanager
+async def _serve(
+    handler: Callable[[asyncio.StreamReader, asyncio.StreamWriter], Awaitable[None]]
+) -> AsyncIterator[int]:
+    """Serve connections with handler on a free port until the test ends."""
+    server = await asyncio.start_server(handler, "127.0.0.1", 0)
+    yield server.sockets[0].getsockname()[1]
+    server.close()
+    await server.wait_closed()
+
+
+@pytest.fixture(name="radio")
+def radio_fixture() -> FakeRadio:
+    """Return the radio of the proxy."""
+    return FakeRadio()
+
+
+@pytest.fixture(name="port")
+async def port_fixture(radio: FakeRadio) -> AsyncIterator[int]:
+    """Run the stand-in proxy and return its port."""
+    server = await proxy.start_server(radio, "127.0.0.1", 0, RSSI_OFFSET, SECRET)
+    yield server.sockets[0].getsockname()[1]
+    server.close()
+    await server.wait_closed()
+
+
+def _line(message: dict[str, Any]) -> bytes:
+    """Encode a message of the protocol."""
+    return json.dumps(message).encode() + b"\n"
+
+
+async def test_scan_and_write_through_proxy(
+    hass: HomeAssistant, radio: FakeRadio, port: int
+) -> None:
+    """Test a transport knowing the secret scans and writes through the proxy."""
+    proxy_transport = transport.ProxyTransport(hass, "127.0.0.1", port, SECRET)
+    heard: asyncio.Queue[tuple[Any, Any]] = asyncio.Queue()
+    scanner = transport.ProxyScanner(proxy_transport)
+    scanner.register_detection_callback(lambda *adv: heard.put_nowait(adv))
+    await scanner.start()
+    assert proxy_transport.connected
+    await asyncio.wait_for(radio.scanning.wait(), 1)
+    assert radio.scanners[-1].filters == {"UUIDs": [const.SERVICE_UUID]}
+
+    # Service data of other devices is neither relayed nor passed on.
+    radio.advertise(-70, {"0000fd3d-0000-1000-8000-00805f9b34fb": b"\x01"})
+    radio.advertise(-60, {const.SERVICE_DATA_UUID: CURTAIN, "other": b"\x01"})
+    device, advertisement = await asyncio.wait_for(heard.get(), 1)
+    assert heard.empty()
+    assert device.address == ADDRESS
+    assert device.rssi == -60 + RSSI_OFFSET
+    assert advertisement.service_data == {const.SERVICE_DATA_UUID: CURTAIN}
+
+    client = transport.ProxyClient(proxy_transport, ADDRESS, timeout=5)
+    await client.connect()
+    await client.write_gatt_char("char", b"\x57\x01")
+    assert radio.clients[-1].writes == [("char", b"\x57\x01")]
+
+    await scanner.stop()
+    await proxy_transport.async_close()
+
+
+async def test_wrong_secret_is_refused(
+    hass: HomeAssistant, radio: FakeRadio, port: int
+) -> None:
+    """Test the proxy serves nothing to a transport with another secret."""
+    proxy_transport = transport.ProxyTransport(hass, "127.0.0.1", port, "wrong")
+    with pytest.raises(bleak.BleakError, match="Unable to authenticate"):
+        await proxy_transport.async_connect()
+    assert not proxy_transport.connected
+
+
+async def test_client_without_secret_is_refused(port: int) -> None:
+    """Test the proxy drops a client skipping the handshake."""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    assert json.loads(await reader.readline())["op"] == "hello"
+    writer.write(_line({"op": "scan", "on": True}))
+    assert json.loads(await reader.readline()) == {"op": "denied"}
+    assert await reader.readline() == b""
+    writer.close()
+
+
+async def test_rogue_proxy_is_refused(hass: HomeAssistant) -> None:
+    """Test the transport leaves a proxy not knowing the secret."""
+
+    async def _rogue(
+        reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        writer.write(_line({"op": "hello", "nonce": "abc"}))
+        await reader.readline()
+        writer.write(_line({"op": "welcome", "digest": "0" * 64}))
+
+    async with _serve(_rogue) as port:
+        proxy_transport = transport.ProxyTransport(hass, "127.0.0.1", port, SECRET)
+        with pytest.raises(bleak.BleakError, match="doesn't know the secret"):
+            await proxy_transport.async_connect()
+        assert not proxy_transport.connected
+
+
+async def test_malformed_messages_are_skipped(hass: HomeAssistant) -> None:
+    """Test malformed messages are skipped without dropping the connection."""
+    advert = {
+        "op": "adv",
+        "address": ADDRESS,
+        "rssi": -50,
+        "service_data": {const.SERVICE_DATA_UUID: CURTAIN.hex()},
+    }
+
+    async def _garbled(
+        reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        assert await proxy.authenticate(reader, writer, SECRET)
+        # Wait for the scan request before advertising.
+        await reader.readline()
+        writer.write(b"not json\n" + _line([advert]) + _line({"address": ADDRESS}))
+        writer.write(_line({"op": "adv", "address": ADDRESS, "rssi": -50}))
+        writer.write(_line({**advert, "service_data": {const.SERVICE_DATA_UUID: 1}}))
+        writer.write(_line(advert))
+        await reader.readline()
+
+    async with _serve(_garbled) as port:
+        proxy_transport = transport.ProxyTransport(hass, "127.0.0.1", port, SECRET)
+        heard: asyncio.Queue[tuple[Any, Any]] = asyncio.Queue()
+        await proxy_transport.async_start_scan(lambda *adv: heard.put_nowait(adv))
+
+        device, advertisement = await asyncio.wait_for(heard.get(), 1)
+        assert device.rssi == -50
+        assert advertisement.service_data == {const.SERVICE_DATA_UUID: CURTAIN}
+        assert heard.empty()
+        assert proxy_transport.connected
+        await proxy_transport.async_close()